@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the post-fetch distance filter and ranking.
+
+Compares the original per-place loop (scalar haversine_distance + list.sort)
+with the vectorized ranking.Ranking.rank, both starting from API dicts and from
+prebuilt coordinate arrays.
+
+    python benchmarks/bench_geo.py [--sizes 1000 10000 100000 1000000] [--top-k 100]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import numpy as np  # noqa: E402
+
+from geo import haversine_distance, place_arrays, top_k_indices, within_radius  # noqa: E402
+from ranking import Ranking  # noqa: E402
+
+CENTER = (48.8584, 2.2945)
+RADIUS = 30000.0
+
+
+def synthetic_places(n, seed=42):
+    rng = random.Random(seed)
+    places = []
+    for i in range(n):
+        places.append({
+            "id": f"place-{i}",
+            "location": {
+                "latitude": CENTER[0] + rng.uniform(-0.5, 0.5),
+                "longitude": CENTER[1] + rng.uniform(-0.75, 0.75),
+            },
+            "userRatingCount": int(rng.paretovariate(1.2)),
+            "rating": round(rng.uniform(1, 5), 1),
+        })
+    return places
+
+
+def loop_rank(places, latitude, longitude, radius):
+    """The original implementation from google_maps_text_search."""
+    filtered_places = []
+    for place in places:
+        loc = place.get('location', {})
+        plat = loc.get('latitude')
+        plon = loc.get('longitude')
+        if plat is not None and plon is not None:
+            dist = haversine_distance(latitude, longitude, plat, plon)
+            if dist <= radius:
+                filtered_places.append(place)
+    filtered_places.sort(key=lambda p: (-p.get('userRatingCount', 0), -p.get('rating', 0)))
+    return filtered_places
+
+
+def array_rank(latitudes, longitudes, counts, ratings, k):
+    inside = within_radius(CENTER[0], CENTER[1], RADIUS, latitudes, longitudes)
+    candidates = inside.nonzero()[0]
+    return candidates[top_k_indices(counts[candidates] * 10.0 + ratings[candidates], k)]
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--top-k", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'places':>10} {'loop':>10} {'vector':>10} {'vec top-k':>10} {'arrays':>10} {'speedup':>8}")
+    for n in args.sizes:
+        places = synthetic_places(n)
+        repeat = 5 if n <= 100000 else 1
+
+        ranking = Ranking(None, CENTER[0], CENTER[1], RADIUS)
+        expected = loop_rank(places, CENTER[0], CENTER[1], RADIUS)
+        ranked = ranking.rank(places)
+        assert [p["id"] for p in ranked] == [p["id"] for p in expected]
+
+        arrays = place_arrays(places)
+        loop_s = best_of(lambda: loop_rank(places, CENTER[0], CENTER[1], RADIUS), repeat)
+        vector_s = best_of(lambda: ranking.rank(places), repeat)
+        top_k_s = best_of(lambda: ranking.rank(places, k=args.top_k), repeat)
+        arrays_s = best_of(lambda: array_rank(*arrays, args.top_k), repeat)
+        print(f"{n:>10} {loop_s * 1000:>8.1f}ms {vector_s * 1000:>8.1f}ms {top_k_s * 1000:>8.1f}ms "
+              f"{arrays_s * 1000:>8.1f}ms {loop_s / arrays_s:>7.0f}x")
+
+
+if __name__ == "__main__":
+    np.seterr(invalid="ignore")
+    main()
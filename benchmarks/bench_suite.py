@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite run against the local mock Places API server.
+
+Each case is timed (best of a few runs) and compared with the stored baseline
+in benchmarks/baselines.json. A case slower than baseline * tolerance is a
+regression and makes the suite exit with status 1. Baselines are per machine:
+record them with --update-baselines before comparing.
+
+    python benchmarks/bench_suite.py [--only search rank] [--tolerance 1.5] [--update-baselines]
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_geo import synthetic_places  # noqa: E402
+from mock_places_server import CENTER, MockPlacesServer  # noqa: E402
+
+BASELINES_PATH = os.path.join(BENCH_DIR, "baselines.json")
+DEFAULT_TOLERANCE = 1.5
+NOISE_FLOOR_MS = 5.0  # differences below this are never reported as regressions
+TABLE_ROWS = 100000
+SESSION_ROWS = 100000
+EXPORT_ROWS = 100000
+DAEMON_CLIENTS = 8
+
+
+class Skip(Exception):
+    """Raised by a case whose optional dependencies are missing."""
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_search_pages(ctx):
+    """Three pages of a plain search, page tokens usable immediately."""
+    from places_client import PlacesClient
+    from search_core import google_maps_text_search
+
+    client = PlacesClient("mock", base_url=ctx.server.base_url)
+
+    def run():
+        _, places, error = google_maps_text_search(client, "cafe", *CENTER, radius=5000,
+                                                   page_token_pacer=ctx.pacer())
+        assert error is None and len(places) == 60, error
+
+    try:
+        return best_of(run, 5)
+    finally:
+        client.close()
+
+
+def bench_search_multi_query(ctx):
+    """Three queries fanned out over the same circle and merged."""
+    from places_client import PlacesClient
+    from search_core import google_maps_text_search
+
+    client = PlacesClient("mock", base_url=ctx.server.base_url)
+
+    def run():
+        _, places, error = google_maps_text_search(client, "cafe OR bakery OR coffee roaster", *CENTER,
+                                                   radius=5000, page_token_pacer=ctx.pacer())
+        assert error is None and len(places) == 60, error
+
+    try:
+        return best_of(run, 5)
+    finally:
+        client.close()
+
+
+def bench_search_throttled(ctx):
+    """The same search while 20% of requests are answered with 429."""
+    from places_client import PlacesClient
+    from search_core import google_maps_text_search
+
+    ctx.server.error_rate = 0.2
+    client = PlacesClient("mock", base_url=ctx.server.base_url, backoff_base=0.01, max_retries=10)
+
+    def run():
+        _, places, error = google_maps_text_search(client, "cafe", *CENTER, radius=5000,
+                                                   page_token_pacer=ctx.pacer())
+        assert error is None and len(places) == 60, error
+
+    try:
+        return best_of(run, 5)
+    finally:
+        ctx.server.error_rate = 0.0
+        client.close()
+
+
+def bench_search_token_wait(ctx):
+    """Three pages when page tokens take 0.6 s to become valid, after the pacer has learned that."""
+    from paging import PageTokenPacer
+    from places_client import PlacesClient
+    from search_core import google_maps_text_search
+
+    ctx.server.token_delay = 0.6
+    client = PlacesClient("mock", base_url=ctx.server.base_url)
+    pacer = PageTokenPacer()
+
+    def run():
+        _, places, error = google_maps_text_search(client, "cafe", *CENTER, radius=5000, page_token_pacer=pacer)
+        assert error is None and len(places) == 60, error
+
+    try:
+        return best_of(run, 5)
+    finally:
+        ctx.server.token_delay = 0.0
+        client.close()
+
+
+def bench_search_cached(ctx):
+    """A repeated search answered from a warm response cache."""
+    from places_client import PlacesClient
+    from response_cache import ResponseCache
+    from search_core import google_maps_text_search
+
+    client = PlacesClient("mock", base_url=ctx.server.base_url)
+    cache = ResponseCache(os.path.join(ctx.tmp, "bench_cache.sqlite3"))
+    google_maps_text_search(client, "cafe", *CENTER, radius=5000, cache=cache, page_token_pacer=ctx.pacer())
+    requests_before = ctx.server.requests
+
+    def run():
+        _, places, error = google_maps_text_search(client, "cafe", *CENTER, radius=5000, cache=cache)
+        assert error is None and len(places) == 60, error
+
+    try:
+        elapsed = best_of(run, 5)
+        assert ctx.server.requests == requests_before, "cached search hit the server"
+        return elapsed
+    finally:
+        cache.close()
+        client.close()
+
+
+def bench_search_after_pan(ctx):
+    """A search after a short pan east, with the areas ahead prefetched while the map rested."""
+    from geo import offset_point
+    from places_client import PlacesClient
+    from prefetch import SpeculativePrefetcher
+    from response_cache import ResponseCache
+    from search_core import google_maps_text_search
+
+    client = PlacesClient("mock", base_url=ctx.server.base_url)
+    cache = ResponseCache(os.path.join(ctx.tmp, "bench_prefetch_cache.sqlite3"))
+    prefetcher = SpeculativePrefetcher(client, cache, page_token_pacer=ctx.pacer())
+    prefetcher.schedule(["cafe"], *CENTER, 5000, displacement=(0.0, 2000.0))
+    assert prefetcher.wait_idle(60), "prefetch did not finish"
+    requests_before = ctx.server.requests
+    # The map came to rest 1.2 km east of where the prefetch was predicted
+    latitude, longitude = offset_point(*CENTER, 0.0, 1200.0)
+
+    def run():
+        center = prefetcher.cached_center(["cafe"], latitude, longitude, 5000)
+        assert center is not None, "the circle ahead was not prefetched"
+        _, places, error = google_maps_text_search(client, "cafe", latitude, longitude, radius=5000, cache=cache,
+                                                   fetch_center=center)
+        assert error is None and places, error
+
+    try:
+        elapsed = best_of(run, 5)
+        assert ctx.server.requests == requests_before, "search after the pan hit the server"
+        return elapsed
+    finally:
+        prefetcher.close()
+        cache.close()
+        client.close()
+
+
+def bench_search_sweep(ctx):
+    """A sweep of a dense 10 km circle, subdividing tiles past the 60 result limit."""
+    from places_client import PlacesClient, TokenBucket
+    from search_core import google_maps_text_search
+
+    client = PlacesClient("mock", base_url=ctx.server.base_url, rate_limiter=TokenBucket(rate=1000, capacity=1000))
+
+    def run():
+        _, places, error = google_maps_text_search(client, "cafe", *CENTER, radius=10000, sweep=True,
+                                                   page_token_pacer=ctx.pacer())
+        assert error is None and len(places) > 60, error
+
+    try:
+        return best_of(run, 1)
+    finally:
+        client.close()
+
+
+def bench_details_prefetch(ctx):
+    """Place Details of 20 rows prefetched in the background, then read back from memory."""
+    import threading
+    from place_details import PlaceDetailsLoader
+    from places_client import PlacesClient, TokenBucket
+
+    client = PlacesClient("mock", base_url=ctx.server.base_url, rate_limiter=TokenBucket(rate=1000, capacity=1000))
+    place_ids = [f"mock-{i}" for i in range(20)]
+
+    def run():
+        loaded = threading.Semaphore(0)
+        loader = PlaceDetailsLoader(client, on_loaded=lambda *args: loaded.release())
+        try:
+            loader.prefetch(place_ids)
+            for _ in place_ids:
+                assert loaded.acquire(timeout=10), "details not loaded"
+            assert all(loader.get_cached(place_id) for place_id in place_ids)
+        finally:
+            loader.close()
+
+    try:
+        return best_of(run, 3)
+    finally:
+        client.close()
+
+
+def bench_rank(ctx):
+    """Distance filtering and ranking of 100k places."""
+    from ranking import Ranking
+
+    places = ctx.places(TABLE_ROWS)
+    ranking = Ranking(None, *CENTER, 30000.0)
+    return best_of(lambda: ranking.rank(places), 5)
+
+
+def bench_table_fill(ctx):
+    """Building the result store and loading it into the table model, then sorting by name."""
+    qt = ctx.qt_app()
+    from results_model import NAME_COLUMN, PlaceResultStore, ResultsTableModel
+
+    places = ctx.places(TABLE_ROWS)
+    model = ResultsTableModel()
+
+    def run():
+        model.sort(-1)
+        model.set_store(PlaceResultStore.from_places(places))
+        model.sort(NAME_COLUMN, qt.AscendingOrder)
+
+    return best_of(run, 3)
+
+
+def bench_rerank(ctx):
+    """Re-ranking 100k results in the table model with another scorer, as when the ranking is switched."""
+    ctx.qt_app()
+    from ranking import Ranking, get_scorer
+    from results_model import PlaceResultStore, ResultsTableModel
+
+    places = ctx.places(TABLE_ROWS)
+    model = ResultsTableModel()
+    model.set_store(PlaceResultStore.from_places(places))
+    rankings = [Ranking(get_scorer(name), *CENTER, 30000.0) for name in ("rating", "balanced")]
+    turn = [0]
+
+    def run():
+        model.rerank(rankings[turn[0] % 2])
+        turn[0] += 1
+
+    return best_of(run, 5)
+
+
+def bench_filter(ctx):
+    """Typing "pizza 1" into the live filter over 100k results, one filter per keystroke."""
+    ctx.qt_app()
+    from filter_index import ResultFilter
+    from results_model import PlaceResultStore, ResultsTableModel
+
+    kinds = ["Pizza", "Cafe", "Sushi Bar", "Bakery", "Bistro"]
+    places = [dict(place, displayName={"text": f"{kinds[i % len(kinds)]} {i}"},
+                   formattedAddress=f"{i % 300} Rue de Rivoli, Paris")
+              for i, place in enumerate(ctx.places(TABLE_ROWS))]
+    model = ResultsTableModel()
+    model.set_store(PlaceResultStore.from_places(places))
+    model.set_filter(ResultFilter("x"))  # the index is built once per result set
+
+    def run():
+        for length in range(1, len("pizza 1") + 1):
+            model.set_filter(ResultFilter("pizza 1"[:length]))
+        assert model.rowCount() == sum(1 for place in places if "pizza 1" in place["displayName"]["text"].casefold())
+        model.set_filter(None)
+
+    return best_of(run, 5)
+
+
+def bench_session_save_restore(ctx):
+    """Saving 100k results to the session store and reading them back in restore chunks."""
+    from session_store import SessionStore
+
+    places = ctx.places(SESSION_ROWS)
+    store = SessionStore(os.path.join(ctx.tmp, "bench_session.sqlite3"))
+
+    def run():
+        store.save(places)
+        restored = sum(len(chunk) for chunk, _ in store.iter_chunks(100, 2000))
+        assert restored == len(places)
+
+    try:
+        return best_of(run, 3)
+    finally:
+        store.close()
+
+
+def bench_export_csv(ctx):
+    """Exporting 100k places from the place store to CSV."""
+    from export import export_place_store
+
+    store = ctx.place_store(EXPORT_ROWS)
+    path = os.path.join(ctx.tmp, "bench_export.csv")
+
+    def run():
+        assert export_place_store(store, path) == EXPORT_ROWS
+
+    return best_of(run, 3)
+
+
+def bench_export_parquet(ctx):
+    """Exporting 100k places from the place store to Parquet."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise Skip("pyarrow is not installed")
+    from export import export_place_store
+
+    store = ctx.place_store(EXPORT_ROWS)
+    path = os.path.join(ctx.tmp, "bench_export.parquet")
+
+    def run():
+        assert export_place_store(store, path) == EXPORT_ROWS
+
+    return best_of(run, 3)
+
+
+def bench_settings_save_restore(ctx):
+    """Writing and reading back the scalar window settings through QSettings."""
+    ctx.qt_app()
+    from PySide6.QtCore import QSettings
+
+    settings = QSettings(os.path.join(ctx.tmp, "bench_settings.ini"), QSettings.IniFormat)
+    values = {"search_query": "cafe", "radius": 50, "sweep": True, "local_first": False,
+              "latitude": CENTER[0], "longitude": CENTER[1], "zoom": 12, "selected_row": 42}
+
+    def run():
+        for _ in range(100):
+            for key, value in values.items():
+                settings.setValue(key, value)
+            settings.sync()
+            for key in values:
+                settings.value(key)
+
+    return best_of(run, 3)
+
+
+def bench_daemon_shared_search(ctx):
+    """Eight clients asking a search daemon for the same search at once; the API sees one page chain."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from daemon_client import DaemonClient
+    from places_client import PlacesClient
+    from response_cache import ResponseCache
+    from search_daemon import SearchDaemon
+
+    client = PlacesClient("mock", base_url=ctx.server.base_url)
+    daemon = SearchDaemon(client, ResponseCache(":memory:"), page_token_pacer=ctx.pacer())
+    url = daemon.start_background()
+    clients = [DaemonClient(url) for _ in range(DAEMON_CLIENTS)]
+    runs = [0]
+
+    def search(daemon_client):
+        # A new query every run, so each run misses the daemon's cache
+        _, places, error = daemon_client.text_search(f"cafe {runs[0]}", *CENTER, radius=5000)
+        assert error is None and len(places) == 60, error
+
+    def run():
+        runs[0] += 1
+        requests_before = ctx.server.requests
+        with ThreadPoolExecutor(max_workers=DAEMON_CLIENTS) as pool:
+            list(pool.map(search, clients))
+        assert ctx.server.requests - requests_before == 3, "coalesced searches hit the server more than once"
+
+    try:
+        return best_of(run, 3)
+    finally:
+        for daemon_client in clients:
+            daemon_client.close()
+        daemon.stop()
+        client.close()
+
+
+def bench_import_app(ctx):
+    """Importing the main window module in a fresh interpreter, the part of a cold start before any window."""
+    try:
+        import PySide6.QtWidgets  # noqa: F401
+    except ImportError:
+        raise Skip("PySide6 is not installed")
+    src_dir = os.path.join(BENCH_DIR, "..", "src")
+    command = [sys.executable, "-c", "import search_maps"]
+
+    def run():
+        subprocess.run(command, cwd=src_dir, check=True, env=dict(os.environ, PYTHONPATH=src_dir))
+
+    return best_of(run, 3)
+
+
+CASES = [
+    ("search_pages", bench_search_pages),
+    ("search_multi_query", bench_search_multi_query),
+    ("search_throttled", bench_search_throttled),
+    ("search_token_wait", bench_search_token_wait),
+    ("search_cached", bench_search_cached),
+    ("search_after_pan", bench_search_after_pan),
+    ("search_sweep", bench_search_sweep),
+    ("details_prefetch", bench_details_prefetch),
+    ("rank_100k", bench_rank),
+    ("table_fill_100k", bench_table_fill),
+    ("rerank_100k", bench_rerank),
+    ("filter_100k", bench_filter),
+    ("session_save_restore_100k", bench_session_save_restore),
+    ("export_csv_100k", bench_export_csv),
+    ("export_parquet_100k", bench_export_parquet),
+    ("settings_save_restore", bench_settings_save_restore),
+    ("daemon_shared_search", bench_daemon_shared_search),
+    ("import_app", bench_import_app),
+]
+
+
+class Context:
+    """Shared state for the cases: the mock server, a temp directory and cached inputs."""
+
+    def __init__(self, server, tmp):
+        self.server = server
+        self.tmp = tmp
+        self._places = {}
+        self._place_stores = {}
+        self._app = None
+
+    @staticmethod
+    def pacer():
+        """Page token pacing for a mock server whose tokens are valid right away."""
+        from paging import PageTokenPacer
+        return PageTokenPacer(initial_delay=0, min_delay=0.01)
+
+    def places(self, n):
+        if n not in self._places:
+            self._places[n] = synthetic_places(n)
+        return self._places[n]
+
+    def place_store(self, n):
+        """A place store holding n places, filled once and shared by the cases."""
+        if n not in self._place_stores:
+            from place_store import PlaceStore
+
+            store = PlaceStore(os.path.join(self.tmp, f"bench_places_{n}.sqlite3"))
+            store.add_places(self.places(n), "cafe")
+            self._place_stores[n] = store
+        return self._place_stores[n]
+
+    def close(self):
+        for store in self._place_stores.values():
+            store.close()
+
+    def qt_app(self):
+        try:
+            os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+            from PySide6.QtCore import QCoreApplication, Qt
+        except ImportError:
+            raise Skip("PySide6 is not installed")
+        self._app = QCoreApplication.instance() or QCoreApplication([])
+        return Qt
+
+
+def load_baselines():
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", help="Run only cases whose name starts with one of these")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown factor over the baseline")
+    parser.add_argument("--update-baselines", action="store_true", help="Store the timings as the new baselines")
+    args = parser.parse_args()
+
+    baselines = load_baselines()
+    results = {}
+    regressions = []
+    tmp = tempfile.mkdtemp(prefix="searchmaps-bench-")
+    try:
+        with MockPlacesServer(places=20000) as server:
+            ctx = Context(server, tmp)
+            print(f"{'case':<28} {'ms':>10} {'baseline':>10} {'ratio':>7}")
+            for name, case in CASES:
+                if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                    continue
+                try:
+                    # The pipeline logs every page and retry, which would drown the table
+                    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                        elapsed = case(ctx)
+                except Skip as e:
+                    print(f"{name:<28} {'skipped':>10}  ({e})")
+                    continue
+                results[name] = round(elapsed, 2)
+                baseline = baselines.get(name)
+                if baseline is None:
+                    print(f"{name:<28} {elapsed:>10.1f} {'-':>10} {'-':>7}")
+                    continue
+                ratio = elapsed / baseline
+                flag = ""
+                if elapsed > baseline * args.tolerance and elapsed - baseline > NOISE_FLOOR_MS:
+                    regressions.append((name, elapsed, baseline))
+                    flag = "  REGRESSION"
+                print(f"{name:<28} {elapsed:>10.1f} {baseline:>10.1f} {ratio:>6.2f}x{flag}")
+            ctx.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if args.update_baselines:
+        baselines.update(results)
+        with open(BASELINES_PATH, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baselines written to {BASELINES_PATH}")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed beyond {args.tolerance}x of the baseline:")
+        for name, elapsed, baseline in regressions:
+            print(f"  {name}: {elapsed:.1f} ms (baseline {baseline:.1f} ms)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
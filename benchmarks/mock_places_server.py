@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Places API (New) places:searchText and Place Details endpoints.
+
+The server holds a synthetic world of places scattered around a center point.
+Each search returns the places inside its locationBias circle, 20 per page and
+at most 60 per search like the real API, with nextPageToken paging. Responses
+only carry the fields named in X-Goog-FieldMask. Latency,
+page token readiness and 429 responses can be configured to exercise the
+client's retries and pacing.
+
+    python benchmarks/mock_places_server.py [--port 8765] [--places 20000] [--latency 0.05] [--error-rate 0.1]
+    SEARCH_MAPS_API_BASE_URL=http://127.0.0.1:8765 ./search-maps batch ...
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+CENTER = (48.8584, 2.2945)
+SPREAD = 0.5  # degrees of latitude around CENTER that places are scattered over
+PAGE_SIZE = 20
+MAX_RESULTS = 60
+EARTH_RADIUS = 6371000.0
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+PRICE_LEVELS = ["PRICE_LEVEL_INEXPENSIVE", "PRICE_LEVEL_MODERATE", "PRICE_LEVEL_EXPENSIVE"]
+
+
+def synthetic_world(n, center=CENTER, spread=SPREAD, seed=42):
+    """n Places API dicts scattered uniformly around center; review counts follow a long tail."""
+    rng = random.Random(seed)
+    lng_spread = spread / max(math.cos(math.radians(center[0])), 0.01)
+    places = []
+    for i in range(n):
+        places.append({
+            "id": f"mock-{i}",
+            "displayName": {"text": f"Place {i}", "languageCode": "en"},
+            "formattedAddress": f"{i} Synthetic Street, Mock City",
+            "location": {
+                "latitude": center[0] + rng.uniform(-spread, spread),
+                "longitude": center[1] + rng.uniform(-lng_spread, lng_spread),
+            },
+            "rating": round(rng.uniform(1, 5), 1),
+            "userRatingCount": int(rng.paretovariate(1.2)),
+            "plusCode": {"globalCode": f"8FW4V{i:05d}+XX"},
+        })
+    return places
+
+
+def place_details(place, seed=42):
+    """The Place Details only fields of a place, generated on request so the world stays small."""
+    i = int(place["id"].rsplit("-", 1)[1])
+    rng = random.Random(seed * 1000003 + i)
+    return dict(
+        place,
+        nationalPhoneNumber=f"01 23 45 {i % 100:02d} {i // 100 % 100:02d}",
+        websiteUri=f"https://example.com/places/{i}",
+        googleMapsUri=f"https://maps.google.com/?cid={i}",
+        regularOpeningHours={
+            "weekdayDescriptions": [f"{day}: 8:00 AM – 6:00 PM" for day in WEEKDAYS],
+            "periods": [{"open": {"day": d, "hour": 8}, "close": {"day": d, "hour": 18}} for d in range(7)],
+        },
+        priceLevel=rng.choice(PRICE_LEVELS),
+        businessStatus="OPERATIONAL",
+        photos=[{"name": f"{place['id']}/photos/{k}", "widthPx": 1024, "heightPx": 768}
+                for k in range(rng.randint(0, 10))],
+        reviews=[{"rating": rng.randint(1, 5), "text": {"text": "Synthetic review text. " * 20}} for _ in range(5)],
+    )
+
+
+def apply_field_mask(data, field_mask, prefix=""):
+    """Copy of data with only the fields named in a comma-separated field mask ("*" keeps everything)."""
+    paths = [path.strip() for path in field_mask.split(",") if path.strip()]
+    if "*" in paths:
+        return data
+    kept = {}
+    for path in paths:
+        if prefix:
+            if not path.startswith(prefix):
+                continue
+            path = path[len(prefix):]
+        _copy_path(data, kept, path.split("."))
+    return kept
+
+
+def _copy_path(source, target, keys):
+    if not isinstance(source, dict) or keys[0] not in source:
+        return
+    key, value = keys[0], source[keys[0]]
+    if len(keys) == 1:
+        target[key] = value
+    elif isinstance(value, list):
+        items = target.setdefault(key, [{} for _ in value])
+        for item, kept in zip(value, items):
+            _copy_path(item, kept, keys[1:])
+    else:
+        _copy_path(value, target.setdefault(key, {}), keys[1:])
+
+
+def distance(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(a, 1.0)))
+
+
+class MockPlacesServer:
+    """
+    Threaded HTTP server speaking the searchText protocol on 127.0.0.1.
+    latency: seconds added to every response.
+    token_delay: seconds before a nextPageToken is accepted; earlier use gets a 400 like the real API.
+    error_rate: fraction of requests answered with 429 and a Retry-After of retry_after seconds.
+    """
+
+    def __init__(self, places=20000, port=0, latency=0.0, token_delay=0.0, error_rate=0.0, retry_after=0,
+                 seed=42):
+        self.world = synthetic_world(places, seed=seed)
+        self.seed = seed
+        self.by_id = {place["id"]: place for place in self.world}
+        self.latency = latency
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self.details_requests = 0
+        self.throttled = 0
+        self._rng = random.Random(seed)
+        self._tokens = {}  # token -> (results, offset, ready_at)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _throttle(self):
+        """Count a request; returns a 429 response for the throttled share of them, else None."""
+        with self._lock:
+            self.requests += 1
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.throttled += 1
+                return 429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}}
+        return None
+
+    def details(self, place_id, field_mask="*"):
+        """Return (status, response dict) for a Place Details request."""
+        throttled = self._throttle()
+        if throttled:
+            return throttled
+        with self._lock:
+            self.details_requests += 1
+        place = self.by_id.get(place_id)
+        if place is None:
+            return 404, {"error": {"code": 404, "status": "NOT_FOUND"}}
+        return 200, apply_field_mask(place_details(place, self.seed), field_mask)
+
+    def search(self, body, field_mask="*"):
+        """Return (status, response dict) for a searchText request body."""
+        throttled = self._throttle()
+        if throttled:
+            return throttled
+
+        token = body.get("pageToken")
+        if token:
+            with self._lock:
+                entry = self._tokens.get(token)
+            if entry is None or time.monotonic() < entry[2]:
+                return 400, {"error": {"code": 400, "status": "INVALID_ARGUMENT",
+                                       "message": "Request contains an invalid argument."}}
+            results, offset, _ = entry
+        else:
+            circle = body["locationBias"]["circle"]
+            lat = circle["center"]["latitude"]
+            lng = circle["center"]["longitude"]
+            radius = circle["radius"]
+            # Relevance stands in as popularity among the places near the center
+            results = [p for p in self.world
+                       if distance(lat, lng, p["location"]["latitude"], p["location"]["longitude"]) <= radius]
+            results.sort(key=lambda p: -p["userRatingCount"])
+            results = results[:MAX_RESULTS]
+            offset = 0
+
+        page_size = min(int(body.get("maxResultCount", PAGE_SIZE)), PAGE_SIZE)
+        response = {"places": [apply_field_mask(place, field_mask, "places.")
+                               for place in results[offset:offset + page_size]]}
+        if offset + page_size < len(results):
+            next_token = uuid.uuid4().hex
+            with self._lock:
+                self._tokens[next_token] = (results, offset + page_size, time.monotonic() + self.token_delay)
+            response["nextPageToken"] = next_token
+        return 200, response
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this every response waits for a delayed ACK
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                if self.path != "/v1/places:searchText":
+                    return self.respond(404, {"error": {"code": 404, "status": "NOT_FOUND"}})
+                if not self.headers.get("X-Goog-Api-Key"):
+                    return self.respond(403, {"error": {"code": 403, "status": "PERMISSION_DENIED"}})
+                try:
+                    body = json.loads(self.rfile.read(length))
+                except ValueError:
+                    return self.respond(400, {"error": {"code": 400, "status": "INVALID_ARGUMENT"}})
+                if server.latency:
+                    time.sleep(server.latency)
+                status, data = server.search(body, self.headers.get("X-Goog-FieldMask", "*"))
+                self.respond(status, data)
+
+            def do_GET(self):
+                if not self.path.startswith("/v1/places/"):
+                    return self.respond(404, {"error": {"code": 404, "status": "NOT_FOUND"}})
+                if not self.headers.get("X-Goog-Api-Key"):
+                    return self.respond(403, {"error": {"code": 403, "status": "PERMISSION_DENIED"}})
+                if server.latency:
+                    time.sleep(server.latency)
+                place_id = unquote(self.path[len("/v1/places/"):].split("?")[0])
+                status, data = server.details(place_id, self.headers.get("X-Goog-FieldMask", "*"))
+                self.respond(status, data)
+
+            def respond(self, status, data):
+                payload = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if status == 429:
+                    self.send_header("Retry-After", str(server.retry_after))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--places", type=int, default=20000, help="Size of the synthetic world")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--token-delay", type=float, default=2.0, help="Seconds before a page token is valid")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+
+    server = MockPlacesServer(places=args.places, port=args.port, latency=args.latency,
+                              token_delay=args.token_delay, error_rate=args.error_rate,
+                              retry_after=args.retry_after)
+    print(f"Mock Places API on {server.base_url} with {len(server.world)} places (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+// Clustered result markers for the SearchMaps Leaflet page.
+//
+// Places arrive from Python in columnar batches ({ids, names, lat, lng}) and are kept in flat
+// arrays together with their Web Mercator coordinates, so re-clustering after a pan or zoom is a
+// single pass over numbers. Points are binned into a screen-space grid; cells holding one place
+// are drawn as canvas circle markers, cells holding more as a count bubble. Only the visible
+// clusters are ever turned into Leaflet layers.
+(function () {
+    var CELL_SIZE = 60; // px
+    var INITIAL_CAPACITY = 1024;
+
+    function PlaceMarkers(map, onSelect) {
+        this.map = map;
+        this.onSelect = onSelect;
+        this.renderer = L.canvas({padding: 0.5});
+        this.layer = L.layerGroup().addTo(map);
+        this.highlightLayer = L.layerGroup().addTo(map);
+        this.renderScheduled = false;
+        this.highlightedId = null;
+        this.clear();
+
+        var self = this;
+        map.on('moveend', function () {
+            self.scheduleRender();
+        });
+    }
+
+    PlaceMarkers.prototype.clear = function () {
+        this.count = 0;
+        this.ids = [];
+        this.names = [];
+        this.lat = new Float64Array(INITIAL_CAPACITY);
+        this.lng = new Float64Array(INITIAL_CAPACITY);
+        this.worldX = new Float64Array(INITIAL_CAPACITY); // 0..1 across the Web Mercator world
+        this.worldY = new Float64Array(INITIAL_CAPACITY);
+        this.indexById = new Map();
+        this.highlightedId = null;
+        this.highlightLayer.clearLayers();
+        this.scheduleRender();
+    };
+
+    PlaceMarkers.prototype.grow = function (needed) {
+        var capacity = this.lat.length;
+        if (needed <= capacity) {
+            return;
+        }
+        while (capacity < needed) {
+            capacity *= 2;
+        }
+        ['lat', 'lng', 'worldX', 'worldY'].forEach(function (name) {
+            var bigger = new Float64Array(capacity);
+            bigger.set(this[name].subarray(0, this.count));
+            this[name] = bigger;
+        }, this);
+    };
+
+    PlaceMarkers.prototype.add = function (batch) {
+        var n = batch.ids.length;
+        this.grow(this.count + n);
+        for (var i = 0; i < n; i++) {
+            var id = batch.ids[i];
+            var index = this.indexById.get(id);
+            if (index === undefined) {
+                index = this.count++;
+                this.indexById.set(id, index);
+                this.ids[index] = id;
+            }
+            var lat = batch.lat[i];
+            var lng = batch.lng[i];
+            var sinLat = Math.sin(lat * Math.PI / 180);
+            this.names[index] = batch.names[i];
+            this.lat[index] = lat;
+            this.lng[index] = lng;
+            this.worldX[index] = (lng + 180) / 360;
+            this.worldY[index] = 0.5 - Math.log((1 + sinLat) / (1 - sinLat)) / (4 * Math.PI);
+        }
+        this.scheduleRender();
+        if (this.highlightedId !== null && this.indexById.has(this.highlightedId)) {
+            this.highlight(this.highlightedId, false);
+        }
+    };
+
+    PlaceMarkers.prototype.scheduleRender = function () {
+        if (this.renderScheduled) {
+            return;
+        }
+        this.renderScheduled = true;
+        var self = this;
+        requestAnimationFrame(function () {
+            self.renderScheduled = false;
+            self.render();
+        });
+    };
+
+    PlaceMarkers.prototype.render = function () {
+        var map = this.map;
+        this.layer.clearLayers();
+        if (this.count === 0) {
+            return;
+        }
+
+        var scale = 256 * Math.pow(2, map.getZoom());
+        var pixelBounds = map.getPixelBounds();
+        var pad = CELL_SIZE;
+        var minX = pixelBounds.min.x - pad, maxX = pixelBounds.max.x + pad;
+        var minY = pixelBounds.min.y - pad, maxY = pixelBounds.max.y + pad;
+
+        var cells = new Map();
+        for (var i = 0; i < this.count; i++) {
+            var x = this.worldX[i] * scale;
+            var y = this.worldY[i] * scale;
+            if (x < minX || x > maxX || y < minY || y > maxY) {
+                continue;
+            }
+            var key = Math.floor(x / CELL_SIZE) + ':' + Math.floor(y / CELL_SIZE);
+            var cell = cells.get(key);
+            if (cell === undefined) {
+                cells.set(key, {first: i, size: 1, sumLat: this.lat[i], sumLng: this.lng[i],
+                                south: this.lat[i], north: this.lat[i], west: this.lng[i], east: this.lng[i]});
+            } else {
+                cell.size++;
+                cell.sumLat += this.lat[i];
+                cell.sumLng += this.lng[i];
+                cell.south = Math.min(cell.south, this.lat[i]);
+                cell.north = Math.max(cell.north, this.lat[i]);
+                cell.west = Math.min(cell.west, this.lng[i]);
+                cell.east = Math.max(cell.east, this.lng[i]);
+            }
+        }
+
+        var self = this;
+        cells.forEach(function (cell) {
+            if (cell.size === 1) {
+                self.layer.addLayer(self.placeMarker(cell.first));
+            } else {
+                self.layer.addLayer(self.clusterMarker(cell));
+            }
+        });
+    };
+
+    PlaceMarkers.prototype.placeMarker = function (index) {
+        var self = this;
+        var id = this.ids[index];
+        var marker = L.circleMarker([this.lat[index], this.lng[index]], {
+            renderer: this.renderer,
+            radius: 6,
+            color: '#ffffff',
+            weight: 1.5,
+            fillColor: '#d9480f',
+            fillOpacity: 0.9
+        });
+        // A text node, since Leaflet renders string tooltips as HTML and names come from the API
+        marker.bindTooltip(document.createTextNode(this.names[index] || id));
+        marker.on('click', function () {
+            self.highlight(id, false);
+            self.onSelect(id);
+        });
+        return marker;
+    };
+
+    PlaceMarkers.prototype.clusterMarker = function (cell) {
+        var map = this.map;
+        var size = cell.size < 100 ? 30 : (cell.size < 1000 ? 36 : 44);
+        var label = cell.size < 10000 ? String(cell.size) : Math.round(cell.size / 1000) + 'k';
+        var marker = L.marker([cell.sumLat / cell.size, cell.sumLng / cell.size], {
+            icon: L.divIcon({
+                className: 'place-cluster',
+                html: '<div style="width:' + size + 'px;height:' + size + 'px;line-height:' + size + 'px">' + label + '</div>',
+                iconSize: [size, size]
+            })
+        });
+        var self = this;
+        var first = cell.first;
+        marker.on('click', function () {
+            var bounds = L.latLngBounds([cell.south, cell.west], [cell.north, cell.east]);
+            if (map.getZoom() >= map.getMaxZoom() || bounds.getNorthEast().equals(bounds.getSouthWest())) {
+                // Places at the same spot never split up, select the first one
+                self.highlight(self.ids[first], false);
+                self.onSelect(self.ids[first]);
+            } else {
+                map.fitBounds(bounds, {padding: [CELL_SIZE, CELL_SIZE]});
+            }
+        });
+        return marker;
+    };
+
+    PlaceMarkers.prototype.highlight = function (id, reveal) {
+        this.highlightedId = id;
+        this.highlightLayer.clearLayers();
+        var index = this.indexById.get(id);
+        if (index === undefined) {
+            return;
+        }
+        var latLng = L.latLng(this.lat[index], this.lng[index]);
+        L.circleMarker(latLng, {
+            renderer: this.renderer,
+            radius: 11,
+            color: '#1c7ed6',
+            weight: 3,
+            fill: false,
+            interactive: false
+        }).addTo(this.highlightLayer);
+        if (reveal && !this.map.getBounds().contains(latLng)) {
+            this.map.panTo(latLng);
+        }
+    };
+
+    window.PlaceMarkers = PlaceMarkers;
+})();
@@ -0,0 +1,141 @@
+"""
+Client of a local search daemon (see search_daemon).
+
+DaemonClient.text_search() stands in for search_core.google_maps_text_search() and get_place() for
+PlacesClient.get_place(), so the desktop app and the command line can send their searches and Place Details
+through a shared daemon instead of calling the Places API themselves. This module must not import PySide6.
+"""
+import json
+import os
+import threading
+from urllib.parse import quote
+
+from metrics import SearchTrace
+from places_client import PlacesApiError
+from ranking import DEFAULT_SCORER
+
+DAEMON_URL_ENV = "SEARCH_MAPS_DAEMON_URL"
+DEFAULT_TIMEOUT = 10.0  # seconds to connect and between two lines of a search; the daemon sends keepalives
+
+
+def default_daemon_url():
+    return os.environ.get(DAEMON_URL_ENV, "")
+
+
+def error_message(response):
+    try:
+        return response.json()["error"]
+    except (ValueError, KeyError, TypeError):
+        return f"Search daemon returned HTTP {response.status_code}"
+
+
+class DaemonClient:
+    """Talks to a search daemon at base_url, e.g. "http://127.0.0.1:8741". Safe to share between threads."""
+
+    def __init__(self, base_url, timeout=DEFAULT_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                import requests
+
+                self._session = requests.Session()
+            return self._session
+
+    def text_search(self, search_string, latitude, longitude, radius=30000.0, min_reviews=0, progress=None,
+                    cancel_event=None, sweep=False, local_first=False, on_page=None, trace=None, scorer=None,
+                    top_k=None, **local_options):
+        """
+        Run a search on the daemon. Takes the arguments of google_maps_text_search and returns the same
+        (original_ranks, places, error). The daemon has its own API client, response cache and place store,
+        so local_options such as client, cache and place_store are ignored. The stages and counters of the
+        daemon's run go to trace.
+        """
+        own_trace = trace is None
+        if own_trace:
+            trace = SearchTrace(search_string)
+        result = (None, None, None)
+        try:
+            result = self._text_search(
+                search_string, latitude, longitude, radius, min_reviews, progress, cancel_event, sweep,
+                local_first, on_page, trace, scorer, top_k
+            )
+            return result
+        finally:
+            if own_trace:
+                trace.finish(len(result[1] or []))
+
+    def _text_search(self, search_string, latitude, longitude, radius, min_reviews, progress, cancel_event, sweep,
+                     local_first, on_page, trace, scorer, top_k):
+        import requests
+
+        body = {
+            "query": search_string,
+            "lat": latitude,
+            "lng": longitude,
+            "radius": radius,
+            "min_reviews": min_reviews,
+            "sweep": sweep,
+            "local_first": local_first,
+            "rank": scorer.name if scorer is not None else DEFAULT_SCORER,
+            "top_k": top_k,
+        }
+        try:
+            response = self.session.post(self.base_url + "/search", json=body, stream=True, timeout=self.timeout)
+        except requests.RequestException as e:
+            return None, None, f"Search daemon at {self.base_url} is not reachable: {e}"
+        with response:
+            if response.status_code != 200:
+                return None, None, error_message(response)
+            try:
+                for line in response.iter_lines():
+                    # Leaving closes the connection, and the daemon drops a search nobody waits for
+                    if cancel_event is not None and cancel_event.is_set():
+                        return [], [], None
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    kind = event.get("event")
+                    if kind == "progress":
+                        if progress is not None:
+                            progress(event["text"])
+                    elif kind == "page":
+                        if on_page is not None:
+                            on_page(event["places"], event["original_ranks"], event["original_count"],
+                                    event["pages"])
+                    elif kind == "result":
+                        for stage, seconds in event.get("stages", {}).items():
+                            trace.add_time(stage, seconds)
+                        for counter, amount in event.get("counters", {}).items():
+                            trace.count(counter, amount)
+                        return event["original_ranks"], event["places"], None
+                    elif kind == "error":
+                        return None, None, event["error"]
+            except (requests.RequestException, ValueError) as e:
+                return None, None, f"Lost the connection to the search daemon: {e}"
+        return None, None, "The search daemon closed the connection before the search finished"
+
+    def get_place(self, place_id, field_mask, cancel_event=None, trace=None):
+        """GET the Place Details of one place through the daemon, like PlacesClient.get_place()."""
+        import requests
+
+        try:
+            response = self.session.get(
+                f"{self.base_url}/v1/places/{quote(place_id, safe='')}",
+                headers={"X-Goog-FieldMask": field_mask}, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise PlacesApiError(f"Search daemon at {self.base_url} is not reachable: {e}")
+        if response.status_code != 200:
+            raise PlacesApiError(error_message(response), status_code=response.status_code, body=response.text)
+        return response.json()
+
+    def close(self):
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
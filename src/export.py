@@ -0,0 +1,321 @@
+"""
+Streaming export of places to CSV, GeoJSON and Parquet or Arrow files.
+
+Places arrive in chunks and each chunk is written out before the next one is read, so memory use does
+not grow with the number of places. Columns come from the fields of a field mask. Stored places are
+read straight from the place store's columns as rows, without decoding each place's JSON.
+Parquet and Arrow need the optional pyarrow package. This module must not import PySide6.
+"""
+import json
+import os
+import queue
+import threading
+
+from search_core import SEARCH_FIELD_MASK
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+class ExportError(Exception):
+    """Raised when an export cannot be written."""
+
+
+class Column:
+    """
+    One exported column: its name, its kind ("string", "float" or "int"), how to read it from a
+    Places API dict, and the SQL expression reading it from a row of the place store's places table.
+    """
+
+    def __init__(self, name, kind, getter, sql):
+        self.name = name
+        self.kind = kind
+        self.get = getter
+        self.sql = sql
+
+
+def _field(field, kind, name):
+    def get(place):
+        value = place.get(field)
+        return value.get('text') if isinstance(value, dict) else value
+    return Column(name, kind, get, f"json_extract(data, '$.{field}')")
+
+
+def _location(key):
+    return lambda place: place.get('location', {}).get(key)
+
+
+# Place fields, as named in a field mask, and the columns each one exports to
+FIELD_COLUMNS = {
+    "id": [Column("id", "string", lambda place: place.get('id'), "place_id")],
+    "displayName": [Column("name", "string", lambda place: place.get('displayName', {}).get('text'), "name")],
+    "formattedAddress": [Column("address", "string", lambda place: place.get('formattedAddress'), "address")],
+    "rating": [Column("rating", "float", lambda place: place.get('rating'), "rating")],
+    "userRatingCount": [Column("review_count", "int", lambda place: place.get('userRatingCount'), "review_count")],
+    "location": [Column("latitude", "float", _location('latitude'), "latitude"),
+                 Column("longitude", "float", _location('longitude'), "longitude")],
+    "nationalPhoneNumber": [_field("nationalPhoneNumber", "string", "phone")],
+    "websiteUri": [_field("websiteUri", "string", "website")],
+    "googleMapsUri": [_field("googleMapsUri", "string", "google_maps_url")],
+    "priceLevel": [_field("priceLevel", "string", "price_level")],
+    "businessStatus": [_field("businessStatus", "string", "business_status")],
+    "plusCode": [Column("plus_code", "string", lambda place: place.get('plusCode', {}).get('globalCode'),
+                        "json_extract(data, '$.plusCode.globalCode')")],
+}
+# Added by the search rather than the API; the place store knows every query that found a place
+MATCHED_QUERIES_COLUMN = Column(
+    "matched_queries", "string", lambda place: "; ".join(place.get('matchedQueries') or ()) or None,
+    "(SELECT group_concat(query, '; ') FROM place_queries WHERE place_rowid = places.rowid)"
+)
+
+
+def columns_for_field_mask(field_mask=SEARCH_FIELD_MASK, matched_queries=True):
+    """Columns for the fields named in a field mask ("places." prefixes allowed), in mask order."""
+    columns = []
+    seen = set()
+    for path in field_mask.split(","):
+        field = path.strip()
+        if field.startswith("places."):
+            field = field[len("places."):]
+        field = field.split(".")[0]
+        if field in FIELD_COLUMNS and field not in seen:
+            seen.add(field)
+            columns.extend(FIELD_COLUMNS[field])
+    if matched_queries:
+        columns.append(MATCHED_QUERIES_COLUMN)
+    return columns
+
+
+def columns_by_name(names):
+    """Columns picked by their export names, e.g. ["name", "rating", "latitude"]."""
+    known = {column.name: column for columns in FIELD_COLUMNS.values() for column in columns}
+    known[MATCHED_QUERIES_COLUMN.name] = MATCHED_QUERIES_COLUMN
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ExportError(f"Unknown column(s): {', '.join(unknown)}. Known columns: {', '.join(known)}")
+    return [known[name] for name in names]
+
+
+def iter_chunks(places, size=DEFAULT_CHUNK_SIZE):
+    """Split a list of places into export chunks."""
+    for start in range(0, len(places), size):
+        yield places[start:start + size]
+
+
+def place_rows(places, columns):
+    """Rows of column values, one tuple per place."""
+    getters = [column.get for column in columns]
+    return [tuple(get(place) for get in getters) for place in places]
+
+
+class CsvWriter:
+    def __init__(self, f, columns):
+        import csv
+
+        self._writer = csv.writer(f)
+        self._writer.writerow([column.name for column in columns])
+
+    def write(self, rows):
+        # None is written as an empty field
+        self._writer.writerows(rows)
+
+    def close(self):
+        pass
+
+
+class GeoJsonWriter:
+    """A FeatureCollection written feature by feature; places without coordinates get a null geometry."""
+
+    def __init__(self, f, columns):
+        self._f = f
+        names = [column.name for column in columns]
+        self._latitude = names.index("latitude")
+        self._longitude = names.index("longitude")
+        self._properties = [(i, name) for i, name in enumerate(names) if name not in ("latitude", "longitude")]
+        self._first = True
+        f.write('{"type":"FeatureCollection","features":[\n')
+
+    def write(self, rows):
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+        lines = []
+        for row in rows:
+            lat = row[self._latitude]
+            lng = row[self._longitude]
+            lines.append(dumps({
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lng, lat]} if lat is not None and lng is not None
+                else None,
+                "properties": {name: row[i] for i, name in self._properties},
+            }))
+        if lines:
+            self._f.write(("" if self._first else ",\n") + ",\n".join(lines))
+            self._first = False
+
+    def close(self):
+        self._f.write("\n]}\n")
+
+
+class ArrowWriter:
+    """Parquet (one row group per chunk) or Arrow IPC file, through pyarrow."""
+
+    def __init__(self, path, columns, file_format):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ExportError(f"{file_format.capitalize()} export needs pyarrow (pip install pyarrow)")
+        self._pa = pa
+        types = {"string": pa.string(), "float": pa.float64(), "int": pa.int64()}
+        self.schema = pa.schema([(column.name, types[column.kind]) for column in columns])
+        if file_format == "parquet":
+            self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema)
+
+    def write(self, rows):
+        if not rows:
+            return
+        pa = self._pa
+        self._writer.write_batch(pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(zip(*rows), self.schema)],
+            schema=self.schema
+        ))
+
+    def close(self):
+        self._writer.close()
+
+
+def read_ahead(chunks, depth=2):
+    """
+    Iterate over chunks while a background thread already reads the next ones. SQLite runs without
+    the GIL, so reading the next chunk from a store overlaps with writing the current one.
+    """
+    pending = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+
+    def read():
+        try:
+            for chunk in chunks:
+                if stop.is_set():
+                    return
+                pending.put((chunk, None))
+        except Exception as e:
+            pending.put((None, e))
+        pending.put((done, None))
+
+    thread = threading.Thread(target=read, name="export-read-ahead", daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk, error = pending.get()
+            if error is not None:
+                raise error
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        # Unblock the reader if the export stopped early
+        stop.set()
+        while thread.is_alive():
+            try:
+                pending.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".geojson": "geojson",
+    ".json": "geojson",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+}
+FORMATS = ["csv", "geojson", "parquet", "arrow"]
+
+
+def format_for_path(path):
+    """Export format implied by a file name."""
+    file_format = FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if file_format is None:
+        raise ExportError(f"Cannot tell the export format of {path}; use one of {', '.join(FORMAT_EXTENSIONS)}")
+    return file_format
+
+
+def export_columns(file_format, columns=None):
+    """The columns an export writes: by default those of the search field mask. GeoJSON always gets coordinates."""
+    columns = list(columns or columns_for_field_mask())
+    if file_format == "geojson":
+        names = {column.name for column in columns}
+        columns += [column for column in FIELD_COLUMNS["location"] if column.name not in names]
+    return columns
+
+
+def export_places(chunks, path, file_format=None, columns=None, progress=None, cancel_event=None):
+    """
+    Write chunks (lists of Places API dicts) to path and return how many places were written.
+    file_format is one of FORMATS, by default taken from the file extension. progress(count) is
+    called after every chunk and setting cancel_event stops the export, leaving path untouched.
+    """
+    file_format = file_format or format_for_path(path)
+    columns = export_columns(file_format, columns)
+    return export_rows((place_rows(chunk, columns) for chunk in chunks), path, file_format, columns,
+                       progress, cancel_event)
+
+
+def export_place_store(place_store, path, file_format=None, columns=None, progress=None, cancel_event=None,
+                       chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write every place of a place_store.PlaceStore to path, like export_places."""
+    file_format = file_format or format_for_path(path)
+    columns = export_columns(file_format, columns)
+    chunks = read_ahead(place_store.iter_rows([column.sql for column in columns], chunk_size))
+    return export_rows(chunks, path, file_format, columns, progress, cancel_event)
+
+
+def export_session_store(session_store, path, file_format=None, columns=None, progress=None, cancel_event=None,
+                         chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write the result set saved in a session_store.SessionStore to path in ranking order, like export_places."""
+    chunks = (places for places, _ in session_store.iter_chunks(chunk_size, chunk_size))
+    return export_places(chunks, path, file_format, columns, progress, cancel_event)
+
+
+def export_rows(chunks, path, file_format, columns, progress=None, cancel_event=None):
+    """
+    Write chunks of rows (tuples of column values) to path and return how many were written.
+    The file is written under a temporary name and only replaces path once complete.
+    """
+    if file_format not in FORMATS:
+        raise ExportError(f"Unknown export format {file_format}; use one of {', '.join(FORMATS)}")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    f = None
+    count = 0
+    try:
+        if file_format in ("parquet", "arrow"):
+            writer = ArrowWriter(tmp_path, columns, file_format)
+        else:
+            f = open(tmp_path, "w", encoding="utf-8", newline="")
+            writer = (CsvWriter if file_format == "csv" else GeoJsonWriter)(f, columns)
+        try:
+            for rows in chunks:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportError("Export cancelled")
+                writer.write(rows)
+                count += len(rows)
+                if progress is not None:
+                    progress(count)
+        finally:
+            writer.close()
+        if f is not None:
+            f.close()
+            f = None
+        os.replace(tmp_path, path)
+    except OSError as e:
+        raise ExportError(f"Could not write {path}: {e}") from e
+    finally:
+        if f is not None:
+            f.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
@@ -0,0 +1,132 @@
+"""
+Live filtering of a result set by name or address substring and by rating and review count bounds.
+This module must not import PySide6.
+"""
+from bisect import bisect_right
+from itertools import accumulate
+
+SEPARATOR = "\0"  # between the keys of two places; never part of a query
+MIN_SCAN_LENGTH = 3  # shorter queries hit nearly every row, testing each key is faster than scanning
+MAX_SCAN_SHARE = 0.1  # above this share of places hit, testing each key is faster than jumping between hits
+
+
+def search_key(name, address):
+    """Case-folded text a place is matched against."""
+    return f"{name}\n{address}".casefold()
+
+
+class ResultFilter:
+    """What the results are narrowed to. None means unbounded."""
+
+    def __init__(self, text="", min_rating=None, max_rating=None, min_reviews=None, max_reviews=None):
+        self.text = text.strip().casefold()
+        self.min_rating = min_rating
+        self.max_rating = max_rating
+        self.min_reviews = min_reviews
+        self.max_reviews = max_reviews
+
+    def is_empty(self):
+        return not self.text and self.has_no_bounds()
+
+    def has_no_bounds(self):
+        return all(bound is None for bound in (self.min_rating, self.max_rating, self.min_reviews, self.max_reviews))
+
+    def matches(self, name, address, rating, count):
+        """Test one place; rating is NaN and count negative when unknown."""
+        if self.text and self.text not in search_key(name, address):
+            return False
+        return self.matches_bounds(rating, count)
+
+    def matches_bounds(self, rating, count):
+        if self.min_rating is not None and not rating >= self.min_rating:
+            return False
+        if self.max_rating is not None and not rating <= self.max_rating:
+            return False
+        if self.min_reviews is not None and count < self.min_reviews:
+            return False
+        if self.max_reviews is not None and (count < 0 or count > self.max_reviews):
+            return False
+        return True
+
+    def bounds_mask(self, ratings, counts):
+        """Boolean numpy mask of the rows within the numeric bounds (NaN ratings fail rating bounds)."""
+        import numpy as np
+
+        mask = np.ones(len(ratings), dtype=bool)
+        if self.min_rating is not None:
+            mask &= ratings >= self.min_rating
+        if self.max_rating is not None:
+            mask &= ratings <= self.max_rating
+        if self.min_reviews is not None:
+            mask &= counts >= self.min_reviews
+        if self.max_reviews is not None:
+            mask &= (counts >= 0) & (counts <= self.max_reviews)
+        return mask
+
+
+class SubstringIndex:
+    """
+    Search keys of a result set, keyed by each place's original rank so rows can move underneath.
+
+    The keys are joined into one string with the offset each one starts at, built once and extended
+    as places are added. A query is answered by str.find over the joined text, which runs in C and
+    jumps to the next place after every hit; a query that extends the previous one only tests the
+    places that matched before, so typing a word narrows the candidates keystroke by keystroke.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._ranks = []
+        self._text = None  # joined keys, rebuilt after places were added
+        self._starts = None
+        self._rank_array = None
+        self._last_query = None
+        self._last_matches = None  # positions in _keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, original_rank, name, address):
+        self.extend([original_rank], [name], [address])
+
+    def extend(self, original_ranks, names, addresses):
+        self._keys.extend(search_key(name, address) for name, address in zip(names, addresses))
+        self._ranks.extend(original_ranks)
+        self._text = None
+        self._rank_array = None
+        self._last_query = None
+
+    def search(self, query):
+        """Original ranks of the places whose key contains query (already case-folded), as a numpy array."""
+        import numpy as np
+
+        keys = self._keys
+        if self._last_query is not None and self._last_query in query:
+            matches = [i for i in self._last_matches if query in keys[i]]
+        elif len(query) < MIN_SCAN_LENGTH:
+            matches = [i for i, key in enumerate(keys) if query in key]
+        else:
+            if self._text is None:
+                self._text = SEPARATOR.join(keys) + SEPARATOR
+                self._starts = [0] + list(accumulate(len(key) + 1 for key in keys))
+            if self._text.count(query) > MAX_SCAN_SHARE * len(keys):
+                matches = [i for i, key in enumerate(keys) if query in key]
+            else:
+                matches = self._scan(query)
+        self._last_query = query
+        self._last_matches = matches
+        if self._rank_array is None:
+            self._rank_array = np.array(self._ranks, dtype=np.intp)
+        return self._rank_array[np.array(matches, dtype=np.intp)]
+
+    def _scan(self, query):
+        text = self._text
+        starts = self._starts
+        matches = []
+        position = text.find(query)
+        while position != -1:
+            row = bisect_right(starts, position) - 1
+            matches.append(row)
+            # One hit per place is enough
+            position = text.find(query, starts[row + 1])
+        return matches
@@ -0,0 +1,84 @@
+import math
+
+EARTH_RADIUS = 6371000  # meters
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Calculate the great-circle distance between two points (in meters)."""
+    R = EARTH_RADIUS
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return R * c
+
+
+def offset_point(latitude, longitude, north, east):
+    """Move a point by the given offsets in meters (equirectangular approximation)."""
+    dlat = math.degrees(north / EARTH_RADIUS)
+    dlng = math.degrees(east / (EARTH_RADIUS * max(math.cos(math.radians(latitude)), 1e-6)))
+    lng = ((longitude + dlng + 180) % 360) - 180
+    return latitude + dlat, lng
+
+
+def haversine_distances(latitude, longitude, latitudes, longitudes):
+    """Vectorized haversine: distances (in meters) from one point to arrays of points."""
+    import numpy as np
+
+    phi1 = np.radians(latitude)
+    phi2 = np.radians(latitudes)
+    dphi = phi2 - phi1
+    dlambda = np.radians(longitudes - longitude)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def within_radius(latitude, longitude, radius, latitudes, longitudes):
+    """
+    Boolean mask of the points within radius meters of the center.
+    A cheap bounding-box test runs first; the exact distance is only computed for points inside the box.
+    """
+    import numpy as np
+
+    dlat = math.degrees(radius / EARTH_RADIUS)
+    cos_lat = math.cos(math.radians(min(abs(latitude) + dlat, 90.0)))
+    dlng = math.degrees(radius / (EARTH_RADIUS * cos_lat)) if cos_lat > 1e-9 else 360.0
+
+    mask = np.abs(latitudes - latitude) <= dlat
+    if dlng < 180.0:
+        # Wrapped longitude difference handles boxes crossing the antimeridian
+        mask &= np.abs((longitudes - longitude + 180.0) % 360.0 - 180.0) <= dlng
+    candidates = np.flatnonzero(mask)
+    if len(candidates):
+        distances = haversine_distances(latitude, longitude, latitudes[candidates], longitudes[candidates])
+        mask[candidates] = distances <= radius
+    return mask
+
+
+def top_k_indices(scores, k=None):
+    """Indices of the k highest scores, best first. Uses a partial partition instead of a full sort."""
+    import numpy as np
+
+    n = len(scores)
+    if k is None or k >= n:
+        return np.argsort(-scores, kind="stable")
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def place_arrays(places):
+    """Extract latitude, longitude, review count and rating arrays from Places API dicts."""
+    import numpy as np
+
+    n = len(places)
+    nan = float("nan")
+    latitudes = np.fromiter((p.get('location', {}).get('latitude', nan) for p in places), float, count=n)
+    longitudes = np.fromiter((p.get('location', {}).get('longitude', nan) for p in places), float, count=n)
+    counts = np.fromiter((p.get('userRatingCount', 0) for p in places), float, count=n)
+    ratings = np.fromiter((p.get('rating', 0) for p in places), float, count=n)
+    return latitudes, longitudes, counts, ratings
+
@@ -0,0 +1,124 @@
+import mimetypes
+import os
+
+from PySide6.QtCore import QBuffer, QFile, QIODevice, QUrl
+from PySide6.QtNetwork import QNetworkAccessManager, QNetworkReply, QNetworkRequest
+from PySide6.QtWebEngineCore import QWebEngineUrlRequestJob, QWebEngineUrlScheme, QWebEngineUrlSchemeHandler
+
+from tile_cache import TILE_USER_AGENT, tile_key, tile_url
+
+SCHEME = b"searchmaps"
+ASSETS_HOST = "assets"
+TILES_HOST = "tiles"
+MAP_PAGE_URL = QUrl("searchmaps://assets/map.html")
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+
+def register_map_scheme():
+    """Register the searchmaps:// scheme. Must run before the QApplication is created."""
+    scheme = QWebEngineUrlScheme(SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(
+        QWebEngineUrlScheme.Flag.SecureScheme
+        | QWebEngineUrlScheme.Flag.LocalAccessAllowed
+        | QWebEngineUrlScheme.Flag.CorsEnabled
+    )
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+class MapSchemeHandler(QWebEngineUrlSchemeHandler):
+    """
+    Serves the map page without touching the network where possible:
+    searchmaps://assets/... returns the page, the bundled Leaflet files and qwebchannel.js;
+    searchmaps://tiles/{z}/{x}/{y}{r}.png returns basemap tiles from the TileCache,
+    downloading and caching tiles that are not on disk yet.
+    """
+
+    def __init__(self, page_html, tile_cache, parent=None):
+        super().__init__(parent)
+        self.page_html = page_html.encode("utf-8")
+        self.tile_cache = tile_cache
+        self.network = QNetworkAccessManager(self)
+        self._pending = {}  # QNetworkReply -> (job, cache key)
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        host = url.host()
+        path = url.path().lstrip("/")
+        if host == ASSETS_HOST:
+            self.serve_asset(job, path)
+        elif host == TILES_HOST:
+            self.serve_tile(job, path)
+        else:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+
+    def serve_asset(self, job, path):
+        if path == "map.html":
+            self.reply(job, b"text/html", self.page_html)
+            return
+        if path == "qwebchannel.js":
+            resource = QFile(":/qtwebchannel/qwebchannel.js")
+            if resource.open(QIODevice.ReadOnly):
+                self.reply(job, b"application/javascript", bytes(resource.readAll()))
+                return
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+
+        full_path = os.path.normpath(os.path.join(ASSETS_DIR, path))
+        if not full_path.startswith(ASSETS_DIR + os.sep) or not os.path.isfile(full_path):
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        with open(full_path, "rb") as f:
+            data = f.read()
+        content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        self.reply(job, content_type.encode("ascii"), data)
+
+    def serve_tile(self, job, path):
+        # path is "{z}/{x}/{y}{r}.png"
+        try:
+            z, x, name = path.split("/")
+            y, _, r = name[:-len(".png")].partition("@")
+            z, x, y = int(z), int(x), int(y)
+            r = "@" + r if r else ""
+        except ValueError:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+
+        key = tile_key(z, x, y, r)
+        data = self.tile_cache.get(key)
+        if data is not None:
+            self.reply(job, b"image/png", data)
+            return
+
+        request = QNetworkRequest(QUrl(tile_url(z, x, y, r)))
+        request.setHeader(QNetworkRequest.UserAgentHeader, TILE_USER_AGENT)
+        network_reply = self.network.get(request)
+        self._pending[network_reply] = (job, key)
+        network_reply.finished.connect(lambda: self.on_tile_downloaded(network_reply))
+        # The page may drop the request (e.g. tiles scrolled away) before the download finishes
+        job.destroyed.connect(lambda: self.on_job_destroyed(network_reply))
+
+    def on_tile_downloaded(self, network_reply):
+        job, key = self._pending.pop(network_reply, (None, None))
+        network_reply.deleteLater()
+        if network_reply.error() != QNetworkReply.NoError:
+            if job is not None:
+                job.fail(QWebEngineUrlRequestJob.Error.RequestFailed)
+            return
+        data = bytes(network_reply.readAll())
+        self.tile_cache.put(key, data)
+        if job is not None:
+            self.reply(job, b"image/png", data)
+
+    def on_job_destroyed(self, network_reply):
+        if network_reply in self._pending:
+            # Keep downloading so the tile still ends up in the cache, just don't answer
+            self._pending[network_reply] = (None, self._pending[network_reply][1])
+
+    @staticmethod
+    def reply(job, content_type, data):
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        buffer.open(QIODevice.ReadOnly)
+        job.reply(content_type, buffer)
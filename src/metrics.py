@@ -0,0 +1,285 @@
+"""
+Timing and counters for the search pipeline.
+
+A SearchTrace collects the stage timings and counters of one search and also
+feeds them into a MetricsRegistry, which accumulates totals and latency
+histograms across searches and exports them as JSON lines or as a Prometheus
+textfile. This module must not import PySide6.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEFAULT_WINDOW = 1000  # recent observations kept for percentiles
+
+# Stages in the order they are shown in a search summary
+STAGE_LABELS = [
+    ("local", "local"),
+    ("cache", "cache"),
+    ("http", "http"),
+    ("decode", "decode"),
+    ("page_wait", "wait"),
+    ("rank", "rank"),
+    ("store", "store"),
+    ("table", "table"),
+    ("session", "session"),
+]
+
+
+class Histogram:
+    """Cumulative bucket counts for export plus a rolling window of recent values for percentiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=DEFAULT_WINDOW):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        """q-quantile of the recent window, or None when empty."""
+        if not self.recent:
+            return None
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(math.ceil(q * len(values))) - 1 if q > 0 else 0)]
+
+    def cumulative_counts(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by metric name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._help = {}
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def snapshot(self):
+        """Counters and histogram summaries (count, sum, p50, p95) as plain dicts."""
+        with self._lock:
+            counters = {name + _label_text(labels): value for (name, labels), value in self._counters.items()}
+            histograms = {
+                name + _label_text(labels): {
+                    "count": h.count,
+                    "sum": round(h.sum, 6),
+                    "p50": h.quantile(0.5),
+                    "p95": h.quantile(0.95),
+                }
+                for (name, labels), h in self._histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def prometheus_text(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            described = set()
+
+            def header(name, kind):
+                if name in described:
+                    return
+                described.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+            for (name, labels), value in counters:
+                header(name, "counter")
+                lines.append(f"{name}{_label_text(labels)} {value}")
+            for (name, labels), h in histograms:
+                header(name, "histogram")
+                for bound, total in h.cumulative_counts():
+                    lines.append(f"{name}_bucket{_label_text(labels + (('le', repr(bound)),))} {total}")
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', '+Inf'),))} {h.count}")
+                lines.append(f"{name}_sum{_label_text(labels)} {h.sum}")
+                lines.append(f"{name}_count{_label_text(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write a textfile for node_exporter's textfile collector, replacing it atomically."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("searchmaps_searches_total", "Searches run.")
+REGISTRY.describe("searchmaps_api_requests_total", "Places API HTTP requests, including retries.")
+REGISTRY.describe("searchmaps_api_errors_total", "Places API requests that did not return 200.")
+REGISTRY.describe("searchmaps_api_response_bytes_total", "Bytes received from the Places API.")
+REGISTRY.describe("searchmaps_cache_hits_total", "Result pages answered from the response cache.")
+REGISTRY.describe("searchmaps_cache_misses_total", "Searches whose pages were not all cached.")
+REGISTRY.describe("searchmaps_places_total", "Places returned by searches.")
+REGISTRY.describe("searchmaps_stage_seconds", "Time spent per pipeline stage.")
+REGISTRY.describe("searchmaps_search_seconds", "Wall time of whole searches.")
+
+
+class SearchTrace:
+    """
+    Stage timings and counters of one search. Every span and counter is also recorded in the registry.
+    Safe to share between the threads of a sweep; stage times then add up across threads.
+    """
+
+    def __init__(self, query="", registry=REGISTRY):
+        self.query = query
+        self.registry = registry
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.elapsed = None
+        self.stages = {}  # stage -> seconds
+        self.counters = {}  # counter -> value
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        self.registry.observe("searchmaps_stage_seconds", seconds, stage=stage)
+
+    def count(self, counter, amount=1, **labels):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+        self.registry.inc(f"searchmaps_{counter}_total", amount, **labels)
+
+    def finish(self, places=0):
+        """Close the trace once the search is done (or failed)."""
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self._start
+            self.registry.inc("searchmaps_searches_total")
+            self.registry.inc("searchmaps_places_total", places)
+            self.registry.observe("searchmaps_search_seconds", self.elapsed)
+        return self
+
+    def summary(self):
+        """Compact one-line breakdown, e.g. "1.92 s: 3 requests, http 410 ms, wait 1.50 s, rank 2 ms"."""
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self._start
+        parts = []
+        requests = self.counters.get("api_requests", 0)
+        if requests:
+            parts.append(f"{requests} request{'s' if requests != 1 else ''}")
+        hits = self.counters.get("cache_hits", 0)
+        if hits:
+            parts.append(f"{hits} cached page{'s' if hits != 1 else ''}")
+        for stage, label in STAGE_LABELS:
+            seconds = self.stages.get(stage)
+            if seconds is not None and seconds >= 0.0005:
+                parts.append(f"{label} {format_seconds(seconds)}")
+        return f"{format_seconds(elapsed)}: " + ", ".join(parts) if parts else format_seconds(elapsed)
+
+    def to_record(self):
+        with self._lock:
+            return {
+                "time": round(self.started_at, 3),
+                "query": self.query,
+                "elapsed": None if self.elapsed is None else round(self.elapsed, 6),
+                "stages": {stage: round(seconds, 6) for stage, seconds in self.stages.items()},
+                "counters": dict(self.counters),
+            }
+
+
+class StartupTrace:
+    """
+    Milestones of one application start (e.g. window, table, map), in seconds since started_at,
+    a time.perf_counter() value taken as early as possible.
+    """
+
+    def __init__(self, started_at, registry=REGISTRY):
+        self.started_at = started_at
+        self.registry = registry
+        self.time = time.time()
+        self.milestones = {}  # name -> seconds
+
+    def mark(self, milestone):
+        """Record a milestone the first time it is reached."""
+        if milestone not in self.milestones:
+            seconds = time.perf_counter() - self.started_at
+            self.milestones[milestone] = seconds
+            self.registry.observe("searchmaps_startup_seconds", seconds, milestone=milestone)
+
+    def summary(self):
+        """e.g. "window 180 ms, table 210 ms, map 1.42 s"."""
+        return ", ".join(f"{name} {format_seconds(seconds)}" for name, seconds in self.milestones.items())
+
+    def to_record(self):
+        return {
+            "time": round(self.time, 3),
+            "startup": {name: round(seconds, 6) for name, seconds in self.milestones.items()},
+        }
+
+
+def format_seconds(seconds):
+    if seconds < 1.0:
+        return f"{seconds * 1000:.0f} ms"
+    return f"{seconds:.2f} s"
+
+
+def append_jsonl(path, record):
+    """Append one JSON record to a JSON lines file."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+
+def export_trace(trace, jsonl_path=None, textfile_path=None, registry=REGISTRY):
+    """Append a finished trace to a JSON lines file and/or rewrite the Prometheus textfile."""
+    if jsonl_path:
+        append_jsonl(jsonl_path, trace.to_record())
+    if textfile_path:
+        registry.write_prometheus(textfile_path)
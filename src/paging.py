@@ -0,0 +1,78 @@
+import threading
+import time
+
+DEFAULT_INITIAL_DELAY = 1.0  # seconds, first guess before anything was observed
+DEFAULT_MIN_DELAY = 0.2  # seconds
+DEFAULT_MAX_WAIT = 10.0  # seconds a token may take to become valid before the search gives up on it
+DEFAULT_BACKOFF = 2.0
+PROBE_FACTOR = 0.95  # how much earlier to try after a token was ready at the first attempt
+SAFETY_MARGIN = 1.1  # applied to the wait observed when a token needed retries
+SMOOTHING = 0.5  # weight of a new observation in the readiness estimate
+
+
+class PageTokenPacer:
+    """
+    Decides when to use a nextPageToken. The first attempt is made after the current estimate of
+    how long tokens take to become valid; when the API answers that the token is not ready yet,
+    attempts are retried with exponential backoff until max_wait.
+
+    The estimate is learned across searches: a token that was already valid at the first attempt
+    moves the estimate a bit earlier, one that needed retries moves it towards the observed wait.
+    Safe to share between threads.
+    """
+
+    def __init__(self, initial_delay=DEFAULT_INITIAL_DELAY, min_delay=DEFAULT_MIN_DELAY,
+                 max_wait=DEFAULT_MAX_WAIT, backoff=DEFAULT_BACKOFF):
+        self.estimate = max(initial_delay, min_delay)
+        self.min_delay = min_delay
+        self.max_wait = max_wait
+        self.backoff = backoff
+        self.observations = 0
+        self._lock = threading.Lock()
+
+    def first_delay(self):
+        with self._lock:
+            return self.estimate
+
+    def retry_delay(self, attempt, waited):
+        """Delay before retry number attempt (1-based), or None when max_wait would be exceeded."""
+        if waited >= self.max_wait:
+            return None
+        with self._lock:
+            step = max(self.min_delay, self.estimate / 4)
+        delay = step * self.backoff ** (attempt - 1)
+        return min(delay, self.max_wait - waited)
+
+    def record(self, waited, attempts):
+        """Learn from a token that became usable after waited seconds and attempts requests."""
+        with self._lock:
+            if attempts == 1:
+                self.estimate = max(self.min_delay, self.estimate * PROBE_FACTOR)
+            else:
+                observed = waited * SAFETY_MARGIN
+                self.estimate = max(self.min_delay, (1 - SMOOTHING) * self.estimate + SMOOTHING * observed)
+            self.observations += 1
+            return self.estimate
+
+
+class TokenWait:
+    """Timing of one page token from the moment it was received."""
+
+    def __init__(self, pacer):
+        self.pacer = pacer
+        self.started = time.monotonic()
+        self.attempts = 0
+
+    def waited(self):
+        return time.monotonic() - self.started
+
+    def next_delay(self):
+        """Seconds to sleep before the next attempt, or None to give up."""
+        self.attempts += 1
+        if self.attempts == 1:
+            return max(0.0, self.pacer.first_delay() - self.waited())
+        return self.pacer.retry_delay(self.attempts - 1, self.waited())
+
+
+# Shared by every search in the process, so what one search learns speeds up the next
+DEFAULT_PAGE_TOKEN_PACER = PageTokenPacer()
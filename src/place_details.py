@@ -0,0 +1,150 @@
+"""
+Place Details fetched on demand. List searches only ask for the fields needed to rank and show rows
+(see search_core.SEARCH_FIELD_MASK); the richer, more expensive fields are loaded per place here.
+This module must not import PySide6.
+"""
+import threading
+from collections import OrderedDict, deque
+
+from places_client import PlacesApiError, RequestCancelled
+from response_cache import make_details_cache_key
+
+DETAILS_FIELD_MASK = (
+    "id,"
+    "displayName,"
+    "formattedAddress,"
+    "nationalPhoneNumber,"
+    "websiteUri,"
+    "googleMapsUri,"
+    "regularOpeningHours.weekdayDescriptions,"
+    "priceLevel,"
+    "businessStatus,"
+    "photos.name,"
+    "plusCode"
+)
+
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_WORKERS = 2
+CLOSE_TIMEOUT = 2.0  # seconds
+
+
+class PlaceDetailsLoader:
+    """
+    Loads Place Details in background threads, with a bounded in-memory LRU in front of the
+    optional on-disk ResponseCache.
+
+    request() is for the place the user is looking at and goes to the front of the queue;
+    prefetch() replaces any prefetches still waiting, so scrolling away drops them.
+    on_loaded(place_id, details, error) is called from a worker thread.
+    """
+
+    def __init__(self, client, cache=None, max_entries=DEFAULT_MAX_ENTRIES, workers=DEFAULT_WORKERS,
+                 on_loaded=None, field_mask=DETAILS_FIELD_MASK):
+        self.client = client
+        self.cache = cache
+        self.max_entries = max_entries
+        self.on_loaded = on_loaded
+        self.field_mask = field_mask
+        self._memory = OrderedDict()  # place id -> details, most recently used last
+        self._requested = deque()  # served first
+        self._prefetches = deque()
+        self._in_flight = set()
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"place-details-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def get_cached(self, place_id):
+        """Return details already in memory or on disk, or None."""
+        with self._condition:
+            details = self._memory.get(place_id)
+            if details is not None:
+                self._memory.move_to_end(place_id)
+                return details
+        if self.cache is not None:
+            details = self.cache.get(make_details_cache_key(place_id, self.field_mask))
+            if details is not None:
+                self._remember(place_id, details)
+                return details
+        return None
+
+    def request(self, place_id):
+        """Load a place's details as soon as possible."""
+        if not place_id:
+            return
+        with self._condition:
+            if place_id in self._in_flight or place_id in self._memory:
+                return
+            if place_id in self._requested:
+                self._requested.remove(place_id)
+            self._requested.appendleft(place_id)
+            self._condition.notify()
+
+    def prefetch(self, place_ids):
+        """Load details that are likely to be wanted next, replacing earlier prefetches."""
+        with self._condition:
+            self._prefetches.clear()
+            for place_id in place_ids:
+                if place_id and place_id not in self._in_flight and place_id not in self._memory:
+                    self._prefetches.append(place_id)
+            self._condition.notify_all()
+
+    def close(self):
+        self._stop.set()
+        with self._condition:
+            self._requested.clear()
+            self._prefetches.clear()
+            self._condition.notify_all()
+        for thread in self._threads:
+            # A request in flight finishes on its own; the threads are daemons
+            thread.join(timeout=CLOSE_TIMEOUT)
+
+    def _remember(self, place_id, details):
+        with self._condition:
+            self._memory[place_id] = details
+            self._memory.move_to_end(place_id)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._requested and not self._prefetches and not self._stop.is_set():
+                    self._condition.wait()
+                if self._stop.is_set():
+                    return
+                queue = self._requested if self._requested else self._prefetches
+                place_id = queue.popleft()
+                if place_id in self._in_flight or place_id in self._memory:
+                    continue
+                self._in_flight.add(place_id)
+            try:
+                details, error = self._load(place_id)
+            except Exception as e:
+                # e.g. a response that is not JSON; the worker keeps serving the next places
+                print(f"[Details] {place_id} failed: {e}")
+                details, error = None, str(e)
+            finally:
+                with self._condition:
+                    self._in_flight.discard(place_id)
+            if self.on_loaded is not None and not self._stop.is_set():
+                self.on_loaded(place_id, details, error)
+
+    def _load(self, place_id):
+        details = self.get_cached(place_id)
+        if details is not None:
+            return details, None
+        try:
+            details = self.client.get_place(place_id, self.field_mask, cancel_event=self._stop)
+        except RequestCancelled:
+            return None, "cancelled"
+        except PlacesApiError as e:
+            print(f"[Details] {place_id}: {e}")
+            return None, str(e)
+        self._remember(place_id, details)
+        if self.cache is not None:
+            self.cache.put(make_details_cache_key(place_id, self.field_mask), details)
+        return details, None
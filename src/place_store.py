@@ -0,0 +1,240 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from geo import EARTH_RADIUS, haversine_distance
+from ranking import Ranking
+from response_cache import normalize_query
+
+DEFAULT_COVERAGE_MAX_AGE = 7 * 24 * 3600  # seconds
+DENSE_RESULT_COUNT = 60  # most places a single API search can return
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS places (
+    rowid INTEGER PRIMARY KEY,
+    place_id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL DEFAULT '',
+    address TEXT NOT NULL DEFAULT '',
+    rating REAL,
+    review_count INTEGER,
+    latitude REAL,
+    longitude REAL,
+    data TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS places_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng);
+CREATE VIRTUAL TABLE IF NOT EXISTS places_fts USING fts5(
+    name, address, content='places', content_rowid='rowid'
+);
+CREATE TABLE IF NOT EXISTS place_queries (
+    place_rowid INTEGER NOT NULL,
+    query TEXT NOT NULL,
+    PRIMARY KEY (query, place_rowid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS place_queries_place ON place_queries(place_rowid);
+CREATE TABLE IF NOT EXISTS coverage (
+    id INTEGER PRIMARY KEY,
+    query TEXT NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    radius REAL NOT NULL,
+    result_count INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS coverage_query ON coverage(query, fetched_at);
+
+CREATE TRIGGER IF NOT EXISTS places_ai AFTER INSERT ON places BEGIN
+    INSERT INTO places_fts(rowid, name, address) VALUES (new.rowid, new.name, new.address);
+    INSERT INTO places_rtree(id, min_lat, max_lat, min_lng, max_lng)
+        SELECT new.rowid, new.latitude, new.latitude, new.longitude, new.longitude
+        WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+END;
+CREATE TRIGGER IF NOT EXISTS places_au AFTER UPDATE ON places BEGIN
+    INSERT INTO places_fts(places_fts, rowid, name, address) VALUES ('delete', old.rowid, old.name, old.address);
+    INSERT INTO places_fts(rowid, name, address) VALUES (new.rowid, new.name, new.address);
+    DELETE FROM places_rtree WHERE id = old.rowid;
+    INSERT INTO places_rtree(id, min_lat, max_lat, min_lng, max_lng)
+        SELECT new.rowid, new.latitude, new.latitude, new.longitude, new.longitude
+        WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+END;
+"""
+
+
+def fts_match_expression(text_query):
+    """Turn free text into an FTS5 expression matching rows that contain every word as a prefix."""
+    words = normalize_query(text_query).replace('"', ' ').split()
+    return " ".join(f'"{word}"*' for word in words)
+
+
+class PlaceStore:
+    """
+    Local SQLite store of every place fetched from the API.
+    Places are deduplicated by id and indexed with an R-tree on their coordinates and a
+    full-text index on name and address. The store also remembers which circles were
+    searched for which query, so it can tell when a query can be answered locally.
+    """
+
+    def __init__(self, path, coverage_max_age=DEFAULT_COVERAGE_MAX_AGE):
+        self.path = path
+        self.coverage_max_age = coverage_max_age
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def add_places(self, places, text_query=None, coverage=None):
+        """
+        Insert or refresh places (Places API dicts) and link them to the query that found them.
+        coverage=(latitude, longitude, radius) records that the circle was fully searched for the query.
+        """
+        now = time.time()
+        query = normalize_query(text_query) if text_query else None
+        rows = []
+        for place in places:
+            place_id = place.get('id')
+            if not place_id:
+                continue
+            location = place.get('location', {})
+            rows.append((
+                place_id,
+                place.get('displayName', {}).get('text', ''),
+                place.get('formattedAddress', ''),
+                place.get('rating'),
+                place.get('userRatingCount'),
+                location.get('latitude'),
+                location.get('longitude'),
+                json.dumps(place, separators=(",", ":")),
+                now,
+                now,
+            ))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO places (place_id, name, address, rating, review_count, latitude, longitude,"
+                " data, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(place_id) DO UPDATE SET name = excluded.name, address = excluded.address,"
+                " rating = excluded.rating, review_count = excluded.review_count,"
+                " latitude = excluded.latitude, longitude = excluded.longitude,"
+                " data = excluded.data, last_seen = excluded.last_seen",
+                rows
+            )
+            if query:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO place_queries (place_rowid, query)"
+                    " SELECT rowid, ? FROM places WHERE place_id = ?",
+                    [(query, row[0]) for row in rows]
+                )
+                if coverage is not None:
+                    latitude, longitude, radius = coverage
+                    self._conn.execute(
+                        "INSERT INTO coverage (query, latitude, longitude, radius, result_count, fetched_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (query, latitude, longitude, radius, len(rows), now)
+                    )
+            self._conn.commit()
+
+    def query_circle(self, latitude, longitude, radius, text_query=None, seen_since=None):
+        """
+        Return the stored places within the circle, ranked like API results.
+        With text_query, only places previously found for that query or whose name or
+        address match it are returned; with seen_since, only places fetched at or after that time.
+        """
+        dlat = math.degrees(radius / EARTH_RADIUS)
+        cos_lat = math.cos(math.radians(min(abs(latitude) + dlat, 90.0)))
+        dlng = math.degrees(radius / (EARTH_RADIUS * cos_lat)) if cos_lat > 1e-9 else 180.0
+
+        lng_ranges = [(longitude - dlng, longitude + dlng)]
+        if dlng >= 180.0:
+            lng_ranges = [(-180.0, 180.0)]
+        elif longitude - dlng < -180.0:
+            lng_ranges = [(longitude - dlng + 360.0, 180.0), (-180.0, longitude + dlng)]
+        elif longitude + dlng > 180.0:
+            lng_ranges = [(longitude - dlng, 180.0), (-180.0, longitude + dlng - 360.0)]
+
+        text_filter = ""
+        text_params = []
+        if text_query:
+            text_filter = (
+                " AND (p.rowid IN (SELECT place_rowid FROM place_queries WHERE query = ?)"
+                " OR p.rowid IN (SELECT rowid FROM places_fts WHERE places_fts MATCH ?))"
+            )
+            text_params = [normalize_query(text_query), fts_match_expression(text_query)]
+        if seen_since is not None:
+            text_filter += " AND p.last_seen >= ?"
+            text_params.append(seen_since)
+
+        places = []
+        with self._lock:
+            for min_lng, max_lng in lng_ranges:
+                cursor = self._conn.execute(
+                    "SELECT p.data FROM places_rtree r JOIN places p ON p.rowid = r.id"
+                    " WHERE r.min_lat >= ? AND r.max_lat <= ? AND r.min_lng >= ? AND r.max_lng <= ?"
+                    + text_filter,
+                    [latitude - dlat, latitude + dlat, min_lng, max_lng] + text_params
+                )
+                places.extend(json.loads(data) for (data,) in cursor)
+        return Ranking(None, latitude, longitude, radius).rank(places)
+
+    def is_covered(self, text_query, latitude, longitude, radius):
+        """
+        True when a fresh search for this query covered the whole circle. A search that came back with
+        as many places as the API hands out was cut off, so it does not count.
+        """
+        since = time.time() - self.coverage_max_age
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT latitude, longitude, radius FROM coverage"
+                " WHERE query = ? AND fetched_at >= ? AND result_count < ?",
+                (normalize_query(text_query), since, DENSE_RESULT_COUNT)
+            ).fetchall()
+        for cov_lat, cov_lng, cov_radius in rows:
+            if haversine_distance(cov_lat, cov_lng, latitude, longitude) + radius <= cov_radius:
+                return True
+        return False
+
+    def local_search(self, text_query, latitude, longitude, radius, dense_count=DENSE_RESULT_COUNT):
+        """
+        Answer a search from the store when local coverage is good enough, otherwise return None.
+        Coverage is good enough when a fresh search covered the circle, or when the store already
+        holds more matching places fetched within coverage_max_age than a single API search could return.
+        """
+        if self.is_covered(text_query, latitude, longitude, radius):
+            return self.query_circle(latitude, longitude, radius, text_query)
+        places = self.query_circle(latitude, longitude, radius, text_query,
+                                   seen_since=time.time() - self.coverage_max_age)
+        if len(places) > dense_count:
+            return places
+        return None
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM places").fetchone()[0]
+
+    def iter_rows(self, expressions, chunk_size):
+        """
+        Yield every stored place in lists of up to chunk_size rows, in the order they were first stored.
+        Each row is a tuple of the values of expressions, SQL over the places table such as "name" or
+        "json_extract(data, '$.websiteUri')". Each chunk is a separate query continuing after the last
+        rowid, so the lock is not held while the caller works through a chunk.
+        """
+        sql = f"SELECT rowid, {', '.join(expressions)} FROM places WHERE rowid > ? ORDER BY rowid LIMIT ?"
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(sql, (last_rowid, chunk_size)).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            yield [row[1:] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,201 @@
+import copy
+import os
+import random
+import threading
+import time
+from urllib.parse import quote
+
+from metrics import SearchTrace
+
+PLACES_API_BASE_URL = "https://places.googleapis.com"
+BASE_URL_ENV = "SEARCH_MAPS_API_BASE_URL"  # points the app at another server, e.g. benchmarks/mock_places_server.py
+
+DEFAULT_TIMEOUT = (5.0, 20.0)  # connect, read (seconds)
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_BASE = 0.5  # seconds
+DEFAULT_BACKOFF_MAX = 20.0  # seconds
+DEFAULT_RATE = 10.0  # requests per second
+DEFAULT_BURST = 10
+DEFAULT_POOL_SIZE = 16
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class PlacesApiError(Exception):
+    """Raised when a Places API request fails for good (after retries)."""
+
+    def __init__(self, message, status_code=None, body=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class RequestCancelled(Exception):
+    """Raised when a request is abandoned because its cancel event was set."""
+
+
+class RequestLimitReached(Exception):
+    """Raised by a rate limiter when a search has made all the requests it was allowed."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the request rate across all searches that share it."""
+
+    def __init__(self, rate=DEFAULT_RATE, capacity=DEFAULT_BURST):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cancel_event=None):
+        """Block until a token is available. Returns False if cancel_event was set while waiting."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if cancel_event is not None:
+                if cancel_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (delta seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    import email.utils
+
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def default_base_url():
+    return os.environ.get(BASE_URL_ENV) or PLACES_API_BASE_URL
+
+
+class PlacesClient:
+    """
+    Client for the Places API (New) that owns a pooled keep-alive session.
+    Requests use connect/read timeouts and are retried with exponential backoff
+    and full jitter on connection errors, 5xx and 429 responses (honoring
+    Retry-After). All requests go through a token bucket that may be shared
+    between clients.
+    """
+
+    def __init__(self, api_key="", base_url=None, timeout=DEFAULT_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_base=DEFAULT_BACKOFF_BASE,
+                 backoff_max=DEFAULT_BACKOFF_MAX, rate_limiter=None, pool_size=DEFAULT_POOL_SIZE):
+        self.api_key = api_key
+        self.base_url = (base_url or default_base_url()).rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = rate_limiter if rate_limiter is not None else TokenBucket()
+        self.pool_size = pool_size
+        # requests is slow to import, so the session is created by the first request rather than at startup
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def with_rate_limiter(self, rate_limiter):
+        """A client sharing this one's session and settings whose every request goes through rate_limiter."""
+        client = copy.copy(self)
+        client._session = self.session
+        client.rate_limiter = rate_limiter
+        return client
+
+    def search_text(self, body, field_mask, cancel_event=None, trace=None):
+        """POST a places:searchText request and return the decoded response."""
+        return self._request("POST", "/v1/places:searchText", field_mask, json_body=body,
+                             cancel_event=cancel_event, trace=trace)
+
+    def get_place(self, place_id, field_mask, cancel_event=None, trace=None):
+        """GET the Place Details of one place and return the decoded response."""
+        return self._request("GET", f"/v1/places/{quote(place_id, safe='')}", field_mask,
+                             cancel_event=cancel_event, trace=trace)
+
+    def _request(self, method, path, field_mask, json_body=None, cancel_event=None, trace=None):
+        import requests
+
+        if trace is None:
+            trace = SearchTrace()  # still counted in the metrics registry
+        url = self.base_url + path
+        headers = {
+            "Content-Type": "application/json",
+            "X-Goog-Api-Key": self.api_key,
+            "X-Goog-FieldMask": field_mask,
+        }
+
+        attempt = 0
+        while True:
+            if not self.rate_limiter.acquire(cancel_event):
+                raise RequestCancelled()
+
+            retry_after = None
+            trace.count("api_requests")
+            try:
+                with trace.span("http"):
+                    response = self.session.request(method, url, headers=headers, json=json_body,
+                                                    timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                trace.count("api_errors", status="connection")
+                if attempt >= self.max_retries:
+                    raise PlacesApiError(f"Error: {e}") from e
+                print(f"[Retry] {method} {path} failed ({e}), attempt {attempt + 1}")
+            else:
+                trace.count("api_response_bytes", len(response.content))
+                if response.status_code == 200:
+                    with trace.span("decode"):
+                        return response.json()
+                trace.count("api_errors", status=str(response.status_code))
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    raise PlacesApiError(
+                        f"Error: {response.status_code} - {response.text}",
+                        status_code=response.status_code,
+                        body=response.text
+                    )
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                print(f"[Retry] {method} {path} returned {response.status_code}, attempt {attempt + 1}")
+
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            attempt += 1
+            if cancel_event is not None:
+                if cancel_event.wait(delay):
+                    raise RequestCancelled()
+            else:
+                time.sleep(delay)
+
+    def close(self):
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
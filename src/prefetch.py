@@ -0,0 +1,300 @@
+"""
+Speculative prefetch of the circles the user is likely to search next while panning the map.
+
+Prefetched circles are centered on a grid whose step is a fraction of the search radius, so a prediction
+does not need to match the exact spot the user stops at: a search whose nearest grid circle is fully
+cached is run on that circle instead and comes back from the response cache. Prefetching only spends a
+fixed number of API requests per time window and steps aside whenever a real search runs.
+This module must not import PySide6.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+from geo import EARTH_RADIUS, offset_point
+from metrics import SearchTrace
+from places_client import PlacesApiError, RequestLimitReached
+from response_cache import CENTER_PRECISION
+from search_core import SEARCH_FIELD_MASK, cached_page_chain, fetch_text_search_pages
+
+GRID_STEP_FRACTION = 0.2  # grid step as a fraction of the radius; searches move at most 0.14 radius
+DEFAULT_BUDGET_REQUESTS = 60
+DEFAULT_BUDGET_WINDOW = 3600  # seconds
+DEFAULT_MAX_CIRCLES = 4  # circles predicted per pause
+PAGES_PER_CIRCLE = 3  # most requests one circle can cost
+LOOKAHEAD_STEPS = 2  # grid steps predicted ahead in the direction of travel
+MOTION_WINDOW = 3.0  # seconds of map movement the direction of travel is taken from
+MIN_SPEED_STEPS = 0.5  # slower than this many grid steps in the window is not travelling
+CLOSE_TIMEOUT = 2.0  # seconds
+
+
+def grid_step(radius):
+    """Distance between neighboring grid circles, in meters."""
+    return max(radius * GRID_STEP_FRACTION, 1.0)
+
+
+def snap_to_grid(latitude, longitude, radius):
+    """Center of the grid circle nearest to a point. Rows are a step apart, and so are circles within a row."""
+    step_degrees = math.degrees(grid_step(radius) / EARTH_RADIUS)
+    row = round(latitude / step_degrees)
+    snapped_latitude = max(-90.0, min(90.0, row * step_degrees))
+    row_step = step_degrees / max(math.cos(math.radians(snapped_latitude)), 1e-6)
+    snapped_longitude = ((round(longitude / row_step) * row_step + 180) % 360) - 180
+    return round(snapped_latitude, CENTER_PRECISION), round(snapped_longitude, CENTER_PRECISION)
+
+
+class QuotaBudget:
+    """At most max_requests API requests in any window of window seconds. Safe to share between threads."""
+
+    def __init__(self, max_requests=DEFAULT_BUDGET_REQUESTS, window=DEFAULT_BUDGET_WINDOW):
+        self.max_requests = max_requests
+        self.window = window
+        self._spent = deque()  # reservations: [time, requests]
+        self._lock = threading.Lock()
+
+    def available(self):
+        with self._lock:
+            self._expire()
+            return self._available()
+
+    def reserve(self, requests):
+        """
+        Set requests aside before making them, so concurrent users cannot overshoot the budget together.
+        Returns a reservation for settle(), or None when the budget cannot cover them.
+        """
+        with self._lock:
+            self._expire()
+            if requests and self._available() < requests:
+                return None
+            reservation = [time.monotonic(), requests]
+            self._spent.append(reservation)
+            return reservation
+
+    def settle(self, reservation, requests):
+        """Replace a reservation by the requests actually made, giving back what was not used."""
+        with self._lock:
+            reservation[1] = requests
+
+    def _available(self):
+        return self.max_requests - sum(requests for _, requests in self._spent)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.window
+        while self._spent and self._spent[0][0] < cutoff:
+            self._spent.popleft()
+
+
+class RequestAllowance:
+    """Rate limiter letting at most max_requests requests through another one, then raising RequestLimitReached."""
+
+    def __init__(self, rate_limiter, max_requests):
+        self.rate_limiter = rate_limiter
+        self.max_requests = max_requests
+        self.used = 0
+        self._lock = threading.Lock()  # sweep tiles and queries share one allowance
+
+    def exhausted(self):
+        return self.used >= self.max_requests
+
+    def acquire(self, cancel_event=None):
+        # The request is claimed before waiting, so threads waiting together cannot all get through
+        with self._lock:
+            if self.exhausted():
+                if not self.max_requests:
+                    raise RequestLimitReached("No API requests were left in the budget for this search")
+                raise RequestLimitReached(f"Used up the {self.max_requests} API requests set aside for this search")
+            self.used += 1
+        if self.rate_limiter.acquire(cancel_event):
+            return True
+        with self._lock:
+            self.used -= 1
+        return False
+
+
+class MotionTracker:
+    """Recent map centers, giving the direction the user is panning in. A zoom change starts over."""
+
+    def __init__(self, window=MOTION_WINDOW):
+        self.window = window
+        self._samples = deque()  # (time, latitude, longitude)
+        self._zoom = None
+
+    def add(self, latitude, longitude, zoom, now=None):
+        now = time.monotonic() if now is None else now
+        if zoom != self._zoom:
+            self._samples.clear()
+            self._zoom = zoom
+        self._samples.append((now, latitude, longitude))
+        while self._samples[0][0] < now - self.window:
+            self._samples.popleft()
+
+    def displacement(self):
+        """(north, east) meters moved over the window, or None without movement to go by."""
+        if len(self._samples) < 2:
+            return None
+        _, lat1, lng1 = self._samples[0]
+        _, lat2, lng2 = self._samples[-1]
+        north = math.radians(lat2 - lat1) * EARTH_RADIUS
+        dlng = (lng2 - lng1 + 180) % 360 - 180
+        east = math.radians(dlng) * EARTH_RADIUS * math.cos(math.radians((lat1 + lat2) / 2))
+        return north, east
+
+
+def predict_circles(latitude, longitude, radius, displacement=None, max_circles=DEFAULT_MAX_CIRCLES):
+    """
+    Grid circle centers most likely to be searched next, best first: the circle under the map center,
+    the next ones in the direction of travel, then the surrounding ring, those facing the direction of
+    travel first.
+    """
+    step = grid_step(radius)
+    heading = None
+    if displacement is not None:
+        length = math.hypot(*displacement)
+        if length >= MIN_SPEED_STEPS * step:
+            heading = (displacement[0] / length, displacement[1] / length)
+
+    candidates = [(latitude, longitude)]
+    if heading is not None:
+        candidates += [offset_point(latitude, longitude, heading[0] * step * k, heading[1] * step * k)
+                       for k in range(1, LOOKAHEAD_STEPS + 1)]
+    ring = []
+    for i in range(8):
+        angle = i * math.pi / 4
+        north, east = math.cos(angle), math.sin(angle)
+        facing = north * heading[0] + east * heading[1] if heading is not None else 0.0
+        ring.append((-facing, i, offset_point(latitude, longitude, north * step, east * step)))
+    candidates += [point for _, _, point in sorted(ring)]
+
+    circles = []
+    for lat, lng in candidates:
+        center = snap_to_grid(lat, lng, radius)
+        if center not in circles:
+            circles.append(center)
+    return circles[:max_circles]
+
+
+class SpeculativePrefetcher:
+    """
+    Fetches predicted circles into the response cache on a background thread, one page chain at a time.
+
+    schedule() replaces whatever is still waiting with a new prediction. preempt() is for a real search
+    that is about to start: the prefetch in flight is cancelled and nothing runs until release().
+    """
+
+    def __init__(self, client, cache, budget=None, max_circles=DEFAULT_MAX_CIRCLES, page_token_pacer=None):
+        self.client = client
+        self.cache = cache
+        self.budget = budget if budget is not None else QuotaBudget()
+        self.max_circles = max_circles
+        self.page_token_pacer = page_token_pacer
+        self.prefetched = 0  # circles fetched
+        self._pending = deque()  # (query, latitude, longitude, radius)
+        self._busy = False
+        self._held = False
+        self._cancel_event = threading.Event()
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="speculative-prefetch", daemon=True)
+        self._thread.start()
+
+    def schedule(self, queries, latitude, longitude, radius, displacement=None):
+        """Prefetch the circles predicted around a map center for every query, replacing earlier predictions."""
+        circles = predict_circles(latitude, longitude, radius, displacement, self.max_circles)
+        with self._condition:
+            self._pending.clear()
+            for lat, lng in circles:
+                for query in queries:
+                    self._pending.append((query, lat, lng, radius))
+            self._condition.notify_all()
+
+    def cached_center(self, queries, latitude, longitude, radius):
+        """The grid circle nearest to a point when every query's pages for it are cached, else None."""
+        lat, lng = snap_to_grid(latitude, longitude, radius)
+        for query in queries:
+            if cached_page_chain(self.cache, query, lat, lng, radius, SEARCH_FIELD_MASK) is None:
+                return None
+        return lat, lng
+
+    def preempt(self):
+        """Make way for a real search: cancel the prefetch in flight and drop the ones waiting."""
+        with self._condition:
+            self._held = True
+            self._pending.clear()
+            self._cancel_event.set()
+
+    def release(self):
+        with self._condition:
+            self._held = False
+            self._condition.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """Wait until nothing is waiting or in flight; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._busy or (self._pending and not self._held):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self):
+        self._stop.set()
+        with self._condition:
+            self._pending.clear()
+            self._cancel_event.set()
+            self._condition.notify_all()
+        self._thread.join(timeout=CLOSE_TIMEOUT)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while (not self._pending or self._held) and not self._stop.is_set():
+                    self._condition.wait()
+                if self._stop.is_set():
+                    return
+                query, latitude, longitude, radius = self._pending.popleft()
+                self._busy = True
+                self._cancel_event = cancel_event = threading.Event()
+            try:
+                self._prefetch(query, latitude, longitude, radius, cancel_event)
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def _prefetch(self, query, latitude, longitude, radius, cancel_event):
+        if cached_page_chain(self.cache, query, latitude, longitude, radius, SEARCH_FIELD_MASK) is not None:
+            return
+        # The requests are set aside up front, and page token and error retries cannot go beyond them
+        reservation = self.budget.reserve(PAGES_PER_CIRCLE)
+        if reservation is None:
+            with self._condition:
+                self._pending.clear()
+            print(f"[Prefetch] Request budget spent ({self.budget.max_requests} per "
+                  f"{self.budget.window / 60:.0f} min), skipping the remaining circles")
+            return
+        allowance = RequestAllowance(self.client.rate_limiter, PAGES_PER_CIRCLE)
+        # Requests still count in the API metrics, but the trace is never finished as a search
+        trace = SearchTrace(query)
+        try:
+            _, error = fetch_text_search_pages(
+                self.client.with_rate_limiter(allowance), query, latitude, longitude, radius,
+                cancel_event=cancel_event, cache=self.cache, page_token_pacer=self.page_token_pacer, trace=trace
+            )
+        except PlacesApiError as e:
+            error = str(e)
+        except RequestLimitReached:
+            error = f"gave up after the {PAGES_PER_CIRCLE} requests reserved for it"
+        requests = allowance.used
+        self.budget.settle(reservation, requests)
+        if cancel_event.is_set():
+            print(f"[Prefetch] '{query}' at {latitude}, {longitude} preempted after {requests} requests")
+        elif error:
+            print(f"[Prefetch] '{query}' at {latitude}, {longitude} failed: {error}")
+        else:
+            self.prefetched += 1
+            print(f"[Prefetch] Cached '{query}' at {latitude}, {longitude} ({requests} requests, "
+                  f"{self.budget.available()} left in the budget)")
+
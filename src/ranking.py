@@ -0,0 +1,276 @@
+"""
+Ranking of search results. A scorer turns columns of review counts, ratings and distances from the search
+center into one score per place (higher is better); scores are always computed in batch with numpy.
+This module must not import PySide6.
+"""
+import heapq
+import math
+from array import array
+
+from geo import haversine_distances, place_arrays, top_k_indices, within_radius
+
+DEFAULT_SCORER = "reviews"
+DEFAULT_PRIOR_RATING = 3.8  # rating a place with few reviews is pulled towards
+DEFAULT_PRIOR_WEIGHT = 25  # reviews the prior counts as
+REVIEW_SATURATION = 10000  # review count treated as "as popular as it gets" when combining scores
+DEFAULT_HALF_DISTANCE_FRACTION = 0.25  # distance decay halves the score at this fraction of the radius
+
+
+class Features:
+    """Columns a scorer works on, as float numpy arrays. Missing counts and ratings are 0."""
+
+    def __init__(self, counts, ratings, distances, radius):
+        self.counts = counts
+        self.ratings = ratings
+        self.distances = distances
+        self.radius = radius
+
+
+class Scorer:
+    """Base class of the scorers. scores() may return any scale; normalized() maps it to [0, 1]."""
+    name = ""
+    label = ""
+    uses_distance = False
+
+    def scores(self, features):
+        raise NotImplementedError
+
+    def normalized(self, features):
+        return self.scores(features)
+
+
+class ReviewCountScorer(Scorer):
+    """Most reviews first, rating breaks ties. The original ranking."""
+    name = "reviews"
+    label = "Most reviews"
+
+    def scores(self, features):
+        # Ratings are below 10, so this orders by count first and breaks ties by rating
+        return features.counts * 10.0 + features.ratings
+
+    def normalized(self, features):
+        return PopularityScorer().normalized(features)
+
+
+class BayesianRatingScorer(Scorer):
+    """
+    Rating shrunk towards a prior by the number of reviews: (w * prior + n * rating) / (w + n).
+    A 5.0 with 3 reviews no longer beats a 4.6 with 2000.
+    """
+    name = "rating"
+    label = "Best rated"
+
+    def __init__(self, prior_rating=DEFAULT_PRIOR_RATING, prior_weight=DEFAULT_PRIOR_WEIGHT):
+        self.prior_rating = prior_rating
+        self.prior_weight = prior_weight
+
+    def scores(self, features):
+        counts = features.counts
+        return (self.prior_weight * self.prior_rating + counts * features.ratings) / (self.prior_weight + counts)
+
+    def normalized(self, features):
+        import numpy as np
+
+        return np.clip((self.scores(features) - 1.0) / 4.0, 0.0, 1.0)
+
+
+class PopularityScorer(Scorer):
+    """Logarithm of the review count, so 20k reviews is not worth a thousand times 20."""
+    name = "popularity"
+    label = "Most popular"
+
+    def scores(self, features):
+        import numpy as np
+
+        return np.log1p(features.counts)
+
+    def normalized(self, features):
+        import numpy as np
+
+        return np.clip(self.scores(features) / math.log1p(REVIEW_SATURATION), 0.0, 1.0)
+
+
+class DistanceDecayScorer(Scorer):
+    """
+    Exponential decay with the distance from the search center. The score halves every half_distance
+    meters, by default a quarter of the search radius.
+    """
+    name = "nearby"
+    label = "Nearest"
+    uses_distance = True
+
+    def __init__(self, half_distance=None, half_distance_fraction=DEFAULT_HALF_DISTANCE_FRACTION):
+        self.half_distance = half_distance
+        self.half_distance_fraction = half_distance_fraction
+
+    def scores(self, features):
+        import numpy as np
+
+        half_distance = self.half_distance or max(features.radius * self.half_distance_fraction, 1.0)
+        return np.exp(-math.log(2) * features.distances / half_distance)
+
+
+class WeightedScorer(Scorer):
+    """Weighted mean of the normalized scores of other scorers."""
+
+    def __init__(self, parts, name="", label=""):
+        self.parts = list(parts)  # (scorer, weight)
+        self.name = name
+        self.label = label
+        self.uses_distance = any(scorer.uses_distance for scorer, _ in self.parts)
+
+    def scores(self, features):
+        total_weight = sum(weight for _, weight in self.parts)
+        combined = 0.0
+        for scorer, weight in self.parts:
+            combined = combined + weight * scorer.normalized(features)
+        return combined / total_weight
+
+
+SCORERS = {}
+for _scorer in [
+    ReviewCountScorer(),
+    BayesianRatingScorer(),
+    PopularityScorer(),
+    DistanceDecayScorer(),
+    WeightedScorer(
+        [(BayesianRatingScorer(), 0.5), (PopularityScorer(), 0.3), (DistanceDecayScorer(), 0.2)],
+        name="balanced", label="Balanced (rating, popularity, distance)"
+    ),
+]:
+    SCORERS[_scorer.name] = _scorer
+del _scorer
+
+
+def get_scorer(name):
+    """Scorer registered under name, falling back to the default."""
+    return SCORERS.get(name) or SCORERS[DEFAULT_SCORER]
+
+
+class Ranking:
+    """A scorer applied around one search circle."""
+
+    def __init__(self, scorer=None, latitude=0.0, longitude=0.0, radius=0.0):
+        self.scorer = scorer if scorer is not None else SCORERS[DEFAULT_SCORER]
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius = radius
+
+    def features(self, counts, ratings, latitudes, longitudes, distances=None):
+        import numpy as np
+
+        if distances is None:
+            if self.scorer.uses_distance:
+                distances = haversine_distances(self.latitude, self.longitude, latitudes, longitudes)
+            else:
+                distances = np.zeros(len(counts))
+        return Features(np.maximum(counts, 0.0), np.nan_to_num(ratings), distances, self.radius)
+
+    def score_arrays(self, counts, ratings, latitudes, longitudes):
+        """Scores of places given as columns; missing counts may be negative and missing ratings NaN."""
+        return self.scorer.scores(self.features(counts, ratings, latitudes, longitudes))
+
+    def score_places(self, places):
+        """Scores of Places API dicts, as a numpy array."""
+        latitudes, longitudes, counts, ratings = place_arrays(places)
+        return self.score_arrays(counts, ratings, latitudes, longitudes)
+
+    def rank(self, places, k=None):
+        """Keep the places within the radius and order them by score, at most k of them when k is given."""
+        if not places:
+            return []
+        latitudes, longitudes, counts, ratings = place_arrays(places)
+        candidates = within_radius(self.latitude, self.longitude, self.radius, latitudes, longitudes).nonzero()[0]
+        scores = self.score_arrays(counts[candidates], ratings[candidates],
+                                   latitudes[candidates], longitudes[candidates])
+        return [places[i] for i in candidates[top_k_indices(scores, k)]]
+
+
+class IncrementalRanking:
+    """
+    The in-radius places of a search, scored batch by batch as pages or sweep tiles arrive.
+    With k set, the best k are kept in a bounded heap, so each batch costs O(batch * log k) and
+    the current top k is available at any time. All places and their features are kept as well,
+    so rescore() can switch scorers without fetching anything again. Each kept place also keeps its
+    original rank, its position among every place added, including those outside the radius.
+    """
+
+    def __init__(self, ranking, k=None):
+        self.ranking = ranking
+        self.k = k or None
+        self.places = []
+        self.original_ranks = array('l')
+        self.added = 0  # places added, in or out of the radius
+        self._columns = []  # per batch: (counts, ratings, latitudes, longitudes, distances)
+        self._scores = []  # per batch
+        self._heap = []  # (score, -index, index) of the best k so far, worst on top
+
+    def __len__(self):
+        return len(self.places)
+
+    def add(self, places):
+        """Score a batch and return its in-radius places and their original ranks, best first."""
+        import numpy as np
+
+        first_rank = self.added
+        self.added += len(places)
+        if not places:
+            return [], []
+        ranking = self.ranking
+        latitudes, longitudes, counts, ratings = place_arrays(places)
+        candidates = within_radius(ranking.latitude, ranking.longitude, ranking.radius,
+                                   latitudes, longitudes).nonzero()[0]
+        if not len(candidates):
+            return [], []
+        columns = (counts[candidates], ratings[candidates], latitudes[candidates], longitudes[candidates])
+        distances = haversine_distances(ranking.latitude, ranking.longitude, columns[2], columns[3])
+        scores = ranking.scorer.scores(ranking.features(*columns, distances=distances))
+
+        first = len(self.places)
+        self.places.extend(places[i] for i in candidates)
+        self.original_ranks.extend((candidates + first_rank).tolist())
+        self._columns.append(columns + (distances,))
+        self._scores.append(scores)
+        if self.k is not None:
+            self._push(scores, first)
+        order = (np.argsort(-scores, kind="stable") + first).tolist()
+        return [self.places[i] for i in order], [self.original_ranks[i] for i in order]
+
+    def ranked(self):
+        """The in-radius places and their original ranks in score order; the top k only when k is set."""
+        import numpy as np
+
+        if not self.places:
+            return [], []
+        if self.k is not None:
+            order = [index for _, _, index in sorted(self._heap, reverse=True)]
+        else:
+            order = np.argsort(-np.concatenate(self._scores), kind="stable").tolist()
+        return [self.places[i] for i in order], [self.original_ranks[i] for i in order]
+
+    def rescore(self, scorer):
+        """Switch to another scorer, recomputing every score in one batch."""
+        import numpy as np
+
+        self.ranking = Ranking(scorer, self.ranking.latitude, self.ranking.longitude, self.ranking.radius)
+        if not self.places:
+            return
+        counts, ratings, latitudes, longitudes, distances = (
+            np.concatenate(column) for column in zip(*self._columns)
+        )
+        scores = scorer.scores(self.ranking.features(counts, ratings, latitudes, longitudes, distances))
+        self._columns = [(counts, ratings, latitudes, longitudes, distances)]
+        self._scores = [scores]
+        if self.k is not None:
+            self._heap = [(scores[i], -int(i), int(i)) for i in top_k_indices(scores, self.k)]
+            heapq.heapify(self._heap)
+
+    def _push(self, scores, first):
+        heap = self._heap
+        for offset, score in enumerate(scores.tolist()):
+            index = first + offset
+            entry = (score, -index, index)  # earlier places win ties
+            if len(heap) < self.k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
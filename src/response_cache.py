@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+CENTER_PRECISION = 4  # decimal places, roughly 11 m
+
+
+def normalize_query(text_query):
+    """Case-fold and collapse whitespace so trivially different queries share a cache entry."""
+    return " ".join(text_query.casefold().split())
+
+
+def make_cache_key(text_query, latitude, longitude, radius, field_mask, page_index):
+    """Build the cache key for one page of a searchText request."""
+    normalized = json.dumps([
+        normalize_query(text_query),
+        round(float(latitude), CENTER_PRECISION),
+        round(float(longitude), CENTER_PRECISION),
+        round(float(radius)),
+        ",".join(sorted(f.strip() for f in field_mask.split(","))),
+        int(page_index),
+    ])
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def make_details_cache_key(place_id, field_mask):
+    """Build the cache key for a Place Details response."""
+    normalized = json.dumps(["details", place_id, ",".join(sorted(f.strip() for f in field_mask.split(",")))])
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent cache of Places API responses stored in SQLite.
+    Entries expire after ttl seconds; when the total payload exceeds max_bytes
+    the least recently used entries are evicted. Safe to share between threads.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " body TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached response dict for key, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            body, created_at = row
+            if now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(body)
+
+    def put(self, key, data):
+        """Store a response dict and evict least recently used entries beyond max_bytes."""
+        body = json.dumps(data, separators=(",", ":"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, body, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, body, len(body), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        expired_before = time.time() - self.ttl
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (expired_before,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        stale_keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        """Return hit/miss counters together with the current entry count and size."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
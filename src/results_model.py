@@ -0,0 +1,468 @@
+import sys
+from array import array
+from bisect import bisect_right
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, QSortFilterProxyModel, Qt
+from PySide6.QtGui import QColor
+
+from filter_index import SubstringIndex
+from ranking import Ranking
+
+PLACE_ID_ROLE = 1000
+
+COLUMN_HEADERS = ["#", "Place name", "Rating", "Reviews count", "Address"]
+RANK_COLUMN, NAME_COLUMN, RATING_COLUMN, REVIEWS_COLUMN, ADDRESS_COLUMN = range(5)
+
+NAN = float("nan")
+
+# Interpolated green (most relevant) to red (least relevant) backgrounds, shared by all rows
+RELEVANCE_COLORS = [QColor(255 - g, g, 0, 80) for g in range(256)]
+
+
+class PlaceResultStore:
+    """
+    Columnar storage for a ranked result set.
+    Each column is a flat list or typed array indexed by row; missing ratings are NaN
+    and missing review counts are -1. Rows are kept in the order of ranking (a ranking.Ranking).
+    Only the shown fields are kept, not the Places API dicts, which stay in the session store.
+    Names are interned and rows found by the same queries share one tuple, since sweeps repeat both.
+    """
+
+    def __init__(self, ranking=None):
+        self.ranking = ranking if ranking is not None else Ranking()
+        self.ids = []
+        self.names = []
+        self.addresses = []
+        self.ratings = array('d')
+        self.counts = array('q')
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+        self.original_ranks = array('l')
+        self.queries = []  # queries that found each place, for multi-query searches
+        self.rank_keys = array('d')  # negated scores, ascending, so rows stay in ranking order
+        self.original_count = 0
+        self._query_tuples = {}
+
+    @classmethod
+    def from_places(cls, places, original_ranks=None, ranking=None, original_count=None):
+        """
+        Build a store from ranked Places API dicts and their positions in the order the API returned
+        them in (by default their rows). original_count is the size of that order.
+        """
+        store = cls(ranking)
+        if original_ranks is None:
+            original_ranks = range(len(places))
+        store.original_count = max(original_ranks, default=-1) + 1 if original_count is None else original_count
+
+        for row, (place, original_rank) in enumerate(zip(places, original_ranks)):
+            store.insert(row, place, original_rank, 0.0)
+        # Scored from the columns in one batch rather than from the dicts again
+        store.rank_keys = array('d', (-store.column_scores(store.ranking)).tolist())
+        return store
+
+    def scores(self, places):
+        """Ranking scores of Places API dicts, computed in one batch."""
+        return self.ranking.score_places(places).tolist() if places else []
+
+    def insert(self, row, place, original_rank, score):
+        """Insert a Places API dict with its ranking score at the given row."""
+        location = place.get('location', {})
+        rating = place.get('rating')
+        count = place.get('userRatingCount')
+        self.ids.insert(row, place.get('id', ''))
+        self.names.insert(row, sys.intern(place.get('displayName', {}).get('text', '')))
+        self.addresses.insert(row, place.get('formattedAddress', ''))
+        self.ratings.insert(row, NAN if rating is None else float(rating))
+        self.counts.insert(row, -1 if count is None else int(count))
+        self.latitudes.insert(row, location.get('latitude', NAN))
+        self.longitudes.insert(row, location.get('longitude', NAN))
+        self.original_ranks.insert(row, original_rank)
+        self.queries.insert(row, self.shared_queries(place.get('matchedQueries')))
+        self.rank_keys.insert(row, -score)
+
+    def shared_queries(self, queries):
+        """The store's one tuple of these queries."""
+        queries = tuple(queries or ())
+        return self._query_tuples.setdefault(queries, queries)
+
+    def ranked_row(self, score):
+        """Row at which a place with this score belongs in ranking order (after equally ranked rows)."""
+        return bisect_right(self.rank_keys, -score)
+
+    def column_scores(self, ranking):
+        """Scores of every row under a ranking, as a numpy array."""
+        import numpy as np
+
+        return ranking.score_arrays(
+            np.array(self.counts, dtype=float), np.frombuffer(self.ratings),
+            np.frombuffer(self.latitudes), np.frombuffer(self.longitudes)
+        )
+
+    def rerank(self, ranking):
+        """
+        Reorder every row by another ranking, scoring all rows in one batch.
+        Returns the new row of each old row.
+        """
+        import numpy as np
+
+        n = len(self)
+        self.ranking = ranking
+        if not n:
+            return []
+        scores = self.column_scores(ranking)
+        # Equal scores keep the original API order
+        order = np.lexsort((np.array(self.original_ranks), -scores))
+        rows = order.tolist()
+        self.ids = [self.ids[i] for i in rows]
+        self.names = [self.names[i] for i in rows]
+        self.addresses = [self.addresses[i] for i in rows]
+        self.queries = [self.queries[i] for i in rows]
+        for name in ("ratings", "counts", "latitudes", "longitudes", "original_ranks"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, np.array(column)[order].tobytes()))
+        self.rank_keys = array('d', (-scores[order]).tolist())
+        new_rows = np.empty(n, dtype=np.intp)
+        new_rows[order] = np.arange(n)
+        return new_rows.tolist()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def relevance(self, row):
+        n = self.original_count
+        if n > 1:
+            return 1.0 - (self.original_ranks[row] / (n - 1))
+        return 1.0
+
+    def coordinates(self, row):
+        """Return (latitude, longitude) of a row, or None when unknown."""
+        lat = self.latitudes[row]
+        lng = self.longitudes[row]
+        if lat != lat or lng != lng:
+            return None
+        return lat, lng
+
+    def sort_key(self, column):
+        """Return the per-row sort key sequence for a table column."""
+        if column == RANK_COLUMN:
+            return self.original_ranks
+        if column == NAME_COLUMN:
+            return [name.casefold() for name in self.names]
+        if column == RATING_COLUMN:
+            return [-1.0 if rating != rating else rating for rating in self.ratings]
+        if column == REVIEWS_COLUMN:
+            return self.counts
+        return [address.casefold() for address in self.addresses]
+
+    def sort_value(self, column, row):
+        """The sort key of one row for a table column, as found in sort_key(column)."""
+        if column == RANK_COLUMN:
+            return self.original_ranks[row]
+        if column == NAME_COLUMN:
+            return self.names[row].casefold()
+        if column == RATING_COLUMN:
+            rating = self.ratings[row]
+            return -1.0 if rating != rating else rating
+        if column == REVIEWS_COLUMN:
+            return self.counts[row]
+        return self.addresses[row].casefold()
+
+
+class ResultsTableModel(QAbstractTableModel):
+    """
+    Read-only table model that renders rows straight from a PlaceResultStore.
+    Sorting and filtering set a row order array over the store instead of moving any data.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.store = PlaceResultStore()
+        self._order = None  # model row -> store row, None for all rows in ranking order
+        self._sort_column = -1
+        self._sort_order = Qt.AscendingOrder
+        self._column_order = None  # every store row in column sort order, kept while only the filter changes
+        self._filter = None  # ResultFilter, None shows every row
+        self._index = None  # SubstringIndex of the store, built when text is first filtered
+
+    def set_store(self, store):
+        self.beginResetModel()
+        self.store = store
+        self._index = None
+        self._column_order = None
+        # Keep the column sort and filter the user picked
+        self._order = self._compute_order()
+        self.endResetModel()
+
+    def set_filter(self, result_filter):
+        """Show only the rows matching a ResultFilter (None or an empty filter shows all)."""
+        self.beginResetModel()
+        self._filter = None if result_filter is None or result_filter.is_empty() else result_filter
+        self._order = self._compute_order()
+        self.endResetModel()
+
+    def is_filtered(self):
+        return self._filter is not None
+
+    def insert_ranked(self, places, original_ranks, original_count):
+        """
+        Merge newly arrived places into the store at their ranked positions without resetting the view.
+        original_count is the size of the original order so far, which relevance colors are relative to.
+        """
+        store = self.store
+        store.original_count = original_count
+        if self._order is None:
+            for place, original_rank, score in zip(places, original_ranks, store.scores(places)):
+                row = store.ranked_row(score)
+                self.beginInsertRows(QModelIndex(), row, row)
+                store.insert(row, place, original_rank, score)
+                self._index_row(row)
+                self.endInsertRows()
+        elif places:
+            self._merge_page(places, original_ranks)
+        if self.rowCount():
+            # Relevance colors depend on the original count, which has grown
+            self.dataChanged.emit(
+                self.index(0, RANK_COLUMN), self.index(self.rowCount() - 1, RANK_COLUMN), [Qt.BackgroundRole]
+            )
+
+    def _merge_page(self, places, original_ranks):
+        """
+        Insert a page while a column sort or filter is active. The page goes into the store first, then
+        the shown rows are renumbered once and each new row is placed into the order by binary search.
+        """
+        import numpy as np
+
+        store = self.store
+        new_rows = []
+        for place, original_rank, score in zip(places, original_ranks, store.scores(places)):
+            row = store.ranked_row(score)
+            store.insert(row, place, original_rank, score)
+            self._index_row(row)
+            new_rows = [r + 1 if r >= row else r for r in new_rows]
+            new_rows.append(row)
+
+        is_new = np.zeros(len(store), dtype=bool)
+        is_new[new_rows] = True
+        moved = np.flatnonzero(~is_new)  # old store row -> store row now
+        self._order = moved[np.array(self._order, dtype=np.intp)].tolist()
+        if self._column_order is not None:
+            self._column_order = moved[np.array(self._column_order, dtype=np.intp)].tolist()
+
+        for row in sorted(new_rows):
+            if self._column_order is not None:
+                self._column_order.insert(self._order_position(self._column_order, row), row)
+            if self._row_matches(row):
+                position = self._order_position(self._order, row)
+                self.beginInsertRows(QModelIndex(), position, position)
+                self._order.insert(position, row)
+                self.endInsertRows()
+
+    def _order_position(self, order, row):
+        """Where a store row belongs in a row order sorted like sort() sorts (equal keys by store row)."""
+        column = self._sort_column
+        descending = self._sort_order == Qt.DescendingOrder
+        value = self.store.sort_value
+        key = value(column, row) if column >= 0 else None
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            other = order[mid]
+            if column >= 0:
+                other_key = value(column, other)
+                if other_key != key:
+                    before = other_key > key if descending else other_key < key
+                else:
+                    before = other < row
+            else:
+                before = other < row
+            if before:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def append_rows(self, places, original_ranks):
+        """Append places that are already in ranking order, e.g. when restoring a saved result set."""
+        if not places:
+            return
+        store = self.store
+        first = len(store)
+        if self._order is None:
+            self.beginInsertRows(QModelIndex(), first, first + len(places) - 1)
+            for place, original_rank, score in zip(places, original_ranks, store.scores(places)):
+                store.insert(len(store), place, original_rank, score)
+                self._index_row(len(store) - 1)
+            self.endInsertRows()
+            return
+        for place, original_rank, score in zip(places, original_ranks, store.scores(places)):
+            store.insert(len(store), place, original_rank, score)
+            self._index_row(len(store) - 1)
+        rows = [row for row in range(first, len(store)) if self._row_matches(row)]
+        if rows:
+            end = len(self._order)
+            self.beginInsertRows(QModelIndex(), end, end + len(rows) - 1)
+            self._order.extend(rows)
+            self.endInsertRows()
+        self.sort(self._sort_column, self._sort_order)
+
+    def rerank(self, ranking):
+        """Reorder the rows by another ranking in place; selection, column sort and filter are kept."""
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        store_rows = [self.store_row(index.row()) for index in persistent]
+        new_rows = self.store.rerank(ranking)
+        if self._column_order is not None:
+            self._column_order = [new_rows[row] for row in self._column_order]
+        if self._order is not None:
+            if self._sort_column >= 0:
+                # Column sorted rows stay where they are, only their store rows move
+                self._order = [new_rows[row] for row in self._order]
+            else:
+                self._order = sorted(new_rows[row] for row in self._order)
+        store_rows = [new_rows[row] for row in store_rows]
+        self.changePersistentIndexList(persistent, self._moved_indexes(persistent, store_rows))
+        self.layoutChanged.emit()
+
+    def update_matched_queries(self, places):
+        """Refresh which queries matched each place once a multi-query search has merged all its results."""
+        store = self.store
+        queries_by_id = {place.get('id'): place.get('matchedQueries') for place in places}
+        for row, place_id in enumerate(store.ids):
+            if place_id in queries_by_id:
+                store.queries[row] = store.shared_queries(queries_by_id[place_id])
+        if self.rowCount():
+            self.dataChanged.emit(
+                self.index(0, NAME_COLUMN), self.index(self.rowCount() - 1, NAME_COLUMN), [Qt.ToolTipRole]
+            )
+
+    def store_row(self, row):
+        """Map a model row to its row in the store."""
+        return row if self._order is None else self._order[row]
+
+    def model_row(self, store_row):
+        """Map a store row to its current model row, -1 when it is filtered out."""
+        if self._order is None:
+            return store_row
+        try:
+            return self._order.index(store_row)
+        except ValueError:
+            return -1
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        store_rows = [self.store_row(index.row()) for index in persistent]
+        self._sort_column = column
+        self._sort_order = order
+        self._column_order = None
+        self._order = self._compute_order()
+        self.changePersistentIndexList(persistent, self._moved_indexes(persistent, store_rows))
+        self.layoutChanged.emit()
+
+    def _compute_order(self):
+        """Store rows to show in column sort or ranking order; None for every row in ranking order."""
+        import numpy as np
+
+        rows = None
+        if self._sort_column >= 0:
+            if self._column_order is None:
+                key = self.store.sort_key(self._sort_column)
+                self._column_order = sorted(range(len(self.store)), key=key.__getitem__,
+                                            reverse=self._sort_order == Qt.DescendingOrder)
+            rows = self._column_order
+        mask = self._filter_mask()
+        if mask is None:
+            return None if rows is None else list(rows)
+        if rows is None:
+            return np.flatnonzero(mask).tolist()
+        rows = np.array(rows, dtype=np.intp)
+        return rows[mask[rows]].tolist()
+
+    def _filter_mask(self):
+        """Boolean numpy mask of the store rows passing the filter, or None without a filter."""
+        import numpy as np
+
+        result_filter = self._filter
+        if result_filter is None:
+            return None
+        store = self.store
+        mask = result_filter.bounds_mask(np.frombuffer(store.ratings), np.array(store.counts))
+        if result_filter.text and len(store):
+            if self._index is None:
+                self._index = SubstringIndex()
+                self._index.extend(store.original_ranks, store.names, store.addresses)
+            ranks = np.array(store.original_ranks)
+            matched = np.zeros(int(ranks.max()) + 1, dtype=bool)
+            matched[self._index.search(result_filter.text)] = True
+            mask &= matched[ranks]
+        return mask
+
+    def _index_row(self, row):
+        # The index outlives a cleared filter, so every added row goes in while it exists
+        if self._index is not None:
+            store = self.store
+            self._index.add(store.original_ranks[row], store.names[row], store.addresses[row])
+
+    def _row_matches(self, row):
+        if self._filter is None:
+            return True
+        store = self.store
+        return self._filter.matches(store.names[row], store.addresses[row], store.ratings[row], store.counts[row])
+
+    def _moved_indexes(self, persistent, store_rows):
+        """Persistent indexes moved to where their store rows are shown now (invalid when filtered out)."""
+        if self._order is None:
+            return [self.index(row, index.column()) for row, index in zip(store_rows, persistent)]
+        position = [-1] * len(self.store)
+        for model_row, store_row in enumerate(self._order):
+            position[store_row] = model_row
+        return [self.index(position[row], index.column()) for row, index in zip(store_rows, persistent)]
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.store) if self._order is None else len(self._order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMN_HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMN_HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.store_row(index.row())
+        column = index.column()
+        store = self.store
+
+        if role == Qt.DisplayRole:
+            if column == RANK_COLUMN:
+                return str(store.original_ranks[row] + 1)
+            if column == NAME_COLUMN:
+                return store.names[row]
+            if column == RATING_COLUMN:
+                rating = store.ratings[row]
+                return "" if rating != rating else str(rating)
+            if column == REVIEWS_COLUMN:
+                count = store.counts[row]
+                return "" if count < 0 else str(count)
+            if column == ADDRESS_COLUMN:
+                return store.addresses[row]
+        elif role == Qt.ToolTipRole and column == NAME_COLUMN:
+            queries = store.queries[row]
+            return f"Matched: {', '.join(queries)}" if len(queries) > 1 else None
+        elif role == Qt.BackgroundRole and column == RANK_COLUMN:
+            return RELEVANCE_COLORS[int(255 * store.relevance(row))]
+        elif role == PLACE_ID_ROLE:
+            return store.ids[row]
+        return None
+
+
+class ResultsProxyModel(QSortFilterProxyModel):
+    """Proxy in front of ResultsTableModel that hands sorting to the source model's columnar sort."""
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sourceModel().sort(column, order)
@@ -0,0 +1,367 @@
+"""
+Search pipeline shared by the desktop app and the command line: fetching, sweeping, caching and ranking.
+This module must not import PySide6.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import SearchTrace
+from paging import DEFAULT_PAGE_TOKEN_PACER, TokenWait
+from places_client import PlacesApiError, RequestCancelled, RequestLimitReached
+from ranking import IncrementalRanking, Ranking
+from response_cache import make_cache_key, normalize_query
+from sweep import sweep_search, DEFAULT_PARALLELISM
+
+APP_NAME = "Search Maps"
+MAX_PARALLEL_QUERIES = 8
+
+# "cafe OR bakery", "cafe; bakery", "cafe | bakery" and one query per line all search for several things
+QUERY_SEPARATORS = re.compile(r"\s+OR\s+|[;|\n]")
+
+
+def default_data_dir():
+    """Per-user application data directory shared by the desktop app, the CLI and their caches."""
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA", os.path.expanduser("~"))
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return os.path.join(base, APP_NAME)
+
+
+def normalize_longitude(lon):
+    """Normalize longitude to the range [-180, 180]."""
+    return ((lon + 180) % 360) - 180
+
+
+def split_queries(text):
+    """Split a search string into its distinct queries, in order. Duplicates differing only in case are dropped."""
+    queries = []
+    seen = set()
+    for part in QUERY_SEPARATORS.split(text or ""):
+        query = part.strip()
+        key = normalize_query(query)
+        if query and key not in seen:
+            seen.add(key)
+            queries.append(query)
+    return queries
+
+
+# Only what ranking and the table need; everything else is loaded per place by place_details
+SEARCH_FIELD_MASK = (
+    "places.displayName,"
+    "places.formattedAddress,"
+    "places.rating,"
+    "places.userRatingCount,"
+    "places.location,"
+    "places.id,"
+    "nextPageToken"
+)
+
+
+def google_maps_text_search(client, search_string, latitude, longitude, radius=30000.0, min_reviews=0,
+                            progress=None, cancel_event=None, cache=None, sweep=False,
+                            parallelism=DEFAULT_PARALLELISM, place_store=None, local_first=False,
+                            on_page=None, page_token_pacer=None, trace=None, scorer=None, top_k=None,
+                            fetch_center=None):
+    """
+    Searches Google Maps for places matching the search string near the given latitude and longitude.
+    Returns (original_ranks, places, error): places with id, displayName, formattedAddress, rating,
+    userRatingCount and location, and the position of each place in the order the API returned them.
+    A search string with several queries ("cafe OR bakery", see split_queries) runs them concurrently and
+    merges the results, deduplicated by place id; each place lists the queries that found it in matchedQueries.
+    Safe to call from a worker thread: progress(text) reports status, and setting cancel_event stops paging.
+    Pages are read from and written to cache (a ResponseCache) when one is given. A search whose client
+    refuses further requests (see prefetch.RequestAllowance) fails rather than return a partial result.
+    With sweep=True the circle is covered by adaptively subdivided tiles to get past the 60 result limit.
+    Fetched places are saved to place_store; with local_first=True the store answers the search
+    without calling the API when its coverage of the circle is fresh or dense enough.
+
+    on_page(places, original_ranks, original_count, pages) is called as soon as each page (or sweep tile)
+    arrives, with its new in-radius places ranked and their positions in the original order.
+    page_token_pacer (a paging.PageTokenPacer) decides when page tokens are used; by default one
+    shared by the whole process.
+    Places are ordered by scorer (see ranking.SCORERS, most reviews first by default); with top_k only
+    the best top_k are returned, kept up to date as pages arrive.
+    Without sweep, pages can be requested (or read from the cache) at fetch_center, a (latitude, longitude)
+    near the search center such as a prefetched circle; the radius filter and ranking keep the search center.
+
+    Stage timings and counters go to trace (a metrics.SearchTrace), which the caller finishes so it can
+    add its own stages; without one a trace is created and finished here.
+    """
+    own_trace = trace is None
+    if own_trace:
+        trace = SearchTrace(search_string)
+    result = (None, None, None)
+    try:
+        result = _text_search(
+            client, search_string, latitude, longitude, radius, min_reviews, progress, cancel_event, cache,
+            sweep, parallelism, place_store, local_first, on_page, page_token_pacer, trace, scorer, top_k,
+            fetch_center
+        )
+        return result
+    finally:
+        if own_trace:
+            trace.finish(len(result[1] or []))
+
+
+def _text_search(client, search_string, latitude, longitude, radius, min_reviews, progress, cancel_event, cache,
+                 sweep, parallelism, place_store, local_first, on_page, page_token_pacer, trace, scorer, top_k,
+                 fetch_center):
+    queries = split_queries(search_string) or [search_string]
+    ranking = IncrementalRanking(Ranking(scorer, latitude, longitude, radius), k=top_k)
+    fetch_latitude, fetch_longitude = (latitude, longitude) if fetch_center is None else fetch_center
+    places_by_id = {}
+    pages_done = [0]
+    lock = threading.Lock()  # queries run on separate threads
+
+    def accept(batch, query):
+        with lock:
+            new_places = []
+            for place in batch:
+                if place.get('userRatingCount', 0) < min_reviews:
+                    continue
+                place_id = place.get('id')
+                if place_id:
+                    known = places_by_id.get(place_id)
+                    if known is not None:
+                        if query not in known['matchedQueries']:
+                            known['matchedQueries'].append(query)
+                        continue
+                    places_by_id[place_id] = place
+                place['matchedQueries'] = [query]
+                new_places.append(place)
+            pages_done[0] += 1
+            # Only the new places are scored; the ranking so far is kept
+            with trace.span("rank"):
+                ranked, original_ranks = ranking.add(new_places)
+            if on_page:
+                on_page(ranked, original_ranks, ranking.added, pages_done[0])
+
+    def run_query(query):
+        """
+        Fetch one query; returns (fetched places or None if answered locally, error, complete), where
+        complete tells whether every page chain was fetched to its end.
+        """
+        def query_progress(text):
+            if progress is not None:
+                progress(f"{query}: {text}" if len(queries) > 1 else text)
+
+        if place_store is not None and local_first:
+            with trace.span("local"):
+                local_places = place_store.local_search(query, latitude, longitude, radius)
+            if local_places is not None:
+                print(f"[Local] Answered '{query}' from the local place store ({len(local_places)} places)")
+                accept(local_places, query)
+                return None, None, True
+
+        if sweep:
+            cut_short = threading.Event()  # set by the first tile whose pages stopped early
+
+            def fetch_tile(tile_latitude, tile_longitude, tile_radius):
+                completed = threading.Event()
+                result = fetch_text_search_pages(
+                    client, query, tile_latitude, tile_longitude, tile_radius,
+                    cancel_event=cancel_event, cache=cache, page_token_pacer=page_token_pacer, trace=trace,
+                    completed=completed
+                )
+                if not completed.is_set():
+                    cut_short.set()
+                return result
+
+            places, error = sweep_search(
+                fetch_tile, latitude, longitude, radius,
+                parallelism=parallelism, progress=query_progress, cancel_event=cancel_event,
+                on_places=lambda batch: accept(batch, query)
+            )
+            return places, error, not cut_short.is_set()
+
+        places = []
+        completed = threading.Event()
+        try:
+            for page in iter_text_search_pages(
+                    client, query, fetch_latitude, fetch_longitude, radius,
+                    progress=query_progress, cancel_event=cancel_event, cache=cache,
+                    page_token_pacer=page_token_pacer, trace=trace, completed=completed):
+                places.extend(page)
+                accept(page, query)
+        except PlacesApiError as e:
+            return None, str(e), False
+        return places, None, completed.is_set()
+
+    try:
+        if len(queries) == 1:
+            results = [run_query(queries[0])]
+        else:
+            # Wall time is that of the slowest query rather than the sum
+            with ThreadPoolExecutor(max_workers=min(len(queries), MAX_PARALLEL_QUERIES)) as pool:
+                results = list(pool.map(run_query, queries))
+    except RequestLimitReached as e:
+        # The client's rate limiter allowed this search a fixed number of requests; what it got is incomplete
+        return None, None, str(e)
+
+    errors = [(query, error) for query, (_, error, _) in zip(queries, results) if error]
+    if errors and len(errors) == len(queries):
+        return None, None, errors[0][1]
+    for query, error in errors:
+        print(f"[Warning] Query '{query}' failed, keeping the results of the others: {error}")
+
+    if place_store is not None:
+        cancelled = cancel_event is not None and cancel_event.is_set()
+        with trace.span("store"):
+            for query, (places, error, complete) in zip(queries, results):
+                if places is not None and not error:
+                    # Only a search that got all its pages covered the circle
+                    place_store.add_places(
+                        places, query,
+                        coverage=(fetch_latitude, fetch_longitude, radius) if complete and not cancelled else None
+                    )
+
+    # Places outside the radius were dropped as they arrived
+    with trace.span("rank"):
+        filtered_places, original_ranks = ranking.ranked()
+
+    return original_ranks, filtered_places, None
+
+
+def fetch_text_search_pages(client, search_string, latitude, longitude, radius,
+                            progress=None, cancel_event=None, cache=None, page_token_pacer=None,
+                            trace=None, completed=None):
+    """
+    Runs one location-biased searchText request and follows nextPageToken until the last page.
+    Returns (places, error) with the places in API order. If a later page fails, the pages
+    fetched so far are kept and returned without an error; completed is then left unset
+    (see iter_text_search_pages).
+    """
+    places = []
+    try:
+        for page in iter_text_search_pages(client, search_string, latitude, longitude, radius,
+                                           progress=progress, cancel_event=cancel_event, cache=cache,
+                                           page_token_pacer=page_token_pacer, trace=trace,
+                                           completed=completed):
+            places.extend(page)
+    except PlacesApiError as e:
+        return None, str(e)
+    return places, None
+
+
+def iter_text_search_pages(client, search_string, latitude, longitude, radius,
+                           progress=None, cancel_event=None, cache=None, page_token_pacer=None,
+                           trace=None, completed=None):
+    """
+    Generator over the pages of one location-biased searchText request, yielding each page's
+    places as soon as it arrives. Raises PlacesApiError if the first page fails; a failure on a
+    later page ends the iteration after logging it. Stops quietly when cancel_event is set, and
+    passes on RequestLimitReached. completed (a threading.Event) is set once the last page was
+    reached, so a caller can tell a whole chain from one that stopped early.
+    """
+    field_mask = SEARCH_FIELD_MASK
+    if trace is None:
+        trace = SearchTrace(search_string)
+
+    if cache is not None:
+        # Page tokens expire, so cached pages are only usable when the whole chain is cached
+        with trace.span("cache"):
+            cached_pages = cached_page_chain(cache, search_string, latitude, longitude, radius, field_mask)
+        if cached_pages is not None:
+            trace.count("cache_hits", len(cached_pages))
+            for data in cached_pages:
+                yield extract_places(data)
+            if completed is not None:
+                completed.set()
+            return
+        trace.count("cache_misses")
+
+    body = {
+        "textQuery": search_string,
+        "locationBias": {
+            "circle": {
+                "center": {
+                    "latitude": float(latitude),
+                    "longitude": float(longitude)
+                },
+                "radius": float(radius)
+            }
+        },
+        "maxResultCount": 20
+    }
+
+    pacer = page_token_pacer if page_token_pacer is not None else DEFAULT_PAGE_TOKEN_PACER
+    page_index = 0
+    token_wait = None  # timing of the current page token
+    while True:
+        if token_wait is not None:
+            # Wait until the page token is likely valid, waking up early on cancel
+            delay = token_wait.next_delay()
+            if delay is None:
+                print(f"[Warning] Page token not valid after {token_wait.waited():.1f}s, "
+                      f"keeping the {page_index} pages fetched")
+                return
+            with trace.span("page_wait"):
+                if cancel_event is not None:
+                    if cancel_event.wait(delay):
+                        return
+                else:
+                    time.sleep(delay)
+            sent_after = token_wait.waited()
+
+        if progress:
+            progress(f"Loading... page {page_index + 1}")
+        try:
+            data = client.search_text(body, field_mask, cancel_event=cancel_event, trace=trace)
+        except RequestCancelled:
+            return
+        except PlacesApiError as e:
+            if token_wait is not None and e.status_code == 400:
+                # The API rejects a token that is not valid yet as an invalid argument
+                trace.count("page_token_retries")
+                continue
+            print(e)
+            if page_index == 0:
+                raise
+            print(f"[Warning] Keeping the {page_index} pages fetched before the error")
+            return
+
+        if token_wait is not None:
+            estimate = pacer.record(sent_after, token_wait.attempts)
+            print(f"[Paging] Page {page_index + 1} token used after {sent_after:.2f}s "
+                  f"({token_wait.attempts} attempt{'s' if token_wait.attempts != 1 else ''}), "
+                  f"readiness estimate {estimate:.2f}s")
+
+        if cache is not None:
+            with trace.span("cache"):
+                cache.put(make_cache_key(search_string, latitude, longitude, radius, field_mask, page_index), data)
+
+        yield extract_places(data)
+
+        if 'nextPageToken' not in data:
+            if completed is not None:
+                completed.set()
+            return
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        body['pageToken'] = data['nextPageToken']
+        page_index += 1
+        token_wait = TokenWait(pacer)
+
+
+def cached_page_chain(cache, search_string, latitude, longitude, radius, field_mask):
+    """Return every cached page of a search in order, or None unless the chain is complete."""
+    pages = []
+    while True:
+        data = cache.get(make_cache_key(search_string, latitude, longitude, radius, field_mask, len(pages)))
+        if data is None:
+            return None
+        pages.append(data)
+        if 'nextPageToken' not in data:
+            return pages
+
+
+def extract_places(data):
+    """Return the places of one searchText response."""
+    return data.get('places', [])
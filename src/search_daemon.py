@@ -0,0 +1,422 @@
+"""
+Local search service shared by several SearchMaps desktops and scripts.
+
+The daemon runs the search pipeline (search_core.google_maps_text_search) for its clients with one API key,
+one response cache, one place store and one API request budget. Identical searches in flight at the same
+time are coalesced: later ones join the first and get its pages as they arrive, so several users searching
+the same area cost one chain of API calls. Place Details are shared the same way.
+
+    POST /search               search parameters as JSON, answered with JSON lines as the search runs
+    GET  /v1/places/{id}       Place Details, with the field mask in X-Goog-FieldMask
+    GET  /status               counters as JSON
+
+It is a small HTTP/1.1 server on asyncio; the pipeline blocks, so searches run on a bounded thread pool.
+daemon_client.DaemonClient talks to it. This module must not import PySide6.
+"""
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import unquote
+
+from metrics import SearchTrace
+from places_client import PlacesApiError
+from prefetch import RequestAllowance
+from ranking import DEFAULT_SCORER, SCORERS, get_scorer
+from response_cache import CENTER_PRECISION, make_details_cache_key, normalize_query
+from search_core import SEARCH_FIELD_MASK, cached_page_chain, google_maps_text_search, split_queries
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8741
+DEFAULT_MAX_SEARCHES = 4  # searches run at the same time; more wait for a free slot
+KEEPALIVE_INTERVAL = 1.0  # seconds without a line before a keepalive is sent, so clients notice cancels
+MAX_BODY_BYTES = 64 * 1024
+DETAILS_PATH = "/v1/places/"
+# Requests set aside from the budget per query before a search starts; unused ones are given back after it
+SEARCH_REQUESTS = 6  # three pages and three retries
+SWEEP_REQUESTS = 150  # a sweep with a budget stops at this many
+
+
+class BadRequest(Exception):
+    """Raised for a request the daemon cannot parse."""
+
+
+def encode_event(event):
+    return (json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+KEEPALIVE_LINE = encode_event({"event": "keepalive"})
+
+
+def parse_search(body):
+    """Search parameters from a JSON request body, with defaults filled in."""
+    try:
+        data = json.loads(body or b"{}")
+        params = {
+            "query": str(data["query"]).strip(),
+            "lat": float(data["lat"]),
+            "lng": float(data["lng"]),
+            "radius": float(data.get("radius", 5000.0)),
+            "min_reviews": int(data.get("min_reviews", 0)),
+            "sweep": bool(data.get("sweep", False)),
+            "local_first": bool(data.get("local_first", False)),
+            "rank": data.get("rank") or DEFAULT_SCORER,
+            "top_k": int(data["top_k"]) if data.get("top_k") else None,
+        }
+    except (ValueError, KeyError, TypeError) as e:
+        raise BadRequest(f"Invalid search: {e}")
+    if not params["query"]:
+        raise BadRequest("Invalid search: empty query")
+    if params["rank"] not in SCORERS:
+        raise BadRequest(f"Invalid search: unknown ranking {params['rank']}")
+    return params
+
+
+def search_requests(params):
+    """Most API requests a search may make when the daemon has a budget."""
+    queries = split_queries(params["query"]) or [params["query"]]
+    return len(queries) * (SWEEP_REQUESTS if params["sweep"] else SEARCH_REQUESTS)
+
+
+def search_key(params):
+    """Searches with the same key are answered by one run of the pipeline."""
+    return (
+        normalize_query(params["query"]),
+        round(params["lat"], CENTER_PRECISION),
+        round(params["lng"], CENTER_PRECISION),
+        round(params["radius"]),
+        params["min_reviews"],
+        params["sweep"],
+        params["local_first"],
+        params["rank"],
+        params["top_k"],
+    )
+
+
+async def read_request(reader):
+    """(method, path, headers, body) of one HTTP request, or None when the client sent nothing."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise BadRequest("Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise BadRequest("Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise BadRequest("Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, target.split("?", 1)[0], headers, body
+
+
+def response_head(status, content_type, length=None):
+    try:
+        reason = HTTPStatus(status).phrase
+    except ValueError:
+        reason = ""
+    lines = [f"HTTP/1.1 {status} {reason}", f"Content-Type: {content_type}", "Connection: close"]
+    if length is not None:
+        lines.append(f"Content-Length: {length}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_json(writer, status, data):
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    writer.write(response_head(status, "application/json", len(body)) + body)
+    await writer.drain()
+
+
+class Flight:
+    """
+    One running search and the clients waiting on it. Every line sent so far is kept, so a client
+    joining late gets the pages it missed. Lives on the event loop thread.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.lines = []
+        self.subscribers = set()  # an asyncio.Queue per client
+        self.done = False
+        self.cancel_event = threading.Event()
+
+    def publish(self, line):
+        self.lines.append(line)
+        for queue in self.subscribers:
+            queue.put_nowait(line)
+
+    def finish(self, line):
+        self.publish(line)
+        self.done = True
+        for queue in self.subscribers:
+            queue.put_nowait(None)
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        for line in self.lines:
+            queue.put_nowait(line)
+        self.subscribers.add(queue)
+        return queue
+
+
+class SearchDaemon:
+    """
+    Serves searches and Place Details for any number of clients.
+
+    client is the PlacesClient used for every API call, cache a ResponseCache and place_store a PlaceStore,
+    both optional. budget (a prefetch.QuotaBudget) caps the API requests made in any window. Each search
+    reserves its requests (see search_requests) before it starts and cannot make more, retries included:
+    one that needs more ends with an error event. A search the budget cannot cover is refused with 429
+    unless it is answered from the cache.
+    """
+
+    def __init__(self, client, cache=None, place_store=None, budget=None, max_searches=DEFAULT_MAX_SEARCHES,
+                 page_token_pacer=None):
+        self.client = client
+        self.cache = cache
+        self.place_store = place_store
+        self.budget = budget
+        self.page_token_pacer = page_token_pacer
+        self.stats = {"searches": 0, "coalesced": 0, "refused": 0, "details": 0, "details_coalesced": 0}
+        self._flights = {}  # search key -> Flight
+        self._details = {}  # (place id, field mask) -> asyncio.Future
+        self._executor = ThreadPoolExecutor(max_workers=max_searches, thread_name_prefix="daemon-search")
+        self._loop = None
+        self._server = None
+        self._stop_event = None
+        self._thread = None
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Start listening; returns the (host, port) bound."""
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+        """Serve until stop() is called. ready(host, port) is called once listening."""
+        self._stop_event = asyncio.Event()
+        host, port = await self.start(host, port)
+        print(f"[Daemon] Listening on http://{host}:{port}")
+        if ready is not None:
+            ready(host, port)
+        async with self._server:
+            await self._stop_event.wait()
+
+    def start_background(self, host=DEFAULT_HOST, port=0):
+        """Serve on a thread of its own, e.g. next to a benchmark; returns the base URL."""
+        address = []
+        ready = threading.Event()
+
+        def on_ready(bound_host, bound_port):
+            address.append(f"http://{bound_host}:{bound_port}")
+            ready.set()
+
+        self._thread = threading.Thread(target=asyncio.run, args=(self.serve(host, port, on_ready),),
+                                        name="search-daemon", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return address[0]
+
+    def stop(self):
+        """Stop serving (from any thread) and cancel the searches in flight."""
+        for flight in list(self._flights.values()):
+            flight.cancel_event.set()
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # Searches in flight were cancelled above; queued ones never start
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def status(self):
+        return dict(
+            self.stats,
+            in_flight=len(self._flights),
+            budget_left=None if self.budget is None else self.budget.available(),
+        )
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, path, headers, body = request
+            if method == "POST" and path == "/search":
+                await self._search(parse_search(body), writer)
+            elif method == "GET" and path.startswith(DETAILS_PATH):
+                await self._place_details(unquote(path[len(DETAILS_PATH):]), headers.get("x-goog-fieldmask", ""),
+                                          writer)
+            elif method == "GET" and path == "/status":
+                await send_json(writer, 200, self.status())
+            else:
+                await send_json(writer, 404, {"error": f"No such endpoint: {method} {path}"})
+        except BadRequest as e:
+            await send_json(writer, 400, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # the client went away
+        finally:
+            writer.close()
+
+    async def _search(self, params, writer):
+        key = search_key(params)
+        flight = self._flights.get(key)
+        if flight is None:
+            allowed, reservation = self._reserve(params)
+            if not allowed:
+                self.stats["refused"] += 1
+                await send_json(writer, 429, {"error": "The search daemon's API request budget is spent"})
+                return
+            self.stats["searches"] += 1
+            flight = self._flights[key] = Flight(key)
+            self._loop.run_in_executor(self._executor, self._run_search, flight, params, reservation)
+        else:
+            self.stats["coalesced"] += 1
+            print(f"[Daemon] '{params['query']}' joined the same search already in flight")
+
+        queue = flight.subscribe()
+        try:
+            writer.write(response_head(200, "application/x-ndjson"))
+            while True:
+                try:
+                    line = await asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    line = KEEPALIVE_LINE
+                if line is None:
+                    return
+                writer.write(line)
+                await writer.drain()
+        finally:
+            flight.subscribers.discard(queue)
+            if not flight.subscribers and not flight.done:
+                # Nobody is waiting any more; a new client starts the search again
+                flight.cancel_event.set()
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    def _reserve(self, params):
+        """
+        Set aside the requests a search may make. Returns (allowed, reservation); the reservation is None
+        without a budget, and reserves nothing for a search the budget cannot cover that the cache answers.
+        """
+        if self.budget is None:
+            return True, None
+        reservation = self.budget.reserve(search_requests(params))
+        if reservation is not None:
+            return True, reservation
+        # Searches answered from the cache cost nothing
+        if params["sweep"] or self.cache is None:
+            return False, None
+        queries = split_queries(params["query"]) or [params["query"]]
+        cached = all(
+            cached_page_chain(self.cache, query, params["lat"], params["lng"], params["radius"],
+                              SEARCH_FIELD_MASK) is not None
+            for query in queries
+        )
+        return cached, self.budget.reserve(0) if cached else None
+
+    def _run_search(self, flight, params, reservation):
+        """Runs on a pool thread; lines are encoded here and handed to the event loop."""
+        def publish(event):
+            self._call_soon(flight.publish, encode_event(event))
+
+        def progress(text):
+            publish({"event": "progress", "text": text})
+
+        def on_page(places, original_ranks, original_count, pages):
+            publish({"event": "page", "places": places, "original_ranks": original_ranks,
+                     "original_count": original_count, "pages": pages})
+
+        trace = SearchTrace(params["query"])
+        client = self.client
+        allowance = None
+        if reservation is not None:
+            allowance = RequestAllowance(client.rate_limiter, reservation[1])
+            client = client.with_rate_limiter(allowance)
+        original_ranks, places, error = None, None, None
+        if not flight.cancel_event.is_set():
+            try:
+                original_ranks, places, error = google_maps_text_search(
+                    client, params["query"], params["lat"], params["lng"], params["radius"],
+                    min_reviews=params["min_reviews"], progress=progress,
+                    cancel_event=flight.cancel_event, cache=self.cache, sweep=params["sweep"],
+                    place_store=self.place_store, local_first=params["local_first"], on_page=on_page,
+                    page_token_pacer=self.page_token_pacer, trace=trace, scorer=get_scorer(params["rank"]),
+                    top_k=params["top_k"]
+                )
+            except Exception as e:
+                error = f"Search failed: {e}"
+        trace.finish(len(places or []))
+        if allowance is not None:
+            self.budget.settle(reservation, allowance.used)
+        print(f"[Daemon] '{params['query']}' {trace.summary()}")
+
+        if error:
+            line = encode_event({"event": "error", "error": error})
+        else:
+            line = encode_event({"event": "result", "places": places or [], "original_ranks": original_ranks or [],
+                                 "stages": trace.stages, "counters": trace.counters})
+        self._call_soon(self._finish_search, flight, line)
+
+    def _call_soon(self, callback, *args):
+        try:
+            self._loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            pass  # the daemon stopped while the search was running
+
+    def _finish_search(self, flight, line):
+        flight.finish(line)
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    async def _place_details(self, place_id, field_mask, writer):
+        if not place_id or not field_mask:
+            raise BadRequest("Place Details need a place id and an X-Goog-FieldMask header")
+        key = (place_id, field_mask)
+        future = self._details.get(key)
+        if future is None:
+            self.stats["details"] += 1
+            future = self._details[key] = self._loop.run_in_executor(None, self._load_details, place_id, field_mask)
+            future.add_done_callback(lambda _: self._details.pop(key, None))
+        else:
+            self.stats["details_coalesced"] += 1
+        # Shielded so a client going away does not cancel the load the others wait for
+        status, data = await asyncio.shield(future)
+        await send_json(writer, status, data)
+
+    def _load_details(self, place_id, field_mask):
+        cache_key = make_details_cache_key(place_id, field_mask)
+        if self.cache is not None:
+            details = self.cache.get(cache_key)
+            if details is not None:
+                return 200, details
+        reservation = None
+        if self.budget is not None:
+            # One request and every retry the client may make
+            reservation = self.budget.reserve(1 + self.client.max_retries)
+            if reservation is None:
+                return 429, {"error": "The search daemon's API request budget is spent"}
+        trace = SearchTrace(place_id)
+        try:
+            details = self.client.get_place(place_id, field_mask, trace=trace)
+        except PlacesApiError as e:
+            return e.status_code or 502, {"error": str(e)}
+        except Exception as e:
+            print(f"[Daemon] Place Details of {place_id} failed: {e}")
+            return 500, {"error": f"Place Details failed: {e}"}
+        finally:
+            if reservation is not None:
+                self.budget.settle(reservation, trace.counters.get("api_requests", 0))
+        if self.cache is not None:
+            self.cache.put(cache_key, details)
+        return 200, details
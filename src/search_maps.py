@@ -1,28 +1,70 @@
 #!/usr/bin/env python3
+import html
 import json
-import math
+import os
 import sys
+import threading
 import time
-import webbrowser
 
-import requests
+STARTED_AT = time.perf_counter()  # startup timing includes the Qt and application imports below
+
 from PySide6.QtCore import QObject, Slot, Signal
+from PySide6.QtCore import QDeadlineTimer
 from PySide6.QtCore import QSettings
+from PySide6.QtCore import QThread
+from PySide6.QtCore import QTimer
 from PySide6.QtCore import Qt
-from PySide6.QtGui import QColor
-from PySide6.QtWebChannel import QWebChannel
-from PySide6.QtWebEngineWidgets import QWebEngineView
+from PySide6.QtGui import QKeySequence, QShortcut
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QFormLayout,
     QMessageBox, QGroupBox
 )
+from PySide6.QtWidgets import QCheckBox
+from PySide6.QtWidgets import QComboBox
 from PySide6.QtWidgets import QDialog, QDialogButtonBox
+from PySide6.QtWidgets import QDoubleSpinBox
+from PySide6.QtWidgets import QFileDialog
 from PySide6.QtWidgets import QLabel
 from PySide6.QtWidgets import QLineEdit
+from PySide6.QtWidgets import QMenu
 from PySide6.QtWidgets import QSizePolicy
-from PySide6.QtWidgets import QTableWidget, QHeaderView
-from PySide6.QtWidgets import QTableWidgetItem
+from PySide6.QtWidgets import QTableView, QHeaderView
+
+from daemon_client import DaemonClient, default_daemon_url
+from export import ExportError, export_place_store, export_session_store
+from filter_index import ResultFilter
+from geo import haversine_distance
+from metrics import SearchTrace, StartupTrace, export_trace, format_seconds
+from place_store import PlaceStore
+from place_details import PlaceDetailsLoader
+from places_client import PlacesClient
+from prefetch import CLOSE_TIMEOUT, MotionTracker, QuotaBudget, SpeculativePrefetcher
+from ranking import DEFAULT_SCORER, SCORERS, Ranking, get_scorer
+from response_cache import ResponseCache, DEFAULT_TTL_SECONDS, DEFAULT_MAX_BYTES
+from results_model import ResultsTableModel, ResultsProxyModel, PlaceResultStore
+from search_core import google_maps_text_search, normalize_longitude, default_data_dir, split_queries
+from session_store import SessionStore
+from sweep import DEFAULT_PARALLELISM
+from tile_cache import TileCache, DEFAULT_MAX_BYTES as TILE_CACHE_MAX_BYTES
+
+RESTORE_FIRST_ROWS = 100  # rows restored before the table is shown
+RESTORE_CHUNK_ROWS = 2000  # rows restored per idle step afterwards
+DETAILS_PREFETCH_ROWS = 5  # rows below the selected one whose details are loaded ahead
+DETAILS_VISIBLE_LIMIT = 40  # most rows whose details are loaded when they scroll into view
+DETAILS_SCROLL_DELAY_MS = 250  # wait for scrolling to settle before loading visible rows
+PREFETCH_PAUSE_MS = 700  # the map has to rest this long before neighboring areas are prefetched
+
+# Workers still running when the window closed; kept referenced so they are not destroyed while running
+_abandoned_workers = []
+
+PRICE_LEVELS = {
+    "PRICE_LEVEL_FREE": "Free",
+    "PRICE_LEVEL_INEXPENSIVE": "$",
+    "PRICE_LEVEL_MODERATE": "$$",
+    "PRICE_LEVEL_EXPENSIVE": "$$$",
+    "PRICE_LEVEL_VERY_EXPENSIVE": "$$$$",
+}
 
 LEAFLET_HTML = """<!DOCTYPE html>
 <html>
@@ -70,8 +112,17 @@ LEAFLET_HTML = """<!DOCTYPE html>
         .x-line.second {
             transform: rotate(-45deg);
         }
+        .place-cluster div {
+            border-radius: 50%;
+            background: rgba(217, 72, 15, 0.75);
+            border: 2px solid #ffffff;
+            color: #ffffff;
+            font: bold 12px sans-serif;
+            text-align: center;
+            box-sizing: border-box;
+        }
     </style>
-    <link rel="stylesheet" href="https://unpkg.com/leaflet/dist/leaflet.css"/>
+    <link rel="stylesheet" href="searchmaps://assets/leaflet/leaflet.css"/>
 </head>
 <body>
 <div id="map"></div>
@@ -79,17 +130,18 @@ LEAFLET_HTML = """<!DOCTYPE html>
     <div class="x-line first"></div>
     <div class="x-line second"></div>
 </div>
-<script src="https://unpkg.com/leaflet/dist/leaflet.js"></script>
-<script src="qrc:///qtwebchannel/qwebchannel.js"></script>
+<script src="searchmaps://assets/leaflet/leaflet.js"></script>
+<script src="searchmaps://assets/qwebchannel.js"></script>
+<script src="searchmaps://assets/markers.js"></script>
 <script>
     var initialCenter = [48.8584, 2.2945];
     var initialZoom = 5;
     var map = L.map('map').setView(initialCenter, initialZoom);
 
-    L.tileLayer('https://{s}.basemaps.cartocdn.com/rastertiles/voyager/{z}/{x}/{y}{r}.png', {
+    // Tiles are served from the local tile cache, which downloads missing ones from CARTO
+    L.tileLayer('searchmaps://tiles/{z}/{x}/{y}{r}.png', {
         maxZoom: 20,
-        attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors &copy; <a href="https://carto.com/">CARTO</a>',
-        subdomains: 'abcd'
+        attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors &copy; <a href="https://carto.com/">CARTO</a>'
     }).addTo(map);
 
     var radiusMeters = 50000;
@@ -100,27 +152,65 @@ LEAFLET_HTML = """<!DOCTYPE html>
         radius: radiusMeters
     }).addTo(map);
 
+    // Pan/zoom events fire every animation frame. Center updates are throttled to one per
+    // CENTER_THROTTLE_MS (trailing edge, aligned to a frame) and committed on moveend.
+    var CENTER_THROTTLE_MS = 250;
+    var centerUpdateScheduled = false;
+    var lastSentCenter = null;
+
     map.on('move', function () {
         centerCircle.setLatLng(map.getCenter());
-        updatePythonCenter();
+        scheduleCenterUpdate();
     });
+    // moveend also fires after zooming
+    map.on('moveend', updatePythonCenter);
+
+    function scheduleCenterUpdate() {
+        if (centerUpdateScheduled) {
+            return;
+        }
+        centerUpdateScheduled = true;
+        setTimeout(function () {
+            requestAnimationFrame(function () {
+                centerUpdateScheduled = false;
+                updatePythonCenter();
+            });
+        }, CENTER_THROTTLE_MS);
+    }
 
     function updatePythonCenter() {
         if (window.bridge) {
             var c = map.getCenter();
             var z = map.getZoom();
+            if (lastSentCenter && lastSentCenter[0] === c.lat && lastSentCenter[1] === c.lng && lastSentCenter[2] === z) {
+                return;
+            }
+            lastSentCenter = [c.lat, c.lng, z];
             window.bridge.setCenterAndZoom(c.lat, c.lng, z);
         }
     }
 
-    map.on('move', updatePythonCenter);
-    map.on('zoom', updatePythonCenter);
+    // Result markers; a click selects the place's row in the table
+    var placeMarkers = new PlaceMarkers(map, function (placeId) {
+        if (window.bridge) {
+            window.bridge.selectPlace(placeId);
+        }
+    });
 
     // QWebChannel setup
     new QWebChannel(qt.webChannelTransport, function (channel) {
         window.bridge = channel.objects.bridge;
-        // Send initial center
-        updatePythonCenter();
+        window.bridge.placesCleared.connect(function () {
+            placeMarkers.clear();
+        });
+        window.bridge.placesAdded.connect(function (payload) {
+            placeMarkers.add(JSON.parse(payload));
+        });
+        window.bridge.placeHighlighted.connect(function (placeId) {
+            placeMarkers.highlight(placeId, true);
+        });
+        // Signals emitted before this point were lost, ask for the view and the current results
+        window.bridge.mapReady();
     });
 
     // Add a function to set map view from Python
@@ -139,41 +229,239 @@ LEAFLET_HTML = """<!DOCTYPE html>
 """
 
 
-class ResultsTableWidget(QTableWidget):
+def format_place_details(details):
+    """Rich text for the details panel from a Place Details response."""
+    esc = html.escape
+    lines = [f"<b>{esc(details.get('displayName', {}).get('text', ''))}</b>"]
+    if details.get('formattedAddress'):
+        lines.append(esc(details['formattedAddress']))
+    facts = []
+    status = details.get('businessStatus')
+    if status and status != "OPERATIONAL":
+        facts.append(esc(status.replace("_", " ").capitalize()))
+    if details.get('priceLevel') in PRICE_LEVELS:
+        facts.append(PRICE_LEVELS[details['priceLevel']])
+    if details.get('nationalPhoneNumber'):
+        facts.append(esc(details['nationalPhoneNumber']))
+    if details.get('plusCode', {}).get('globalCode'):
+        facts.append(esc(details['plusCode']['globalCode']))
+    photos = len(details.get('photos', []))
+    if photos:
+        facts.append(f"{photos} photo{'s' if photos != 1 else ''}")
+    if facts:
+        lines.append(" · ".join(facts))
+    links = []
+    if details.get('websiteUri'):
+        links.append(f"<a href=\"{esc(details['websiteUri'], quote=True)}\">Website</a>")
+    if details.get('googleMapsUri'):
+        links.append(f"<a href=\"{esc(details['googleMapsUri'], quote=True)}\">Google Maps</a>")
+    if links:
+        lines.append(" · ".join(links))
+    hours = details.get('regularOpeningHours', {}).get('weekdayDescriptions', [])
+    if hours:
+        lines.append("<br>".join(esc(day) for day in hours))
+    return "<br>".join(lines)
+
+
+class ResultsTableView(QTableView):
+    """Results table over a sortable proxy of ResultsTableModel. Rows are reported as source (store) rows."""
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self._parent_ui = parent  # Reference to SearchMapsUI
+        self.results_model = ResultsTableModel(self)
+        self.proxy_model = ResultsProxyModel(self)
+        self.proxy_model.setSourceModel(self.results_model)
+        self.setModel(self.proxy_model)
+
+    def source_row(self, index):
+        """Map a view index to the row in the result store."""
+        return self.results_model.store_row(self.proxy_model.mapToSource(index).row())
+
+    def current_source_row(self):
+        index = self.currentIndex()
+        return self.source_row(index) if index.isValid() else -1
+
+    def set_filter(self, result_filter):
+        """Narrow the rows shown, keeping the current place selected while it still matches."""
+        row = self.current_source_row()
+        self.results_model.set_filter(result_filter)
+        if row >= 0:
+            self.select_source_row(row)
+
+    def select_source_row(self, row):
+        index = self.proxy_model.mapFromSource(self.results_model.index(self.results_model.model_row(row), 0))
+        if index.isValid():
+            self.setCurrentIndex(index)
+            self.scrollTo(index)
 
     def keyPressEvent(self, event):
         if event.key() in (Qt.Key_Return, Qt.Key_Enter):
-            selected = self.selectedIndexes()
-            if selected:
-                row = selected[0].row()
-                if self._parent_ui:
-                    self._parent_ui.open_place_in_maps(row)
+            index = self.currentIndex()
+            if index.isValid() and self._parent_ui:
+                self._parent_ui.open_place_in_maps(self.source_row(index))
             return  # Prevent default
         super().keyPressEvent(event)
 
 
+def marker_payload(ids, names, latitudes, longitudes):
+    """Columnar JSON batch of markers for the map; places without coordinates are left out."""
+    batch = {"ids": [], "names": [], "lat": [], "lng": []}
+    for place_id, name, lat, lng in zip(ids, names, latitudes, longitudes):
+        if not place_id or lat is None or lng is None or lat != lat or lng != lng:
+            continue
+        batch["ids"].append(place_id)
+        batch["names"].append(name)
+        batch["lat"].append(round(lat, 6))
+        batch["lng"].append(round(lng, 6))
+    return json.dumps(batch, ensure_ascii=False, separators=(",", ":"))
+
+
 class MapBridge(QObject):
     centerChanged = Signal(float, float, int)  # latitude, longitude, zoom
+    ready = Signal()  # the page is listening for marker updates
+    placeSelected = Signal(str)  # place id of a clicked marker
+
+    # Sent to the page; markers are keyed by place id so table sorting never touches the map
+    placesCleared = Signal()
+    placesAdded = Signal(str)  # marker_payload() batch
+    placeHighlighted = Signal(str)  # place id
+
+    # centerChanged is emitted at most once per interval; the latest position is always delivered last
+    CENTER_SIGNAL_INTERVAL_MS = 200
 
     def __init__(self):
         super().__init__()
         self.latitude = 48.8584
         self.longitude = 2.2945
         self.zoom = 5
+        self._last_emit = 0.0
+        self._emit_timer = QTimer(self)
+        self._emit_timer.setSingleShot(True)
+        self._emit_timer.timeout.connect(self._emit_center_changed)
 
     @Slot(float, float, int)
     def setCenterAndZoom(self, lat, lng, zoom):
         self.latitude = lat
         self.longitude = lng
         self.zoom = zoom
-        self.centerChanged.emit(lat, lng, zoom)
+        if self._emit_timer.isActive():
+            return  # a trailing emit is already scheduled and will pick up this position
+        elapsed_ms = (time.monotonic() - self._last_emit) * 1000
+        if elapsed_ms >= self.CENTER_SIGNAL_INTERVAL_MS:
+            self._emit_center_changed()
+        else:
+            self._emit_timer.start(int(self.CENTER_SIGNAL_INTERVAL_MS - elapsed_ms))
+
+    def _emit_center_changed(self):
+        self._last_emit = time.monotonic()
+        self.centerChanged.emit(self.latitude, self.longitude, self.zoom)
+
+    @Slot()
+    def mapReady(self):
+        self.ready.emit()
+
+    @Slot(str)
+    def selectPlace(self, place_id):
+        self.placeSelected.emit(place_id)
+
+    def clear_places(self):
+        self.placesCleared.emit()
+
+    def add_places(self, places):
+        """Send Places API dicts to the map as one batch."""
+        if not places:
+            return
+        locations = [place.get('location', {}) for place in places]
+        self.placesAdded.emit(marker_payload(
+            [place.get('id', '') for place in places],
+            [place.get('displayName', {}).get('text', '') for place in places],
+            [location.get('latitude') for location in locations],
+            [location.get('longitude') for location in locations]
+        ))
+
+    def set_places(self, store):
+        """Replace the map markers with every row of a PlaceResultStore in one batch."""
+        self.placesCleared.emit()
+        if len(store):
+            self.placesAdded.emit(marker_payload(store.ids, store.names, store.latitudes, store.longitudes))
+
+
+class SearchWorker(QThread):
+    """Runs a Places search off the GUI thread and reports back through signals."""
+    progress = Signal(int, str)  # search id, status text
+    page_ready = Signal(int, list, list, int, int)  # search id, ranked places, original ranks, original count, pages
+    succeeded = Signal(int, list, list)  # search id, ranked places, original ranks
+    failed = Signal(int, str)  # search id, error message
+
+    def __init__(self, search_id, search_fn, search_kwargs, parent=None):
+        super().__init__(parent)
+        self.search_id = search_id
+        self.trace = search_kwargs.get("trace")
+        self._search_fn = search_fn
+        self._search_kwargs = search_kwargs
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """Ask the search to stop; its results will not be delivered."""
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        try:
+            original_ranks, places, error = self._search_fn(
+                progress=lambda text: self.progress.emit(self.search_id, text),
+                on_page=lambda places, ranks, count, pages: self.page_ready.emit(
+                    self.search_id, places, ranks, count, pages),
+                cancel_event=self._cancel_event,
+                **self._search_kwargs
+            )
+        except Exception as e:
+            original_ranks, places, error = None, None, f"Search failed: {e}"
+
+        if self.is_cancelled():
+            return
+        if error:
+            self.failed.emit(self.search_id, error)
+        else:
+            self.succeeded.emit(self.search_id, places, original_ranks)
+
+
+class ExportWorker(QThread):
+    """Writes an export file off the GUI thread."""
+    progress = Signal(int)  # places written so far
+    succeeded = Signal(int, str)  # places written, path
+    failed = Signal(str)  # error message
+
+    def __init__(self, export_fn, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self._export_fn = export_fn
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        try:
+            count = self._export_fn(self.path, progress=self.progress.emit, cancel_event=self._cancel_event)
+        except ExportError as e:
+            self.failed.emit(str(e))
+            return
+        except Exception as e:
+            self.failed.emit(f"Export failed: {e}")
+            return
+        self.succeeded.emit(count, self.path)
+
+
+EXPORT_FILE_FILTERS = "CSV (*.csv);;GeoJSON (*.geojson);;Parquet (*.parquet);;Arrow (*.arrow)"
 
 
 class SearchMapsUI(QMainWindow):
     """Main UI class for the SearchMaps application."""
+    details_loaded = Signal(str, object, str)  # place id, details dict or None, error
 
     def __init__(self):
         super().__init__()
@@ -181,8 +469,97 @@ class SearchMapsUI(QMainWindow):
         self.setMinimumSize(1000, 800)
         self.provider_name = ""
         self.selected_row = None
+        self.search_worker = None
+        self.export_worker = None
+        self._search_counter = 0
+        self._search_streamed = False
+        self._running_workers = set()
+        self.response_cache = self.create_response_cache()
+        settings = QSettings("YourCompany", "SearchMaps")
+        self.places_client = PlacesClient(settings.value("api_key", ""), base_url=settings.value("api_base_url", ""))
+        # With a search daemon, searches and Place Details go through it instead of straight to the API
+        daemon_url = settings.value("daemon_url", "") or default_daemon_url()
+        self.daemon_client = DaemonClient(daemon_url) if daemon_url else None
+        # Rich fields are loaded per place when its row is selected or scrolled into view
+        self.details_loader = PlaceDetailsLoader(
+            self.daemon_client or self.places_client, cache=self.response_cache, on_loaded=self.details_loaded.emit
+        )
+        self.details_loaded.connect(self.on_details_loaded)
+        self._details_place_id = None
+        self.details_prefetch = settings.value("details_prefetch", True, type=bool)
+        # Areas the user is likely to search next are fetched into the response cache while the map rests
+        self.area_prefetcher = SpeculativePrefetcher(
+            self.places_client, self.response_cache,
+            budget=QuotaBudget(int(settings.value("prefetch_budget_per_hour", 60)), 3600)
+        )
+        self.map_motion = MotionTracker()
+        self.place_store = self.create_place_store()
+        self.session_store = SessionStore(os.path.join(default_data_dir(), "session.sqlite3"))
+        self._restore_chunks = None
+        self._restore_selected_row = None
+        self._search_circle = None  # (latitude, longitude, radius) of the results shown
+        self.startup = StartupTrace(STARTED_AT)
+        self._first_shown = False
         self.setup_ui()
 
+    def create_response_cache(self):
+        """Open the on-disk Places response cache in the application data directory."""
+        settings = QSettings("YourCompany", "SearchMaps")
+        ttl_hours = float(settings.value("cache_ttl_hours", DEFAULT_TTL_SECONDS / 3600))
+        max_mb = float(settings.value("cache_max_mb", DEFAULT_MAX_BYTES / (1024 * 1024)))
+        return ResponseCache(
+            os.path.join(default_data_dir(), "places_cache.sqlite3"),
+            ttl=ttl_hours * 3600,
+            max_bytes=int(max_mb * 1024 * 1024)
+        )
+
+    def create_tile_cache(self):
+        """Open the on-disk basemap tile cache."""
+        settings = QSettings("YourCompany", "SearchMaps")
+        max_mb = float(settings.value("tile_cache_max_mb", TILE_CACHE_MAX_BYTES / (1024 * 1024)))
+        return TileCache(os.path.join(default_data_dir(), "tiles.sqlite3"), max_bytes=int(max_mb * 1024 * 1024))
+
+    def create_place_store(self):
+        """Open the local store of every place fetched so far."""
+        return PlaceStore(os.path.join(default_data_dir(), "places.sqlite3"))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self._first_shown:
+            self._first_shown = True
+            # Runs once the window has been painted
+            QTimer.singleShot(0, self.on_first_paint)
+
+    def on_first_paint(self):
+        self.startup.mark("window")
+        self.restore_settings()
+        QTimer.singleShot(0, self.on_table_restored)
+
+    def on_table_restored(self):
+        self.startup.mark("table")
+        self.init_map()
+
+    def init_map(self):
+        """Start the web engine and load the map page in place of the placeholder."""
+        from PySide6.QtWebChannel import QWebChannel
+        from PySide6.QtWebEngineWidgets import QWebEngineView
+        from map_scheme import MapSchemeHandler, MAP_PAGE_URL, SCHEME
+
+        self.map_view = QWebEngineView()
+        self.map_view.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        # The page, Leaflet and the basemap tiles are all served locally through searchmaps://
+        self.tile_cache = self.create_tile_cache()
+        self.map_scheme_handler = MapSchemeHandler(LEAFLET_HTML, self.tile_cache, self)
+        self.map_view.page().profile().installUrlSchemeHandler(SCHEME, self.map_scheme_handler)
+        self.map_channel = QWebChannel()
+        self.map_channel.registerObject("bridge", self.map_bridge)
+        self.map_view.page().setWebChannel(self.map_channel)
+        self.map_view.setUrl(MAP_PAGE_URL)
+
+        self.map_placeholder.parentWidget().layout().replaceWidget(self.map_placeholder, self.map_view)
+        self.map_placeholder.deleteLater()
+        self.map_placeholder = None
+
     def setup_ui(self):
         # Create central widget and main layout
         central_widget = QWidget()
@@ -200,7 +577,7 @@ class SearchMapsUI(QMainWindow):
         self.fetch_button = QPushButton("Search")
 
         self.search_query_edit = QLineEdit()
-        self.search_query_edit.setPlaceholderText("Enter search query (e.g. restaurant)")
+        self.search_query_edit.setPlaceholderText("Enter search query (e.g. restaurant, or cafe OR bakery)")
         self.search_query_edit.returnPressed.connect(self.fetch_button.click)
         input_layout.addRow("Search Query:", self.search_query_edit)
 
@@ -213,16 +590,37 @@ class SearchMapsUI(QMainWindow):
         self.radius_spin.setSingleStep(1)
         input_layout.addRow("Radius:", self.radius_spin)
 
-        # Add OpenStreetMap widget
-        self.map_view = QWebEngineView()
-        self.map_view.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-        self.map_view.setHtml(LEAFLET_HTML)
-        input_layout.addRow(self.map_view)
+        # Results are re-ranked in place when the scorer changes, nothing is fetched again
+        self.ranking_combo = QComboBox()
+        for scorer in SCORERS.values():
+            self.ranking_combo.addItem(scorer.label, scorer.name)
+        self.ranking_combo.currentIndexChanged.connect(self.on_ranking_changed)
+        input_layout.addRow("Rank by:", self.ranking_combo)
+
+        # Sweep mode covers the circle with smaller tiles to get past the 60 result limit
+        self.sweep_checkbox = QCheckBox("Sweep area (more results, more API calls)")
+        input_layout.addRow("", self.sweep_checkbox)
+
+        # Local first answers from previously fetched places when they cover the circle
+        self.local_first_checkbox = QCheckBox("Local first (reuse stored places when possible)")
+        input_layout.addRow("", self.local_first_checkbox)
+
+        # Prefetch fetches the areas around the map center into the cache, using a capped number of API calls
+        self.prefetch_checkbox = QCheckBox("Prefetch nearby areas while panning (uses API calls)")
+        input_layout.addRow("", self.prefetch_checkbox)
+
+        # The OpenStreetMap widget takes the web engine, which is slow to start; init_map() creates it
+        # once the window and the restored table are on screen, until then this placeholder holds its place
+        self.map_view = None
+        self.tile_cache = None
+        self.map_placeholder = QLabel("Loading map...")
+        self.map_placeholder.setAlignment(Qt.AlignCenter)
+        self.map_placeholder.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
 
         self.map_bridge = MapBridge()
-        self.map_channel = QWebChannel()
-        self.map_channel.registerObject("bridge", self.map_bridge)
-        self.map_view.page().setWebChannel(self.map_channel)
+        self.map_bridge.ready.connect(self.on_map_ready)
+        self.map_bridge.placeSelected.connect(self.on_map_place_selected)
+        self.map_bridge.centerChanged.connect(self.on_map_center_changed)
 
         self.radius_spin.valueChanged.connect(self.update_map_radius)
 
@@ -250,7 +648,7 @@ class SearchMapsUI(QMainWindow):
 
         input_group.setLayout(input_layout)
         left_layout.addWidget(input_group)
-        left_layout.addWidget(self.map_view, stretch=1)
+        left_layout.addWidget(self.map_placeholder, stretch=1)
 
         # Add left column to main layout
         main_layout.addWidget(left_column)
@@ -261,28 +659,87 @@ class SearchMapsUI(QMainWindow):
         right_column = QWidget()
         right_layout = QVBoxLayout(right_column)
 
+        # Live filter over the results already loaded, no search is run
+        filter_layout = QHBoxLayout()
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filter by name or address")
+        self.filter_edit.setClearButtonEnabled(True)
+        filter_layout.addWidget(self.filter_edit, stretch=1)
+        self.min_rating_spin = QDoubleSpinBox()
+        self.min_rating_spin.setRange(0.0, 5.0)
+        self.min_rating_spin.setSingleStep(0.1)
+        self.min_rating_spin.setDecimals(1)
+        self.min_rating_spin.setPrefix("Rating ≥ ")
+        self.min_rating_spin.setSpecialValueText("Any rating")
+        filter_layout.addWidget(self.min_rating_spin)
+        self.min_reviews_spin = QSpinBox()
+        self.min_reviews_spin.setRange(0, 10000000)
+        self.min_reviews_spin.setSingleStep(10)
+        self.min_reviews_spin.setPrefix("Reviews ≥ ")
+        self.min_reviews_spin.setSpecialValueText("Any reviews")
+        filter_layout.addWidget(self.min_reviews_spin)
+        self.max_reviews_spin = QSpinBox()
+        self.max_reviews_spin.setRange(0, 10000000)
+        self.max_reviews_spin.setSingleStep(10)
+        self.max_reviews_spin.setPrefix("Reviews ≤ ")
+        self.max_reviews_spin.setSpecialValueText("No maximum")
+        filter_layout.addWidget(self.max_reviews_spin)
+        self.filter_count_label = QLabel("")
+        filter_layout.addWidget(self.filter_count_label)
+        # Exports are written in a background thread, chunk by chunk
+        self.export_button = QPushButton("Export…")
+        export_menu = QMenu(self.export_button)
+        export_menu.addAction("Results…", self.export_results)
+        export_menu.addAction("All stored places…", self.export_stored_places)
+        self.export_button.setMenu(export_menu)
+        filter_layout.addWidget(self.export_button)
+        self.filter_edit.textChanged.connect(self.apply_filter)
+        self.min_rating_spin.valueChanged.connect(self.apply_filter)
+        self.min_reviews_spin.valueChanged.connect(self.apply_filter)
+        self.max_reviews_spin.valueChanged.connect(self.apply_filter)
+        right_layout.addLayout(filter_layout)
+
         # Create the results table
-        self.results_table = ResultsTableWidget(self)
-        self.results_table.cellClicked.connect(self.on_table_row_clicked)
-        self.results_table.cellDoubleClicked.connect(self.on_table_row_double_clicked)
-        self.results_table.setColumnCount(5)
-        self.results_table.setHorizontalHeaderLabels([
-            "#", "Place name", "Rating", "Reviews count", "Address"
-        ])
+        self.results_table = ResultsTableView(self)
+        self.results_table.clicked.connect(self.on_table_row_clicked)
+        self.results_table.doubleClicked.connect(self.on_table_row_double_clicked)
         header = self.results_table.horizontalHeader()
         header.setSectionResizeMode(1, QHeaderView.Stretch)  # Place name
         header.setSectionResizeMode(2, QHeaderView.ResizeToContents)  # Rating
         header.setSectionResizeMode(3, QHeaderView.ResizeToContents)  # Reviews count
         header.setSectionResizeMode(4, QHeaderView.Stretch)  # Address
         header.setSectionResizeMode(0, QHeaderView.ResizeToContents)  # "#" column
+        # Size columns from the visible rows only, large result sets would otherwise be measured in full
+        header.setResizeContentsPrecision(50)
 
         self.results_table.verticalHeader().setVisible(False)
-        self.results_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.results_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.results_table.setEditTriggers(QTableView.NoEditTriggers)
+        self.results_table.setSelectionBehavior(QTableView.SelectRows)
+        # Click any header to sort; start out in ranking order
+        header.setSortIndicator(-1, Qt.AscendingOrder)
+        self.results_table.setSortingEnabled(True)
         self.results_table.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        self.results_table.selectionModel().currentRowChanged.connect(self.on_table_current_row_changed)
+        self.results_table.results_model.rowsInserted.connect(self.update_filter_count)
+        self.results_table.results_model.modelReset.connect(self.update_filter_count)
 
         right_layout.addWidget(self.results_table)
 
+        self.details_label = QLabel("")
+        self.details_label.setWordWrap(True)
+        self.details_label.setOpenExternalLinks(True)
+        self.details_label.setTextInteractionFlags(Qt.TextBrowserInteraction)
+        self.details_label.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        self.details_label.setVisible(False)
+        right_layout.addWidget(self.details_label)
+
+        # Details of rows scrolled into view are loaded once scrolling settles
+        self._details_scroll_timer = QTimer(self)
+        self._details_scroll_timer.setSingleShot(True)
+        self._details_scroll_timer.setInterval(DETAILS_SCROLL_DELAY_MS)
+        self._details_scroll_timer.timeout.connect(self.prefetch_visible_details)
+        self.results_table.verticalScrollBar().valueChanged.connect(self._details_scroll_timer.start)
+
         # Make the table fill the right layout
         right_column.setLayout(right_layout)
 
@@ -290,10 +747,194 @@ class SearchMapsUI(QMainWindow):
         main_layout.addWidget(left_column, stretch=1)
         main_layout.addWidget(right_column, stretch=2)
 
-        self.map_view.loadFinished.connect(self.on_map_load_finished)
+        self._prefetch_timer = QTimer(self)
+        self._prefetch_timer.setSingleShot(True)
+        self._prefetch_timer.setInterval(PREFETCH_PAUSE_MS)
+        self._prefetch_timer.timeout.connect(self.prefetch_nearby_areas)
+
+        # Loads the rest of a restored result set in small chunks between events
+        self._restore_timer = QTimer(self)
+        self._restore_timer.timeout.connect(self.restore_next_chunk)
+
+        # Escape cancels a running search
+        self.cancel_shortcut = QShortcut(QKeySequence(Qt.Key_Escape), self)
+        self.cancel_shortcut.activated.connect(self.cancel_search)
+
+    def on_table_row_clicked(self, index):
+        self.selected_row = self.results_table.source_row(index)
+
+    def on_table_current_row_changed(self, current, previous):
+        if current.isValid():
+            place_id = self.results_table.results_model.store.ids[self.results_table.source_row(current)]
+            if place_id:
+                self.map_bridge.placeHighlighted.emit(place_id)
+                self.show_place_details(place_id)
+                self.prefetch_details(current.row() + 1, current.row() + 1 + DETAILS_PREFETCH_ROWS)
+
+    def apply_filter(self):
+        self.results_table.set_filter(ResultFilter(
+            self.filter_edit.text(),
+            min_rating=self.min_rating_spin.value() or None,
+            min_reviews=self.min_reviews_spin.value() or None,
+            max_reviews=self.max_reviews_spin.value() or None
+        ))
+
+    def update_filter_count(self):
+        model = self.results_table.results_model
+        if model.is_filtered():
+            self.filter_count_label.setText(f"{model.rowCount()} of {len(model.store)}")
+        else:
+            self.filter_count_label.setText("")
+
+    def export_results(self):
+        session_path = self.session_store.path
+
+        def export_fn(path, **kwargs):
+            # The worker thread reads the saved result set through its own connection
+            session_store = SessionStore(session_path)
+            try:
+                return export_session_store(session_store, path, **kwargs)
+            finally:
+                session_store.close()
+
+        self.start_export("Export results", export_fn)
+
+    def export_stored_places(self):
+        place_store = self.place_store
+        self.start_export("Export all stored places",
+                          lambda path, **kwargs: export_place_store(place_store, path, **kwargs))
+
+    def start_export(self, title, export_fn):
+        if self.export_worker is not None:
+            self.show_error("An export is already running.")
+            return
+        settings = QSettings("YourCompany", "SearchMaps")
+        path, selected_filter = QFileDialog.getSaveFileName(
+            self, title, settings.value("export_path", os.path.expanduser("~/places.csv")), EXPORT_FILE_FILTERS
+        )
+        if not path:
+            return
+        if not os.path.splitext(path)[1]:
+            # "Parquet (*.parquet)" -> ".parquet"
+            path += selected_filter[selected_filter.index("*") + 1:-1]
+        settings.setValue("export_path", path)
+
+        print(f"[Export] Writing {path}")
+        worker = ExportWorker(export_fn, path, self)
+        worker.progress.connect(lambda count: self.status_label.setText(f"Exporting... {count} places"))
+        worker.succeeded.connect(self.on_export_succeeded)
+        worker.failed.connect(self.on_export_failed)
+        worker.finished.connect(self.on_export_worker_finished)
+        self.export_worker = worker
+        self._running_workers.add(worker)
+        self.export_button.setEnabled(False)
+        worker.start()
+
+    def on_export_succeeded(self, count, path):
+        print(f"[Export] Wrote {count} places to {path}")
+        self.status_label.setText(f"Exported {count} places to {os.path.basename(path)}")
+
+    def on_export_failed(self, error):
+        self.status_label.setText("")
+        self.show_error(error)
+
+    def on_export_worker_finished(self):
+        worker = self.sender()
+        self._running_workers.discard(worker)
+        worker.deleteLater()
+        self.export_worker = None
+        self.export_button.setEnabled(True)
+
+    def show_place_details(self, place_id):
+        self._details_place_id = place_id
+        details = self.details_loader.get_cached(place_id)
+        if details is not None:
+            self.details_label.setText(format_place_details(details))
+        elif not self.can_load_details():
+            self.details_label.setText("Set an API key in Settings to load place details.")
+        else:
+            self.details_label.setText("Loading details...")
+            self.details_loader.request(place_id)
+        self.details_label.setVisible(True)
+
+    def can_load_details(self):
+        """A search daemon loads details with its own API key, otherwise one has to be set here."""
+        return self.daemon_client is not None or bool(self.places_client.api_key)
+
+    def on_details_loaded(self, place_id, details, error):
+        if place_id != self._details_place_id:
+            return  # a prefetch, or the selection moved on
+        if details is not None:
+            self.details_label.setText(format_place_details(details))
+        elif error != "cancelled":
+            self.details_label.setText(html.escape(f"Could not load details: {error}"))
+
+    def prefetch_details(self, first_row, last_row):
+        """Queue details of the view rows in [first_row, last_row) ahead of need."""
+        if not self.details_prefetch or not self.can_load_details():
+            return
+        table = self.results_table
+        proxy = table.proxy_model
+        store = table.results_model.store
+        rows = range(max(first_row, 0), min(last_row, proxy.rowCount()))
+        self.details_loader.prefetch([store.ids[table.source_row(proxy.index(row, 0))] for row in rows])
+
+    def prefetch_visible_details(self):
+        table = self.results_table
+        first = table.rowAt(0)
+        if first < 0:
+            return
+        last = table.rowAt(table.viewport().height() - 1)
+        last = table.proxy_model.rowCount() - 1 if last < 0 else last
+        self.prefetch_details(first, min(last + 1, first + DETAILS_VISIBLE_LIMIT))
+
+    def on_map_ready(self):
+        # The page (re)loaded, still showing its default view and no markers
+        bridge = self.map_bridge
+        self.map_view.page().runJavaScript(
+            f"window.setMapView({bridge.latitude}, {bridge.longitude}, {bridge.zoom});"
+            f" window.setCircleRadius({self.radius_spin.value() * 1000});"
+        )
+        bridge.set_places(self.results_table.results_model.store)
+        self.on_table_current_row_changed(self.results_table.currentIndex(), None)
+        if "map" not in self.startup.milestones:
+            self.startup.mark("map")
+            print(f"[Startup] {self.startup.summary()}")
+            settings = QSettings("YourCompany", "SearchMaps")
+            try:
+                export_trace(self.startup, settings.value("metrics_jsonl", ""), settings.value("metrics_textfile", ""))
+            except OSError as e:
+                print(f"[Metrics] Export failed: {e}")
+
+    def on_map_center_changed(self, latitude, longitude, zoom):
+        if not self.prefetch_checkbox.isChecked():
+            return
+        self.map_motion.add(latitude, longitude, zoom)
+        # Prefetch once the map has rested for a moment
+        self._prefetch_timer.start()
+
+    def prefetch_nearby_areas(self):
+        search_string = self.search_query_edit.text().strip()
+        settings = QSettings("YourCompany", "SearchMaps")
+        if (not search_string or not settings.value("api_key", "") or self.search_worker is not None
+                or self.sweep_checkbox.isChecked() or not self.prefetch_checkbox.isChecked()
+                or self.daemon_client is not None):
+            return
+        self.places_client.api_key = settings.value("api_key", "")
+        self.area_prefetcher.schedule(
+            split_queries(search_string) or [search_string],
+            self.map_bridge.latitude, normalize_longitude(self.map_bridge.longitude),
+            self.radius_spin.value() * 1000, self.map_motion.displacement()
+        )
 
-    def on_table_row_clicked(self, row, column):
+    def on_map_place_selected(self, place_id):
+        store = self.results_table.results_model.store
+        try:
+            row = store.ids.index(place_id)
+        except ValueError:
+            return
         self.selected_row = row
+        self.results_table.select_source_row(row)
 
     def show_settings_dialog(self):
         # Load current key from settings
@@ -304,161 +945,190 @@ class SearchMapsUI(QMainWindow):
             new_key = dialog.get_api_key()
             settings.setValue("api_key", new_key)
             self.api_key = new_key
+            self.places_client.api_key = new_key
 
     def open_place_in_maps(self, row):
-        item = self.results_table.item(row, 1)
-        if item:
-            place_id = item.data(1000)
-            if place_id:
-                url = f"https://www.google.com/maps/place/?q=place_id:{place_id}"
-                webbrowser.open(url)
-                return
+        import webbrowser
 
-        # Fallback: try coordinates
-        if not hasattr(self, "last_places"):
+        store = self.results_table.results_model.store
+        if not 0 <= row < len(store):
             return
-        if row >= len(self.last_places):
+        place_id = store.ids[row]
+        if place_id:
+            url = f"https://www.google.com/maps/place/?q=place_id:{place_id}"
+            webbrowser.open(url)
             return
-        place = self.last_places[row]
-        location = place.get("location", {})
-        lat = location.get("latitude")
-        lng = location.get("longitude")
-        if lat is not None and lng is not None:
+
+        # Fallback: try coordinates
+        coordinates = store.coordinates(row)
+        if coordinates is not None:
+            lat, lng = coordinates
             url = f"https://www.google.com/maps/search/?api=1&query={lat},{lng}"
             webbrowser.open(url)
 
-    def on_map_load_finished(self, ok):
-        if ok:
-            self.restore_settings()
-
-    def on_table_row_double_clicked(self, row, column):
+    def on_table_row_double_clicked(self, index):
+        row = self.results_table.source_row(index)
         self.selected_row = row
         self.open_place_in_maps(row)
 
     def on_fetch_button_clicked(self):
         settings = QSettings("YourCompany", "SearchMaps")
         api_key = settings.value("api_key", "")
-        if not api_key:
+        if not api_key and self.daemon_client is None:
             self.show_error("API key is not set. Please set it in Settings.")
             return
 
-        # Show loading status and disable button
+        # A new search replaces the one in flight
+        self.cancel_search()
         self.status_label.setText("Loading...")
-        self.fetch_button.setEnabled(False)
-        QApplication.processEvents()  # Force UI update
 
         search_string = self.search_query_edit.text().strip()
         latitude = self.map_bridge.latitude
-        longitude = self.normalize_longitude(self.map_bridge.longitude)
+        longitude = normalize_longitude(self.map_bridge.longitude)
         radius = self.radius_spin.value() * 1000  # in meters
 
+        # The search gets the API to itself. The pages of a prefetched circle next to the map center are used
+        # when there is one, while the results are still filtered and ranked around the map center.
+        self._prefetch_timer.stop()
+        self.area_prefetcher.preempt()
+        fetch_center = None
+        if self.prefetch_checkbox.isChecked() and not self.sweep_checkbox.isChecked() and self.daemon_client is None:
+            fetch_center = self.area_prefetcher.cached_center(
+                split_queries(search_string) or [search_string], latitude, longitude, radius
+            )
+            if fetch_center is not None:
+                print(f"[Prefetch] Using the pages of the prefetched circle at {fetch_center[0]}, "
+                      f"{fetch_center[1]}, {haversine_distance(latitude, longitude, *fetch_center):.0f} m "
+                      f"from the map center")
+
         print(
             f"[Action] Searching with query='{search_string}', lat={latitude}, lng={longitude}, radius={radius}")
 
-        original_order, places, error = self.google_maps_text_search(
-            api_key=api_key,
+        self.places_client.api_key = api_key
+        if self.daemon_client is not None:
+            print(f"[Action] Searching through the search daemon at {self.daemon_client.base_url}")
+            search_fn = self.daemon_client.text_search
+        else:
+            search_fn = google_maps_text_search
+        self._search_counter += 1
+        trace = SearchTrace(search_string)
+        worker = SearchWorker(self._search_counter, search_fn, dict(
+            client=self.places_client,
             search_string=search_string,
             latitude=latitude,
             longitude=longitude,
             radius=radius,
-            min_reviews=0
-        )
-        if error:
-            self.show_error(error)
+            min_reviews=0,
+            cache=self.response_cache,
+            sweep=self.sweep_checkbox.isChecked(),
+            parallelism=int(settings.value("sweep_parallelism", DEFAULT_PARALLELISM)),
+            place_store=self.place_store,
+            local_first=self.local_first_checkbox.isChecked(),
+            trace=trace,
+            scorer=self.current_scorer(),
+            fetch_center=fetch_center
+        ), self)
+        worker.circle = (latitude, longitude, radius)
+        worker.progress.connect(self.on_search_progress)
+        worker.page_ready.connect(self.on_search_page)
+        worker.succeeded.connect(self.on_search_succeeded)
+        worker.failed.connect(self.on_search_failed)
+        worker.finished.connect(self.on_search_worker_finished)
+        self.search_worker = worker
+        self._search_streamed = False
+        self._running_workers.add(worker)
+        worker.start()
+
+    def cancel_search(self):
+        """Cancel the in-flight search, if any. Its results are discarded."""
+        if self.search_worker is not None:
+            self.search_worker.cancel()
+            self.search_worker = None
             self.status_label.setText("")
-            self.fetch_button.setEnabled(True)
-            return
+            self.area_prefetcher.release()
 
-        self.last_places = places
-        self.last_places_original_order = original_order  # Save for later use
+    def is_current_search(self, search_id):
+        return self.search_worker is not None and self.search_worker.search_id == search_id
 
-        print(f"[Result] Fetched {len(places)} places")
+    def on_search_progress(self, search_id, text):
+        if self.is_current_search(search_id):
+            self.status_label.setText(text)
 
-        self.update_results_table(places, original_order)
+    def on_search_page(self, search_id, places, original_ranks, original_count, pages):
+        if not self.is_current_search(search_id):
+            return
+        model = self.results_table.results_model
+        trace = self.search_worker.trace
+        if not self._search_streamed:
+            # First page of a new search replaces the previous results
+            self._search_streamed = True
+            self.stop_session_restore()
+            self._search_circle = self.search_worker.circle
+            with trace.span("table"):
+                model.set_store(PlaceResultStore(self.current_ranking()))
+                self.map_bridge.clear_places()
+            with trace.span("session"):
+                self.session_store.clear()
+                self.session_store.set_search_circle(*self._search_circle)
+        with trace.span("table"):
+            model.insert_ranked(places, original_ranks, original_count)
+            self.map_bridge.add_places(places)
+        with trace.span("session"):
+            self.session_store.add_places(places, original_ranks, original_count, model.store.scores(places))
+        self.status_label.setText(f"Loading... {pages} pages fetched, {model.rowCount()} places")
+
+    def on_search_succeeded(self, search_id, places, original_ranks):
+        if not self.is_current_search(search_id):
+            return
+        trace = self.search_worker.trace
+        self._search_circle = self.search_worker.circle
+        self.search_worker = None
+        self.area_prefetcher.release()
 
-        # Clear loading status and re-enable button
+        # The table keeps only the shown fields; the places themselves are not kept past this point
+        print(f"[Result] Fetched {len(places)} places")
+        stats = self.response_cache.stats()
+        print(f"[Cache] hits={stats['hits']} misses={stats['misses']} entries={stats['entries']}")
+
+        # Streamed pages are already merged into the table and saved in ranking order
+        if self._search_streamed and any(len(place.get('matchedQueries', ())) > 1 for place in places):
+            # Places found by several queries learned their other queries after they were streamed
+            with trace.span("table"):
+                self.results_table.results_model.update_matched_queries(places)
+            with trace.span("session"):
+                self.save_session(places, original_ranks)
+        if not self._search_streamed:
+            self.stop_session_restore()
+            with trace.span("table"):
+                self.update_results_table(places, original_ranks)
+            with trace.span("session"):
+                self.save_session(places, original_ranks)
+        self.finish_search_trace(trace, len(places))
+        self.status_label.setText(f"{len(places)} places in {trace.summary()}")
+
+    def on_search_failed(self, search_id, error):
+        if not self.is_current_search(search_id):
+            return
+        self.finish_search_trace(self.search_worker.trace, 0)
+        self.search_worker = None
+        self.area_prefetcher.release()
         self.status_label.setText("")
-        self.fetch_button.setEnabled(True)
-
-    def google_maps_text_search(self, api_key, search_string, latitude, longitude, radius=30000.0, min_reviews=0):
-        """
-        Searches Google Maps for places matching the search string near the given latitude and longitude.
-        Returns a list of places with displayName, formattedAddress, rating, userRatingCount, location, and plusCode.
-        """
-        url = "https://places.googleapis.com/v1/places:searchText"
-
-        headers = {
-            "Content-Type": "application/json",
-            "X-Goog-Api-Key": api_key,
-            "X-Goog-FieldMask": (
-                "places.displayName,"
-                "places.formattedAddress,"
-                "places.rating,"
-                "places.userRatingCount,"
-                "places.location,"
-                "places.plusCode,"
-                "places.id,"
-                "nextPageToken"
-            )
-        }
-
-        body = {
-            "textQuery": search_string,
-            "locationBias": {
-                "circle": {
-                    "center": {
-                        "latitude": float(latitude),
-                        "longitude": float(longitude)
-                    },
-                    "radius": float(radius)
-                }
-            },
-            "maxResultCount": 20
-        }
-
-        places = []
-        while True:
-            response = requests.post(url, headers=headers, json=body)
-
-            if response.status_code != 200:
-                error_msg = f"Error: {response.status_code} - {response.text}"
-                print(error_msg)
-                return None, error_msg
-
-            data = response.json()
-
-            if 'places' in data:
-                for place in data['places']:
-                    rating_count = place.get('userRatingCount', 0)
-                    if rating_count >= min_reviews:
-                        # Extract plusCode if available
-                        plus_code = place.get('plusCode', {}).get('globalCode', 'N/A')
-                        place['plusCodeValue'] = plus_code
-                        places.append(place)
-
-            if 'nextPageToken' not in data:
-                break
-
-            time.sleep(2)
-            body['pageToken'] = data['nextPageToken']
+        self.show_error(error)
 
-        original_order = list(places)  # Make a copy of the original order
-
-        # Filter places by distance from center
-        filtered_places = []
-        for place in places:
-            loc = place.get('location', {})
-            plat = loc.get('latitude')
-            plon = loc.get('longitude')
-            if plat is not None and plon is not None:
-                dist = haversine_distance(latitude, longitude, plat, plon)
-                if dist <= radius:
-                    filtered_places.append(place)
-
-        # Sort by number of reviews (descending), then by review score (descending)
-        filtered_places.sort(key=lambda p: (-p.get('userRatingCount', 0), -p.get('rating', 0)))
+    def finish_search_trace(self, trace, places):
+        """Log the search's stage breakdown and export it when metrics export is configured."""
+        trace.finish(places)
+        print(f"[Metrics] {trace.summary()}")
+        settings = QSettings("YourCompany", "SearchMaps")
+        try:
+            export_trace(trace, settings.value("metrics_jsonl", ""), settings.value("metrics_textfile", ""))
+        except OSError as e:
+            print(f"[Metrics] Export failed: {e}")
 
-        return original_order, filtered_places, None
+    def on_search_worker_finished(self):
+        worker = self.sender()
+        self._running_workers.discard(worker)
+        worker.deleteLater()
 
     def update_map_radius(self, value):
         # value is in km, convert to meters
@@ -471,140 +1141,176 @@ class SearchMapsUI(QMainWindow):
                 window.setCircleRadius({radius_m});
             }}
         """
-        self.map_view.page().runJavaScript(js)
-
-    def normalize_longitude(self, lon):
-        """Normalize longitude to the range [-180, 180]."""
-        return ((lon + 180) % 360) - 180
-
-    def update_results_table(self, places, original_order=None):
-        self.results_table.setRowCount(len(places))
-        n = len(original_order) if original_order else len(places)
-        # Map place id to its original index
-        id_to_index = {}
-        if original_order:
-            for idx, place in enumerate(original_order):
-                pid = place.get('id', None)
-                if pid:
-                    id_to_index[pid] = idx
-
-        for row, place in enumerate(places):
-            name = place.get('displayName', {}).get('text', '')
-            rating = str(place.get('rating', ''))
-            reviews = str(place.get('userRatingCount', ''))
-            address = place.get('formattedAddress', '')
-            place_id = place.get('id', '')
-
-            # Use original order for relevance
-            if original_order and place_id in id_to_index:
-                orig_idx = id_to_index[place_id]
-                if n > 1:
-                    relevance = 1.0 - (orig_idx / (n - 1))
-                else:
-                    relevance = 1.0
-                r_text = str(orig_idx + 1)
-            else:
-                # fallback: use current row
-                if n > 1:
-                    relevance = 1.0 - (row / (n - 1))
-                else:
-                    relevance = 1.0
-                r_text = str(row + 1)
-
-            # Interpolate color: green (most relevant) to red (least relevant)
-            r = int(255 * (1 - relevance))
-            g = int(255 * relevance)
-            b = 0
-            color = QColor(r, g, b, 80)
-
-            relevance_item = QTableWidgetItem(r_text)
-            relevance_item.setBackground(color)
-            self.results_table.setItem(row, 0, relevance_item)
-
-            item_name = QTableWidgetItem(name)
-            item_name.setData(1000, place_id)
-            self.results_table.setItem(row, 1, item_name)
-            self.results_table.setItem(row, 2, QTableWidgetItem(rating))
-            self.results_table.setItem(row, 3, QTableWidgetItem(reviews))
-            self.results_table.setItem(row, 4, QTableWidgetItem(address))
+        if self.map_view is not None:
+            self.map_view.page().runJavaScript(js)
+
+    def update_results_table(self, places, original_ranks=None):
+        store = PlaceResultStore.from_places(places, original_ranks, self.current_ranking())
+        self.results_table.results_model.set_store(store)
+        self.map_bridge.set_places(store)
+
+    def save_session(self, places, original_ranks):
+        store = self.results_table.results_model.store
+        self.session_store.save(places, original_ranks, store.original_count, store.scores(places))
+        if self._search_circle is not None:
+            self.session_store.set_search_circle(*self._search_circle)
+
+    def current_scorer(self):
+        return get_scorer(self.ranking_combo.currentData())
+
+    def current_ranking(self):
+        """The selected scorer around the circle of the results shown (the map center before any search)."""
+        circle = self._search_circle or (
+            self.map_bridge.latitude, normalize_longitude(self.map_bridge.longitude), self.radius_spin.value() * 1000
+        )
+        return Ranking(self.current_scorer(), *circle)
+
+    def on_ranking_changed(self):
+        model = self.results_table.results_model
+        if self._restore_chunks is not None:
+            # Rows still being restored would be appended in the old order
+            for chunk in self._restore_chunks:
+                self.append_restored_rows(*chunk)
+            self.stop_session_restore()
+        if not len(model.store):
+            return
+        start = time.perf_counter()
+        model.rerank(self.current_ranking())
+        store = model.store
+        self.session_store.update_scores(store.original_ranks, [-key for key in store.rank_keys])
+        self.selected_row = self.results_table.current_source_row()
+        print(f"[Ranking] Re-ranked {len(store)} places by {self.current_scorer().name} "
+              f"in {format_seconds(time.perf_counter() - start)}")
 
     def show_error(self, message):
         """Display an error message dialog."""
         QMessageBox.critical(self, "Error", message)
 
     def closeEvent(self, event):
+        # Stop background searches and exports before the window (their parent) goes away
+        self.cancel_search()
+        if self.export_worker is not None:
+            self.export_worker.cancel()
+        deadline = QDeadlineTimer(int(CLOSE_TIMEOUT * 1000))
+        for worker in list(self._running_workers):
+            if not worker.wait(deadline):
+                # Stuck in a request; the process exits without waiting for it (see main)
+                print(f"[Close] {type(worker).__name__} still running after {CLOSE_TIMEOUT:g}s, not waiting for it")
+                worker.setParent(None)
+                _abandoned_workers.append(worker)
+
         settings = QSettings("YourCompany", "SearchMaps")
         settings.setValue("search_query", self.search_query_edit.text())
         settings.setValue("radius", self.radius_spin.value())
+        settings.setValue("sweep", self.sweep_checkbox.isChecked())
+        settings.setValue("local_first", self.local_first_checkbox.isChecked())
+        settings.setValue("speculative_prefetch", self.prefetch_checkbox.isChecked())
+        settings.setValue("ranking", self.ranking_combo.currentData())
         settings.setValue("latitude", self.map_bridge.latitude)
         settings.setValue("longitude", self.map_bridge.longitude)
         settings.setValue("zoom", self.map_bridge.zoom)
-        # Save table data (places)
-        places_json = json.dumps(getattr(self, "last_places", []))
-        settings.setValue("places", places_json)
-        original_order_json = json.dumps(getattr(self, "last_places_original_order", []))
-        settings.setValue("places_original_order", original_order_json)
+        # Results are saved to the session store as they arrive
         # Save selected row
-        selected = self.results_table.currentRow()
+        selected = self.results_table.current_source_row()
         settings.setValue("selected_row", selected)
 
+        self.details_loader.close()
+        self.area_prefetcher.close()
+        self.response_cache.close()
+        self.places_client.close()
+        if self.daemon_client is not None:
+            self.daemon_client.close()
+        self.place_store.close()
+        self.stop_session_restore()
+        self.session_store.close()
+        if self.tile_cache is not None:
+            self.tile_cache.close()
         event.accept()
 
     def restore_settings(self):
         settings = QSettings("YourCompany", "SearchMaps")
         self.search_query_edit.setText(settings.value("search_query", ""))
         self.radius_spin.setValue(int(settings.value("radius", 50)))
+        self.sweep_checkbox.setChecked(settings.value("sweep", False, type=bool))
+        self.local_first_checkbox.setChecked(settings.value("local_first", False, type=bool))
+        self.prefetch_checkbox.setChecked(settings.value("speculative_prefetch", False, type=bool))
+        # Set before the session is restored, which is saved in this ranking's order
+        ranking_index = self.ranking_combo.findData(settings.value("ranking", DEFAULT_SCORER))
+        self.ranking_combo.blockSignals(True)
+        self.ranking_combo.setCurrentIndex(max(ranking_index, 0))
+        self.ranking_combo.blockSignals(False)
         lat = float(settings.value("latitude", 48.8584))
         lng = float(settings.value("longitude", 2.2945))
         zoom = int(settings.value("zoom", 5))
         self.map_bridge.latitude = lat
         self.map_bridge.longitude = lng
         self.map_bridge.zoom = zoom
-        # Set map view via JS
-        js = f"window.setMapView({lat}, {lng}, {zoom});"
-        self.map_view.page().runJavaScript(js)
-
-        # Restore table data (places)
-        places_json = settings.value("places", "")
-        original_order_json = settings.value("places_original_order", "")
-        original_order = None
-        if original_order_json:
-            try:
-                original_order = json.loads(original_order_json)
-                self.last_places_original_order = original_order
-            except Exception as e:
-                print(f"Failed to restore original order: {e}")
-        if places_json:
-            try:
-                places = json.loads(places_json)
-                self.last_places = places
-                self.update_results_table(places, original_order)
-            except Exception as e:
-                print(f"Failed to restore places: {e}")
+        # The map takes this view once it is ready
+        if self.map_view is not None:
+            self.map_view.page().runJavaScript(f"window.setMapView({lat}, {lng}, {zoom});")
 
+        # Restore table data (places): visible rows first, the rest in the background
+        self.migrate_saved_places(settings)
         selected_row = settings.value("selected_row", None)
-        if selected_row is not None:
-            try:
-                selected_row = int(selected_row)
-                if 0 <= selected_row < self.results_table.rowCount():
-                    self.results_table.setCurrentCell(selected_row, 0)
-                    self.selected_row = selected_row
-            except Exception as e:
-                print(f"Failed to restore selected row: {e}")
+        try:
+            self._restore_selected_row = int(selected_row) if selected_row is not None else None
+        except (TypeError, ValueError) as e:
+            print(f"Failed to restore selected row: {e}")
+        self.start_session_restore()
 
         self.api_key = settings.value("api_key", "")
 
+    def migrate_saved_places(self, settings):
+        """Move results saved as JSON in QSettings by older versions into the session store."""
+        if not settings.contains("places"):
+            return
+        try:
+            places = json.loads(settings.value("places", "") or "[]")
+            original_order = json.loads(settings.value("places_original_order", "") or "[]")
+            rank_by_id = {place.get('id'): rank for rank, place in enumerate(original_order) if place.get('id')}
+            self.session_store.save(
+                places, [rank_by_id.get(place.get('id'), row) for row, place in enumerate(places)],
+                len(original_order) or len(places)
+            )
+        except Exception as e:
+            print(f"Failed to migrate saved places: {e}")
+        settings.remove("places")
+        settings.remove("places_original_order")
+
+    def start_session_restore(self):
+        chunks = self.session_store.iter_chunks(RESTORE_FIRST_ROWS, RESTORE_CHUNK_ROWS)
+        first = next(chunks, None)
+        if first is None:
+            return
+        self._search_circle = self.session_store.search_circle()
+        store = PlaceResultStore(self.current_ranking())
+        store.original_count = self.session_store.original_count()
+        self.results_table.results_model.set_store(store)
+        self.map_bridge.clear_places()
+        self._restore_chunks = chunks
+        self.append_restored_rows(*first)
+        self._restore_timer.start(0)
+
+    def restore_next_chunk(self):
+        chunk = next(self._restore_chunks, None) if self._restore_chunks is not None else None
+        if chunk is None:
+            self.stop_session_restore()
+            return
+        self.append_restored_rows(*chunk)
+
+    def append_restored_rows(self, places, original_ranks):
+        self.results_table.results_model.append_rows(places, original_ranks)
+        self.map_bridge.add_places(places)
+        row = self._restore_selected_row
+        if row is not None and 0 <= row < len(self.results_table.results_model.store):
+            self.results_table.select_source_row(row)
+            self.selected_row = row
+            self._restore_selected_row = None
 
-def haversine_distance(lat1, lon1, lat2, lon2):
-    """Calculate the great-circle distance between two points (in meters)."""
-    R = 6371000  # Earth radius in meters
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
+    def stop_session_restore(self):
+        self._restore_timer.stop()
+        self._restore_chunks = None
+        self._restore_selected_row = None
 
 
 class ApiKeyDialog(QDialog):
@@ -643,13 +1349,24 @@ class ApiKeyDialog(QDialog):
 
 
 def main():
+    # Custom schemes must be registered before the application is created, so the web engine core is
+    # imported here; the web engine itself only starts once the window is on screen
+    from map_scheme import register_map_scheme
+
+    register_map_scheme()
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     QApplication.setApplicationName("Search Maps")
     app = QApplication(sys.argv)
 
     window = SearchMapsUI()
     window.show()
 
-    sys.exit(app.exec())
+    code = app.exec()
+    if _abandoned_workers:
+        # Destroying a QThread that is still running aborts the process, so skip interpreter teardown
+        sys.stdout.flush()
+        os._exit(code)
+    sys.exit(code)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Command line entry point for SearchMaps. Runs the search pipeline without Qt.
+
+    search-maps batch [-i jobs.jsonl] [-o results.jsonl] [--concurrency 4]
+    search-maps seed-tiles --bbox SOUTH,WEST,NORTH,EAST --zoom 10-14
+    search-maps export -o places.parquet [--source session|store] [--columns name,rating]
+    search-maps serve [--port 8741] [--max-searches 4] [--budget-per-hour 1000]
+
+Jobs are read one per line, either as JSON objects
+({"query": "cafe", "lat": 48.85, "lng": 2.29, "radius": 5000}) or as
+comma-separated "query,lat,lng,radius" lines. Each ranked result is written
+as one JSON line as soon as its job finishes.
+"""
+import argparse
+import contextlib
+import csv
+import functools
+import json
+import os
+import sys
+import threading
+
+from daemon_client import default_daemon_url
+from ranking import DEFAULT_SCORER, SCORERS
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RADIUS = 5000.0
+
+
+def parse_job(line):
+    """Parse one job line into a dict with query, lat, lng and radius."""
+    line = line.strip()
+    if line.startswith("{"):
+        data = json.loads(line)
+        query = data["query"]
+        lat = data.get("lat", data.get("latitude"))
+        lng = data.get("lng", data.get("longitude"))
+        radius = data.get("radius", DEFAULT_RADIUS)
+    else:
+        fields = next(csv.reader([line]))
+        if len(fields) < 3:
+            raise ValueError("expected query,lat,lng[,radius]")
+        query, lat, lng = fields[0], fields[1], fields[2]
+        radius = fields[3] if len(fields) > 3 and fields[3].strip() else DEFAULT_RADIUS
+    return {"query": query, "lat": float(lat), "lng": float(lng), "radius": float(radius)}
+
+
+def iter_jobs(stream):
+    """Yield (line number, job or error) for every non-empty, non-comment line."""
+    for number, line in enumerate(stream, start=1):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        try:
+            yield number, parse_job(line), None
+        except (ValueError, KeyError, TypeError) as e:
+            yield number, None, f"line {number}: {e}"
+
+
+def run_batch(args):
+    # Heavy imports are deferred until a command actually needs them
+    from concurrent.futures import ThreadPoolExecutor
+
+    from daemon_client import DaemonClient
+    from metrics import REGISTRY, SearchTrace, append_jsonl
+    from place_store import PlaceStore
+    from places_client import PlacesClient, TokenBucket
+    from ranking import get_scorer
+    from response_cache import ResponseCache
+    from search_core import default_data_dir, google_maps_text_search, normalize_longitude
+
+    api_key = args.api_key or os.environ.get("GOOGLE_MAPS_API_KEY", "")
+    if not api_key and not args.daemon:
+        print("API key is not set. Use --api-key or the GOOGLE_MAPS_API_KEY environment variable.", file=sys.stderr)
+        return 2
+
+    data_dir = default_data_dir()
+    if args.daemon:
+        # The daemon searches with its own key, cache and place store
+        client = DaemonClient(args.daemon)
+        search = client.text_search
+        cache = place_store = None
+    else:
+        cache = None if args.no_cache else ResponseCache(os.path.join(data_dir, "places_cache.sqlite3"))
+        place_store = None if args.no_store else PlaceStore(os.path.join(data_dir, "places.sqlite3"))
+        client = PlacesClient(api_key, base_url=args.api_base_url,
+                              rate_limiter=TokenBucket(rate=args.rate, capacity=args.rate))
+        search = functools.partial(google_maps_text_search, client)
+
+    source = sys.stdin if args.input in (None, "-") else open(args.input, encoding="utf-8")
+    out = sys.stdout if args.output in (None, "-") else open(args.output, "w", encoding="utf-8")
+    out_lock = threading.Lock()
+    slots = threading.BoundedSemaphore(args.concurrency)
+    failures = []
+
+    def run_job(number, job):
+        trace = SearchTrace(job["query"])
+        try:
+            _, places, error = search(
+                job["query"], job["lat"], normalize_longitude(job["lng"]), job["radius"],
+                min_reviews=args.min_reviews, cache=cache, sweep=args.sweep, place_store=place_store,
+                local_first=args.local_first, trace=trace, scorer=get_scorer(args.rank), top_k=args.limit or None
+            )
+        except Exception as e:
+            places, error = None, f"Search failed: {e}"
+        finally:
+            slots.release()
+        export_metrics(number, trace.finish(len(places or [])))
+
+        if error:
+            failures.append(number)
+            print(f"[Error] line {number}: {error}", file=sys.stderr)
+            return
+        lines = [
+            json.dumps({"job": number, "query": job["query"], "rank": rank, "place": place}, ensure_ascii=False)
+            for rank, place in enumerate(places, start=1)
+        ]
+        with out_lock:
+            if lines:
+                out.write("\n".join(lines) + "\n")
+            out.flush()
+
+    def export_metrics(number, trace):
+        with out_lock:
+            try:
+                if args.metrics_jsonl:
+                    append_jsonl(args.metrics_jsonl, dict(trace.to_record(), job=number))
+                if args.metrics_textfile:
+                    REGISTRY.write_prometheus(args.metrics_textfile)
+            except OSError as e:
+                print(f"[Metrics] Export failed: {e}", file=sys.stderr)
+
+    try:
+        # Results own stdout; the pipeline's log lines go to stderr
+        with contextlib.redirect_stdout(sys.stderr), ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for number, job, error in iter_jobs(source):
+                if error:
+                    failures.append(number)
+                    print(f"[Error] {error}", file=sys.stderr)
+                    continue
+                # Only read ahead as far as there are free workers
+                slots.acquire()
+                pool.submit(run_job, number, job)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+        client.close()
+        if cache is not None:
+            cache.close()
+        if place_store is not None:
+            place_store.close()
+
+    return 1 if failures else 0
+
+
+def parse_zoom_range(text):
+    """Parse "12" or "10-14" into a list of zoom levels."""
+    low, _, high = text.partition("-")
+    low = int(low)
+    high = int(high) if high else low
+    if not 0 <= low <= high:
+        raise argparse.ArgumentTypeError(f"invalid zoom range: {text}")
+    return list(range(low, high + 1))
+
+
+def parse_bbox(text):
+    """Parse "south,west,north,east" into four floats."""
+    try:
+        south, west, north, east = (float(v) for v in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid bounding box: {text}")
+    return south, west, north, east
+
+
+def run_seed_tiles(args):
+    from search_core import default_data_dir
+    from tile_cache import TILE_MAX_ZOOM, TileCache, seed_tiles
+
+    if args.zoom[-1] > TILE_MAX_ZOOM:
+        print(f"Zoom levels go up to {TILE_MAX_ZOOM}.", file=sys.stderr)
+        return 2
+    cache = TileCache(os.path.join(default_data_dir(), "tiles.sqlite3"), max_bytes=args.max_mb * 1024 * 1024)
+
+    def progress(fetched, skipped, failed):
+        done = fetched + skipped + failed
+        if done % 100 == 0:
+            print(f"[Seed] {done} tiles: {fetched} fetched, {skipped} already cached, {failed} failed",
+                  file=sys.stderr)
+
+    try:
+        fetched, skipped, failed = seed_tiles(
+            cache, *args.bbox, args.zoom, retina=args.retina, concurrency=args.concurrency, progress=progress
+        )
+    finally:
+        cache.close()
+    print(f"[Seed] Done: {fetched} fetched, {skipped} already cached, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def run_export(args):
+    from export import ExportError, columns_by_name, export_place_store, export_session_store
+    from place_store import PlaceStore
+    from search_core import default_data_dir
+    from session_store import SessionStore
+
+    data_dir = default_data_dir()
+    if args.source == "store":
+        store = PlaceStore(os.path.join(data_dir, "places.sqlite3"))
+        export_fn = export_place_store
+    else:
+        store = SessionStore(os.path.join(data_dir, "session.sqlite3"))
+        export_fn = export_session_store
+
+    def progress(count):
+        if count % 100000 == 0:
+            print(f"[Export] {count} places written", file=sys.stderr)
+
+    try:
+        columns = columns_by_name([name.strip() for name in args.columns.split(",")]) if args.columns else None
+        count = export_fn(store, args.output, file_format=args.format, columns=columns, progress=progress)
+    except ExportError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        store.close()
+    print(f"[Export] Done: {count} places written to {args.output}", file=sys.stderr)
+    return 0
+
+
+def run_serve(args):
+    import asyncio
+
+    from place_store import PlaceStore
+    from places_client import PlacesClient, TokenBucket
+    from prefetch import QuotaBudget
+    from response_cache import ResponseCache
+    from search_core import default_data_dir
+    from search_daemon import SearchDaemon
+
+    api_key = args.api_key or os.environ.get("GOOGLE_MAPS_API_KEY", "")
+    if not api_key:
+        print("API key is not set. Use --api-key or the GOOGLE_MAPS_API_KEY environment variable.", file=sys.stderr)
+        return 2
+
+    data_dir = default_data_dir()
+    cache = ResponseCache(os.path.join(data_dir, "places_cache.sqlite3"))
+    place_store = None if args.no_store else PlaceStore(os.path.join(data_dir, "places.sqlite3"))
+    client = PlacesClient(api_key, base_url=args.api_base_url,
+                          rate_limiter=TokenBucket(rate=args.rate, capacity=args.rate))
+    budget = QuotaBudget(args.budget_per_hour, 3600) if args.budget_per_hour > 0 else None
+    daemon = SearchDaemon(client, cache, place_store, budget=budget, max_searches=args.max_searches)
+    try:
+        asyncio.run(daemon.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"[Daemon] Stopped: {daemon.status()}", file=sys.stderr)
+    finally:
+        daemon.stop()
+        client.close()
+        cache.close()
+        if place_store is not None:
+            place_store.close()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="search-maps", description="SearchMaps command line tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser(
+        "batch", help="Run many searches and stream ranked results as JSON lines.",
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    batch.add_argument("-i", "--input", help="Job file (default: stdin)")
+    batch.add_argument("-o", "--output", help="Output JSONL file (default: stdout)")
+    batch.add_argument("--api-key", help="Google Maps API key (default: $GOOGLE_MAPS_API_KEY)")
+    batch.add_argument("--api-base-url", help="Places API server (default: $SEARCH_MAPS_API_BASE_URL or Google)")
+    batch.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Jobs run in parallel")
+    batch.add_argument("--rate", type=float, default=10.0, help="Maximum API requests per second")
+    batch.add_argument("--limit", type=int, default=0, help="Only output the top N places per job")
+    batch.add_argument("--rank", choices=list(SCORERS), default=DEFAULT_SCORER, help="How places are ranked")
+    batch.add_argument("--min-reviews", type=int, default=0, help="Skip places with fewer reviews")
+    batch.add_argument("--sweep", action="store_true", help="Sweep each circle with tiles (more API calls)")
+    batch.add_argument("--local-first", action="store_true", help="Answer from the local place store when possible")
+    batch.add_argument("--no-cache", action="store_true", help="Do not use the response cache")
+    batch.add_argument("--no-store", action="store_true", help="Do not read or write the local place store")
+    batch.add_argument("--metrics-jsonl", help="Append per-job stage timings to this JSON lines file")
+    batch.add_argument("--metrics-textfile", help="Keep Prometheus metrics in this textfile (node_exporter format)")
+    batch.add_argument("--daemon", default=default_daemon_url(),
+                       help="Search through a search daemon at this URL (default: $SEARCH_MAPS_DAEMON_URL)")
+    batch.set_defaults(func=run_batch)
+
+    seed = commands.add_parser("seed-tiles", help="Download the basemap tiles of an area into the tile cache.")
+    seed.add_argument("--bbox", type=parse_bbox, required=True, help="south,west,north,east in degrees")
+    seed.add_argument("--zoom", type=parse_zoom_range, required=True, help="Zoom level or range, e.g. 10-14")
+    seed.add_argument("--retina", action="store_true", help="Fetch high resolution (@2x) tiles")
+    seed.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Parallel downloads")
+    seed.add_argument("--max-mb", type=int, default=200, help="Tile cache size limit in MB")
+    seed.set_defaults(func=run_seed_tiles)
+
+    export = commands.add_parser("export", help="Write the last results or every stored place to a file.")
+    export.add_argument("-o", "--output", required=True,
+                        help="Output file; .csv, .geojson, .parquet or .arrow picks the format")
+    export.add_argument("--source", choices=["session", "store"], default="session",
+                        help="The results of the last search in the app (default) or the whole local place store")
+    export.add_argument("--format", choices=["csv", "geojson", "parquet", "arrow"],
+                        help="Output format (default: from the file extension)")
+    export.add_argument("--columns", help="Comma separated columns (default: every field of the search field mask)")
+    export.set_defaults(func=run_export)
+
+    serve = commands.add_parser(
+        "serve", help="Run a search daemon that desktops and scripts on this network share.",
+        description="Searches run once for every client asking for the same thing at the same time, "
+                    "with one response cache and API request budget."
+    )
+    serve.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: this machine only)")
+    serve.add_argument("--port", type=int, default=8741, help="Port to listen on")
+    serve.add_argument("--api-key", help="Google Maps API key (default: $GOOGLE_MAPS_API_KEY)")
+    serve.add_argument("--api-base-url", help="Places API server (default: $SEARCH_MAPS_API_BASE_URL or Google)")
+    serve.add_argument("--max-searches", type=int, default=4, help="Searches run at the same time")
+    serve.add_argument("--rate", type=float, default=10.0, help="Maximum API requests per second")
+    serve.add_argument("--budget-per-hour", type=int, default=1000,
+                       help="Maximum API requests per hour, 0 for no limit")
+    serve.add_argument("--no-store", action="store_true", help="Do not write the local place store")
+    serve.set_defaults(func=run_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "concurrency", 1) < 1:
+        args.concurrency = 1
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import json
+import os
+import sqlite3
+
+from ranking import Ranking
+
+
+class SessionStore:
+    """
+    The last result set, saved to SQLite as it arrives so it can be restored on the next start.
+    Each place is stored once; its position in the original API order is the primary key and
+    ranking order is recovered from an indexed score column.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS session_places ("
+            " original_rank INTEGER PRIMARY KEY,"
+            " score REAL NOT NULL,"
+            " data TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS session_places_ranking ON session_places(score DESC, original_rank);"
+            "CREATE TABLE IF NOT EXISTS session_meta (key TEXT PRIMARY KEY, value);"
+        )
+        self._conn.commit()
+
+    def clear(self):
+        self._conn.execute("DELETE FROM session_places")
+        self._conn.execute("DELETE FROM session_meta")
+        self._conn.commit()
+
+    def add_places(self, places, original_ranks, original_count, scores=None):
+        """
+        Append places (with their positions in the original order) to the saved result set.
+        scores are their ranking scores; by default those of the default ranking.
+        """
+        if scores is None:
+            scores = Ranking().score_places(places).tolist() if places else []
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO session_places (original_rank, score, data) VALUES (?, ?, ?)",
+            [
+                (rank, score, json.dumps(place, separators=(",", ":")))
+                for place, rank, score in zip(places, original_ranks, scores)
+            ]
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO session_meta (key, value) VALUES ('original_count', ?)", (original_count,)
+        )
+        self._conn.commit()
+
+    def save(self, places, original_ranks=None, original_count=None, scores=None):
+        """
+        Replace the saved result set with ranked places and their positions in the original order
+        (by default their rows). original_count is the size of the original order.
+        """
+        if original_ranks is None:
+            original_ranks = range(len(places))
+        if original_count is None:
+            original_count = max(original_ranks, default=-1) + 1
+        self.clear()
+        self.add_places(places, original_ranks, original_count, scores)
+
+    def update_scores(self, original_ranks, scores):
+        """Store new ranking scores after the results were re-ranked."""
+        self._conn.executemany(
+            "UPDATE session_places SET score = ? WHERE original_rank = ?", zip(scores, original_ranks)
+        )
+        self._conn.commit()
+
+    def set_search_circle(self, latitude, longitude, radius):
+        """Remember where the saved results were searched, which distance based ranking needs."""
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO session_meta (key, value) VALUES (?, ?)",
+            [("latitude", latitude), ("longitude", longitude), ("radius", radius)]
+        )
+        self._conn.commit()
+
+    def search_circle(self):
+        """(latitude, longitude, radius) of the saved results, or None."""
+        meta = dict(self._conn.execute(
+            "SELECT key, value FROM session_meta WHERE key IN ('latitude', 'longitude', 'radius')"
+        ).fetchall())
+        if len(meta) < 3:
+            return None
+        return float(meta["latitude"]), float(meta["longitude"]), float(meta["radius"])
+
+    def original_count(self):
+        row = self._conn.execute("SELECT value FROM session_meta WHERE key = 'original_count'").fetchone()
+        return int(row[0]) if row else 0
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM session_places").fetchone()[0]
+
+    def iter_chunks(self, first_size, chunk_size):
+        """
+        Yield (places, original_ranks) chunks of the saved result set in ranking order.
+        The first chunk has first_size rows so the visible part of the table can be shown right away.
+        """
+        cursor = self._conn.execute(
+            "SELECT original_rank, data FROM session_places ORDER BY score DESC, original_rank"
+        )
+        size = first_size
+        while True:
+            rows = cursor.fetchmany(size)
+            if not rows:
+                return
+            yield [json.loads(data) for _, data in rows], [rank for rank, _ in rows]
+            size = chunk_size
+
+    def close(self):
+        self._conn.close()
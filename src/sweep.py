@@ -0,0 +1,84 @@
+import math
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from geo import haversine_distance, offset_point
+
+MAX_RESULTS_PER_QUERY = 60  # Google stops handing out page tokens after three pages of 20
+MIN_TILE_RADIUS = 500.0  # meters; tiles are not split below this
+DEFAULT_PARALLELISM = 4
+
+
+def child_tiles(latitude, longitude, radius):
+    """
+    Split a circle into the seven circles of half the radius that cover it:
+    one at the center and six on a ring at sqrt(3)/2 of the parent radius.
+    """
+    child_radius = radius / 2
+    ring = radius * math.sqrt(3) / 2
+    tiles = [(latitude, longitude, child_radius)]
+    for i in range(6):
+        angle = math.radians(60 * i)
+        lat, lng = offset_point(latitude, longitude, ring * math.cos(angle), ring * math.sin(angle))
+        tiles.append((lat, lng, child_radius))
+    return tiles
+
+
+def sweep_search(fetch_tile, latitude, longitude, radius, parallelism=DEFAULT_PARALLELISM,
+                 min_tile_radius=MIN_TILE_RADIUS, progress=None, cancel_event=None, on_places=None):
+    """
+    Sweep a search circle with adaptively subdivided tiles.
+
+    fetch_tile(latitude, longitude, radius) must return (places, error) for one
+    location-biased search. A tile that comes back with the per-query maximum of
+    results is split into seven smaller tiles, which are fetched concurrently with
+    at most `parallelism` requests in flight. Places are deduplicated by id and
+    returned in discovery order as (places, error); error is only set when no tile
+    could be fetched at all. on_places(new_places) receives each tile's newly found places
+    as soon as the tile completes.
+    """
+    places_by_id = {}
+    places_without_id = []
+    errors = []
+    tiles_done = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, int(parallelism))) as pool:
+        pending = {pool.submit(fetch_tile, latitude, longitude, radius): (latitude, longitude, radius)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                tile_lat, tile_lng, tile_radius = pending.pop(future)
+                tiles_done += 1
+                tile_places, error = future.result()
+                if error:
+                    errors.append(error)
+                    continue
+
+                new_places = []
+                for place in tile_places:
+                    place_id = place.get('id')
+                    if not place_id:
+                        places_without_id.append(place)
+                        new_places.append(place)
+                    elif place_id not in places_by_id:
+                        places_by_id[place_id] = place
+                        new_places.append(place)
+                if on_places and new_places:
+                    on_places(new_places)
+
+                saturated = len(tile_places) >= MAX_RESULTS_PER_QUERY
+                cancelled = cancel_event is not None and cancel_event.is_set()
+                if saturated and tile_radius / 2 >= min_tile_radius and not cancelled:
+                    for child in child_tiles(tile_lat, tile_lng, tile_radius):
+                        # Skip tiles that do not reach into the search circle
+                        if haversine_distance(latitude, longitude, child[0], child[1]) <= radius + child[2]:
+                            pending[pool.submit(fetch_tile, *child)] = child
+
+            if progress:
+                progress(f"Sweeping... {tiles_done} tiles, {len(places_by_id) + len(places_without_id)} places")
+
+    places = list(places_by_id.values()) + places_without_id
+    if errors:
+        print(f"[Sweep] {len(errors)} of {tiles_done} tiles failed: {errors[0]}")
+        if not places:
+            return None, errors[0]
+    return places, None
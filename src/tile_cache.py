@@ -0,0 +1,179 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+TILE_URL_TEMPLATE = "https://{s}.basemaps.cartocdn.com/rastertiles/voyager/{z}/{x}/{y}{r}.png"
+TILE_SUBDOMAINS = "abcd"
+TILE_MAX_ZOOM = 20
+TILE_USER_AGENT = "SearchMaps tile cache"
+
+
+def tile_key(z, x, y, r=""):
+    """Cache key of one basemap tile; r is Leaflet's retina suffix ('' or '@2x')."""
+    return f"{z}/{x}/{y}{r}"
+
+
+def tile_url(z, x, y, r=""):
+    """Upstream URL of a basemap tile, spreading requests over the tile server subdomains."""
+    subdomain = TILE_SUBDOMAINS[(x + y) % len(TILE_SUBDOMAINS)]
+    return TILE_URL_TEMPLATE.format(s=subdomain, z=z, x=x, y=y, r=r)
+
+
+def lat_lng_to_tile(latitude, longitude, zoom):
+    """Slippy map tile column and row containing a point."""
+    n = 2 ** zoom
+    latitude = max(min(latitude, 85.0511), -85.0511)
+    x = int((longitude + 180.0) / 360.0 * n)
+    lat_rad = math.radians(latitude)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_in_bbox(south, west, north, east, zoom):
+    """Yield (x, y) of every tile at zoom overlapping the bounding box."""
+    x_min, y_min = lat_lng_to_tile(north, west, zoom)
+    x_max, y_max = lat_lng_to_tile(south, east, zoom)
+    for x in range(x_min, x_max + 1):
+        for y in range(y_min, y_max + 1):
+            yield x, y
+
+
+class TileCache:
+    """
+    Disk cache of basemap tiles stored as blobs in SQLite.
+    When the total size exceeds max_bytes the least recently used tiles are evicted.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tiles ("
+            " key TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tiles_accessed ON tiles(accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the tile bytes for key, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM tiles WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE tiles SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return bytes(row[0])
+
+    def contains(self, key):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM tiles WHERE key = ?", (key,)).fetchone() is not None
+
+    def put(self, key, data):
+        """Store tile bytes and evict least recently used tiles beyond max_bytes."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tiles (key, data, size, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(data), len(data), time.time())
+            )
+            # Summing sizes on every put is wasteful, check the budget every few tiles
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= 32:
+                self._puts_since_evict = 0
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM tiles").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale_keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM tiles ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM tiles WHERE key = ?", stale_keys)
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tiles").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self._conn.commit()
+            self._conn.close()
+
+
+def seed_tiles(cache, south, west, north, east, zooms, retina=False, concurrency=4, progress=None):
+    """
+    Download every tile of a bounding box at the given zoom levels into the cache.
+    Tiles already cached are skipped. Returns (fetched, skipped, failed) counts.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    r = "@2x" if retina else ""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency))
+    session.headers["User-Agent"] = TILE_USER_AGENT
+    counts = {"fetched": 0, "skipped": 0, "failed": 0}
+    counts_lock = threading.Lock()
+    # Large areas have millions of tiles, so only queue a few ahead of the workers
+    slots = threading.BoundedSemaphore(concurrency * 4)
+
+    def fetch(z, x, y):
+        try:
+            fetch_tile(z, x, y)
+        finally:
+            slots.release()
+
+    def fetch_tile(z, x, y):
+        key = tile_key(z, x, y, r)
+        if cache.contains(key):
+            outcome = "skipped"
+        else:
+            try:
+                response = session.get(tile_url(z, x, y, r), timeout=(5, 20))
+                if response.status_code == 200:
+                    cache.put(key, response.content)
+                    outcome = "fetched"
+                else:
+                    outcome = "failed"
+            except requests.RequestException:
+                outcome = "failed"
+        with counts_lock:
+            counts[outcome] += 1
+            if progress:
+                progress(counts["fetched"], counts["skipped"], counts["failed"])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for z in zooms:
+            for x, y in tiles_in_bbox(south, west, north, east, z):
+                slots.acquire()
+                pool.submit(fetch, z, x, y)
+    session.close()
+    return counts["fetched"], counts["skipped"], counts["failed"]
@@ -0,0 +1,62 @@
+import pytest
+
+from metrics import MetricsRegistry, SearchTrace
+from mock_places_server import CENTER, MockPlacesServer
+from paging import PROBE_FACTOR, SAFETY_MARGIN, SMOOTHING, PageTokenPacer, TokenWait
+from places_client import PlacesClient
+from search_core import fetch_text_search_pages
+
+
+def test_first_attempt_waits_for_the_estimate():
+    pacer = PageTokenPacer(initial_delay=1.0, min_delay=0.2)
+    wait = TokenWait(pacer)
+    assert 0.9 < wait.next_delay() <= 1.0
+    assert wait.attempts == 1
+
+
+def test_retries_back_off_until_max_wait():
+    pacer = PageTokenPacer(initial_delay=1.0, min_delay=0.2, max_wait=3.0, backoff=2.0)
+    assert pacer.retry_delay(1, 1.0) == pytest.approx(0.25)
+    assert pacer.retry_delay(2, 1.0) == pytest.approx(0.5)
+    # Never sleeps past max_wait, and gives up once it is reached
+    assert pacer.retry_delay(10, 2.5) == pytest.approx(0.5)
+    assert pacer.retry_delay(1, 3.0) is None
+
+
+def test_estimate_learns_from_observations():
+    pacer = PageTokenPacer(initial_delay=1.0, min_delay=0.2)
+    assert pacer.record(1.0, 1) == pytest.approx(PROBE_FACTOR)
+    estimate = pacer.estimate
+    assert pacer.record(2.0, 3) == pytest.approx((1 - SMOOTHING) * estimate + SMOOTHING * 2.0 * SAFETY_MARGIN)
+    assert pacer.observations == 2
+    for _ in range(200):
+        pacer.record(0.0, 1)
+    assert pacer.estimate == pytest.approx(0.2)
+
+
+def fetch(server, pacer):
+    client = PlacesClient("mock", base_url=server.base_url)
+    trace = SearchTrace("cafe", registry=MetricsRegistry())
+    try:
+        places, error = fetch_text_search_pages(client, "cafe", *CENTER, 5000, page_token_pacer=pacer, trace=trace)
+    finally:
+        client.close()
+    return places, error, trace
+
+
+def test_tokens_not_ready_yet_are_retried():
+    with MockPlacesServer(places=20000, token_delay=0.2) as server:
+        pacer = PageTokenPacer(initial_delay=0.05, min_delay=0.05, max_wait=5.0)
+        places, error, trace = fetch(server, pacer)
+        assert error is None and len(places) == 60
+        assert trace.counters["page_token_retries"] > 0
+        assert trace.counters["api_requests"] == 3 + trace.counters["page_token_retries"]
+        # The estimate moved towards the delay the server needs
+        assert pacer.estimate > 0.05
+
+
+def test_pages_are_kept_when_a_token_never_becomes_valid():
+    with MockPlacesServer(places=20000, token_delay=5.0) as server:
+        pacer = PageTokenPacer(initial_delay=0.05, min_delay=0.05, max_wait=0.3)
+        places, error, _ = fetch(server, pacer)
+        assert error is None and len(places) == 20
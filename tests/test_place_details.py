@@ -0,0 +1,46 @@
+import queue
+
+from place_details import PlaceDetailsLoader
+
+
+class FlakyClient:
+    """get_place() answers every place except "broken", whose response cannot be decoded."""
+
+    def __init__(self):
+        self.requests = 0
+
+    def get_place(self, place_id, field_mask, cancel_event=None, trace=None):
+        self.requests += 1
+        if place_id == "broken":
+            raise ValueError("Expecting value: line 1 column 1 (char 0)")
+        return {"id": place_id}
+
+
+def load(loader, loaded, place_id):
+    loader.request(place_id)
+    return loaded.get(timeout=5)
+
+
+def test_unexpected_errors_are_reported_and_the_worker_keeps_going():
+    loaded = queue.Queue()
+    client = FlakyClient()
+    loader = PlaceDetailsLoader(client, workers=1, on_loaded=lambda *args: loaded.put(args))
+    try:
+        place_id, details, error = load(loader, loaded, "broken")
+        assert place_id == "broken" and details is None and "Expecting value" in error
+        assert load(loader, loaded, "ok") == ("ok", {"id": "ok"}, None)
+    finally:
+        loader.close()
+
+
+def test_loaded_details_are_kept_in_memory():
+    loaded = queue.Queue()
+    client = FlakyClient()
+    loader = PlaceDetailsLoader(client, workers=1, on_loaded=lambda *args: loaded.put(args))
+    try:
+        load(loader, loaded, "a")
+        assert loader.get_cached("a") == {"id": "a"}
+        loader.request("a")
+        assert client.requests == 1
+    finally:
+        loader.close()
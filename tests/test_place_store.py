@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from place_store import DENSE_RESULT_COUNT, PlaceStore
+
+CENTER = (48.1486, 17.1077)
+WEEK = 7 * 24 * 3600
+
+
+def place(i, name="Cafe", latitude=CENTER[0], longitude=CENTER[1]):
+    return {
+        "id": f"place-{i}",
+        "displayName": {"text": f"{name} {i}"},
+        "formattedAddress": "Main St",
+        "rating": 4.0,
+        "userRatingCount": i,
+        "location": {"latitude": latitude, "longitude": longitude + i * 1e-5},
+    }
+
+
+@pytest.fixture
+def store():
+    store = PlaceStore(":memory:")
+    yield store
+    store.close()
+
+
+def add_at(store, when, monkeypatch, *args, **kwargs):
+    with monkeypatch.context() as patch:
+        patch.setattr(time, "time", lambda: when)
+        store.add_places(*args, **kwargs)
+
+
+def test_query_circle_filters_by_distance_and_text(store):
+    store.add_places([place(1), place(2, name="Bakery"), place(3, latitude=CENTER[0] + 1)], "cafe")
+    assert [p["id"] for p in store.query_circle(*CENTER, 1000)] == ["place-2", "place-1"]
+    assert [p["id"] for p in store.query_circle(*CENTER, 1000, "bakery")] == ["place-2"]
+    # Places found for a query match it even when their names do not
+    assert {p["id"] for p in store.query_circle(*CENTER, 1000, "cafe")} == {"place-1", "place-2"}
+
+
+def test_coverage_answers_a_circle_inside_it(store):
+    store.add_places([place(1)], "cafe", coverage=(*CENTER, 5000))
+    assert store.is_covered("Cafe ", *CENTER, 1000)
+    assert not store.is_covered("cafe", *CENTER, 6000)
+    assert not store.is_covered("bar", *CENTER, 1000)
+    assert [p["id"] for p in store.local_search("cafe", *CENTER, 1000)] == ["place-1"]
+    assert store.local_search("cafe", *CENTER, 6000) is None
+
+
+def test_coverage_of_a_cut_off_search_is_ignored(store):
+    store.add_places([place(i) for i in range(DENSE_RESULT_COUNT)], "cafe", coverage=(*CENTER, 50000))
+    assert not store.is_covered("cafe", *CENTER, 1000)
+    assert store.local_search("cafe", *CENTER, 1000) is None
+
+
+def test_stale_coverage_is_ignored(store, monkeypatch):
+    add_at(store, time.time() - WEEK - 60, monkeypatch, [place(1)], "cafe", coverage=(*CENTER, 5000))
+    assert not store.is_covered("cafe", *CENTER, 1000)
+    assert store.local_search("cafe", *CENTER, 1000) is None
+
+
+def test_dense_store_needs_more_than_one_search_worth(store):
+    store.add_places([place(i) for i in range(DENSE_RESULT_COUNT)], "cafe")
+    assert store.local_search("cafe", *CENTER, 1000) is None
+    store.add_places([place(DENSE_RESULT_COUNT)], "cafe")
+    assert len(store.local_search("cafe", *CENTER, 1000)) == DENSE_RESULT_COUNT + 1
+
+
+def test_dense_store_only_counts_fresh_places(store, monkeypatch):
+    add_at(store, time.time() - WEEK - 60, monkeypatch, [place(i) for i in range(DENSE_RESULT_COUNT + 10)], "cafe")
+    assert store.local_search("cafe", *CENTER, 1000) is None
+    # Fetching some of them again makes them fresh
+    store.add_places([place(i) for i in range(DENSE_RESULT_COUNT + 1)], "cafe")
+    assert len(store.local_search("cafe", *CENTER, 1000)) == DENSE_RESULT_COUNT + 1
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from mock_places_server import CENTER, MockPlacesServer
+from paging import PageTokenPacer
+from places_client import PlacesClient, RequestLimitReached, TokenBucket
+from prefetch import PAGES_PER_CIRCLE, QuotaBudget, RequestAllowance, SpeculativePrefetcher, snap_to_grid
+from response_cache import ResponseCache
+
+
+def test_budget_reservations_expire():
+    budget = QuotaBudget(10, window=0.2)
+    budget.reserve(4)
+    budget.reserve(0)
+    assert budget.available() == 6
+    time.sleep(0.25)
+    assert budget.available() == 10
+
+
+def test_budget_reserve_and_settle():
+    budget = QuotaBudget(5, window=60)
+    first = budget.reserve(3)
+    assert first is not None
+    assert budget.available() == 2
+    assert budget.reserve(3) is None
+    budget.settle(first, 1)
+    assert budget.available() == 4
+    # Requests made beyond the reservation are charged too
+    budget.settle(first, 6)
+    assert budget.available() == -1
+
+
+def test_request_allowance_stops_after_max_requests():
+    allowance = RequestAllowance(TokenBucket(rate=1000, capacity=1000), 2)
+    assert allowance.acquire() and allowance.acquire()
+    with pytest.raises(RequestLimitReached):
+        allowance.acquire()
+    assert allowance.used == 2 and allowance.exhausted()
+
+
+def test_request_allowance_is_shared_safely_between_threads():
+    allowance = RequestAllowance(TokenBucket(rate=5, capacity=1), 3)
+    barrier = threading.Barrier(8)
+    granted = []
+
+    def request():
+        barrier.wait()
+        try:
+            granted.append(allowance.acquire())
+        except RequestLimitReached:
+            granted.append(False)
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert granted.count(True) == 3
+    assert allowance.used == 3
+
+
+def test_request_allowance_gives_back_a_cancelled_wait():
+    allowance = RequestAllowance(TokenBucket(rate=0.1, capacity=1), 2)
+    assert allowance.acquire()
+    cancel_event = threading.Event()
+    cancel_event.set()
+    assert not allowance.acquire(cancel_event)
+    assert allowance.used == 1
+
+
+def test_snap_to_grid_is_stable():
+    center = snap_to_grid(*CENTER, 5000)
+    assert snap_to_grid(*center, 5000) == center
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def prefetch(server, cache, budget):
+    client = PlacesClient("mock", base_url=server.base_url, backoff_base=0.001, backoff_max=0.01)
+    prefetcher = SpeculativePrefetcher(client, cache, budget=budget, max_circles=2,
+                                       page_token_pacer=PageTokenPacer(initial_delay=0.01, min_delay=0.0))
+    try:
+        prefetcher.schedule(["cafe"], *CENTER, 5000)
+        assert prefetcher.wait_idle(30)
+    finally:
+        prefetcher.close()
+        client.close()
+    return prefetcher
+
+
+def test_prefetch_fills_the_cache_within_the_budget(cache):
+    with MockPlacesServer(places=5000) as server:
+        budget = QuotaBudget(100, window=3600)
+        prefetcher = prefetch(server, cache, budget)
+        assert prefetcher.prefetched == 2
+        assert 100 - budget.available() == server.requests
+        assert prefetcher.cached_center(["cafe"], *CENTER, 5000) is not None
+
+
+def test_prefetch_retries_cannot_overshoot_the_budget(cache):
+    with MockPlacesServer(places=5000, error_rate=1.0) as server:
+        budget = QuotaBudget(PAGES_PER_CIRCLE + 1, window=3600)
+        prefetcher = prefetch(server, cache, budget)
+        assert prefetcher.prefetched == 0
+        assert server.requests == PAGES_PER_CIRCLE
+        assert budget.available() == 1
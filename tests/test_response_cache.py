@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from response_cache import ResponseCache, make_cache_key, make_details_cache_key
+
+MASK = "places.id,places.displayName"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def test_cache_key_ignores_trivial_differences():
+    key = make_cache_key("Cafe  Bar", 48.14861, 17.10771, 5000.2, MASK, 0)
+    assert key == make_cache_key("cafe bar", 48.148609, 17.107711, 5000, "places.displayName, places.id", 0)
+    assert key != make_cache_key("cafe bar", 48.1486, 17.1077, 5000, MASK, 1)
+    assert make_details_cache_key("a", MASK) != make_details_cache_key("b", MASK)
+
+
+def test_put_and_get(cache):
+    assert cache.get("k") is None
+    cache.put("k", {"places": [1, 2]})
+    assert cache.get("k") == {"places": [1, 2]}
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1, "bytes": len('{"places":[1,2]}')}
+
+
+def test_entries_expire_after_ttl(cache):
+    cache.ttl = 0.1
+    cache.put("k", {"a": 1})
+    assert cache.get("k") == {"a": 1}
+    time.sleep(0.15)
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    body = {"text": "x" * 90}
+    size = len('{"text":""}') + 90
+    cache.max_bytes = 3 * size
+    for key in "abc":
+        cache.put(key, body)
+        time.sleep(0.01)
+    # Reading a makes b the least recently used
+    assert cache.get("a") == body
+    time.sleep(0.01)
+    cache.put("d", body)
+    assert cache.get("b") is None
+    assert all(cache.get(key) == body for key in "acd")
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache(path)
+    cache.put("k", {"a": 1})
+    cache.close()
+    cache = ResponseCache(path)
+    try:
+        assert cache.get("k") == {"a": 1}
+    finally:
+        cache.close()
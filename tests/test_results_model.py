@@ -0,0 +1,117 @@
+import pytest
+
+pytest.importorskip("PySide6")
+
+from PySide6.QtCore import Qt  # noqa: E402
+
+from filter_index import ResultFilter, SubstringIndex  # noqa: E402
+from results_model import NAME_COLUMN, RATING_COLUMN, PlaceResultStore, ResultsTableModel  # noqa: E402
+
+
+def place(name, rating=4.0, count=10, address="Main St"):
+    return {
+        "id": name.lower().replace(" ", "-"),
+        "displayName": {"text": name},
+        "formattedAddress": address,
+        "rating": rating,
+        "userRatingCount": count,
+        "location": {"latitude": 48.1, "longitude": 17.1},
+    }
+
+
+def shown_names(model):
+    return [model.data(model.index(row, NAME_COLUMN)) for row in range(model.rowCount())]
+
+
+@pytest.fixture
+def model():
+    model = ResultsTableModel()
+    places = [place("Pizza A", 4.5, 100), place("Burger Bar", 3.9, 40), place("Sushi", None, 5, "Pizza Rd")]
+    model.set_store(PlaceResultStore.from_places(places))
+    return model
+
+
+def test_substring_index_matches_names_and_addresses():
+    index = SubstringIndex()
+    index.extend([0, 1, 2], ["Pizza A", "Burger Bar", "Sushi"], ["Main St", "Main St", "Pizza Rd"])
+    assert sorted(index.search("pizza").tolist()) == [0, 2]
+    # A query extending the previous one narrows its matches
+    assert index.search("pizza a").tolist() == [0]
+    assert index.search("zz").tolist() == [0, 2]
+    assert index.search("nothing").tolist() == []
+
+
+def test_substring_index_finds_places_added_later():
+    index = SubstringIndex()
+    index.extend([0], ["Pizza A"], ["Main St"])
+    assert index.search("pizza").tolist() == [0]
+    index.add(1, "Pizza B", "Side St")
+    assert index.search("pizza").tolist() == [0, 1]
+
+
+def test_result_filter_bounds():
+    result_filter = ResultFilter(min_rating=4.0, max_reviews=50)
+    assert result_filter.matches("A", "", 4.2, 50)
+    assert not result_filter.matches("A", "", float("nan"), 10)
+    assert not result_filter.matches("A", "", 4.2, -1)
+    assert ResultFilter("  ").is_empty()
+
+
+def test_text_filter(model):
+    model.set_filter(ResultFilter("pizza"))
+    assert shown_names(model) == ["Pizza A", "Sushi"]
+    model.set_filter(ResultFilter("pizza", min_rating=4.0))
+    assert shown_names(model) == ["Pizza A"]
+    model.set_filter(None)
+    assert model.rowCount() == 3
+
+
+def test_rows_added_after_clearing_the_filter_are_found(model):
+    model.set_filter(ResultFilter("pizza"))
+    model.set_filter(None)
+    model.append_rows([place("Pizza B", 3.0, 1)], [3])
+    model.insert_ranked([place("Pizza C", 5.0, 1000)], [4], 5)
+    model.set_filter(ResultFilter("pizza"))
+    assert sorted(shown_names(model)) == ["Pizza A", "Pizza B", "Pizza C", "Sushi"]
+
+
+def test_streamed_rows_respect_the_active_filter(model):
+    model.set_filter(ResultFilter("pizza"))
+    model.insert_ranked([place("Pizza B", 4.9, 500), place("Taco", 5.0, 900)], [3, 4], 5)
+    assert sorted(shown_names(model)) == ["Pizza A", "Pizza B", "Sushi"]
+    model.set_filter(None)
+    assert model.rowCount() == 5
+
+
+def test_sort_keeps_the_filter(model):
+    model.set_filter(ResultFilter(min_reviews=10))
+    model.sort(RATING_COLUMN, Qt.DescendingOrder)
+    assert shown_names(model) == ["Pizza A", "Burger Bar"]
+
+
+@pytest.mark.parametrize("column, order", [(RATING_COLUMN, Qt.DescendingOrder), (NAME_COLUMN, Qt.AscendingOrder)])
+@pytest.mark.parametrize("text", ["", "pizza"])
+def test_streamed_pages_are_merged_into_the_sort(column, order, text):
+    import random
+
+    names = ["Pizza", "Burger", "Sushi", "Taco"]
+    rng = random.Random(7)
+    pages = [[place(f"{rng.choice(names)} {page}-{i}", rng.choice([None, 3.5, 4.0, 4.5]), rng.randrange(500))
+              for i in range(20)] for page in range(5)]
+
+    streamed = ResultsTableModel()
+    streamed.set_store(PlaceResultStore.from_places([]))
+    streamed.set_filter(ResultFilter(text))
+    streamed.sort(column, order)
+    for page, places in enumerate(pages):
+        streamed.insert_ranked(places, range(page * 20, page * 20 + 20), page * 20 + 20)
+
+    # The same rows, inserted unsorted and unfiltered and then sorted in one go
+    rebuilt = ResultsTableModel()
+    rebuilt.set_store(PlaceResultStore.from_places([]))
+    for page, places in enumerate(pages):
+        rebuilt.insert_ranked(places, range(page * 20, page * 20 + 20), page * 20 + 20)
+    rebuilt.set_filter(ResultFilter(text))
+    rebuilt.sort(column, order)
+    assert shown_names(streamed) == shown_names(rebuilt)
+    assert streamed.rowCount() > 0
@@ -0,0 +1,43 @@
+import pytest
+
+from mock_places_server import CENTER, MockPlacesServer
+from paging import PageTokenPacer
+from place_store import PlaceStore
+from places_client import PlacesClient
+from search_core import google_maps_text_search
+
+RADIUS = 50000
+
+
+@pytest.fixture
+def store():
+    store = PlaceStore(":memory:")
+    yield store
+    store.close()
+
+
+def search(server, store, max_wait=5.0):
+    client = PlacesClient("mock", base_url=server.base_url)
+    pacer = PageTokenPacer(initial_delay=0.01, min_delay=0.01, max_wait=max_wait)
+    try:
+        return google_maps_text_search(client, "cafe", *CENTER, radius=RADIUS, place_store=store,
+                                       page_token_pacer=pacer)
+    finally:
+        client.close()
+
+
+def test_a_whole_chain_records_coverage(store):
+    # Fewer places than the result cap, spread over more than one page
+    with MockPlacesServer(places=50) as server:
+        _, places, error = search(server, store)
+    assert error is None and places
+    assert 20 < store.count() < 60
+    assert store.is_covered("cafe", *CENTER, RADIUS)
+
+
+def test_a_chain_that_stopped_early_records_no_coverage(store):
+    with MockPlacesServer(places=50, token_delay=5.0) as server:
+        _, places, error = search(server, store, max_wait=0.2)
+    assert error is None and places
+    assert store.count() == 20
+    assert not store.is_covered("cafe", *CENTER, RADIUS)
@@ -0,0 +1,154 @@
+import threading
+
+import pytest
+
+pytest.importorskip("requests")
+
+from daemon_client import DaemonClient  # noqa: E402
+from mock_places_server import CENTER, MockPlacesServer  # noqa: E402
+from paging import PageTokenPacer  # noqa: E402
+from place_details import DETAILS_FIELD_MASK  # noqa: E402
+from places_client import PlacesApiError, PlacesClient  # noqa: E402
+from prefetch import QuotaBudget  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+from search_daemon import SEARCH_REQUESTS, SearchDaemon  # noqa: E402
+
+CLIENTS = 8
+
+
+@pytest.fixture
+def server():
+    with MockPlacesServer(places=5000, latency=0.05) as server:
+        yield server
+
+
+@pytest.fixture
+def start_daemon(server, tmp_path):
+    started = []
+
+    def start(budget=None):
+        client = PlacesClient("mock", base_url=server.base_url, backoff_base=0.001, backoff_max=0.01)
+        cache = ResponseCache(str(tmp_path / f"cache{len(started)}.sqlite3"))
+        daemon = SearchDaemon(client, cache, budget=budget,
+                              page_token_pacer=PageTokenPacer(initial_delay=0.0, min_delay=0.0))
+        started.append((daemon, client, cache))
+        return daemon, daemon.start_background()
+
+    yield start
+    for daemon, client, cache in started:
+        daemon.stop()
+        client.close()
+        cache.close()
+
+
+def run_together(fn, count):
+    """Call fn from count threads at once; returns their results."""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(i):
+        barrier.wait()
+        results[i] = fn()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_identical_searches_are_coalesced(server, start_daemon):
+    daemon, url = start_daemon()
+    results = run_together(lambda: DaemonClient(url).text_search("cafe", *CENTER, 5000), CLIENTS)
+    assert all(error is None and places for _, places, error in results)
+    assert len({tuple(place["id"] for place in places) for _, places, _ in results}) == 1
+    # One chain of at most three pages for everybody
+    requests = server.requests
+    assert 0 < requests <= 3
+    assert daemon.status()["searches"] == 1
+    assert daemon.status()["coalesced"] == CLIENTS - 1
+
+    # A repeat is answered from the cache
+    _, places, error = DaemonClient(url).text_search("cafe", *CENTER, 5000)
+    assert error is None and len(places) == len(results[0][1])
+    assert server.requests == requests
+
+
+def test_pages_stream_to_every_client(start_daemon):
+    _, url = start_daemon()
+
+    def search():
+        pages = []
+        _, places, _ = DaemonClient(url).text_search("bar", *CENTER, 5000,
+                                                     on_page=lambda batch, *_: pages.append(len(batch)))
+        return sum(pages), len(places)
+
+    for streamed, total in run_together(search, 3):
+        assert streamed == total > 0
+
+
+def test_concurrent_searches_cannot_overshoot_the_budget(server, start_daemon):
+    budget = QuotaBudget(SEARCH_REQUESTS * 2, window=3600)
+    daemon, url = start_daemon(budget)
+    queries = [f"query {i}" for i in range(4)]
+    results = run_together(lambda: DaemonClient(url).text_search(queries.pop(), *CENTER, 5000), len(queries))
+    errors = [error for _, _, error in results if error]
+    assert len(errors) == 2 and all("budget" in error for error in errors)
+    assert daemon.status()["refused"] == 2
+    # Unused reserved requests were given back
+    assert budget.available() == budget.max_requests - server.requests
+
+
+def test_search_needing_more_than_its_reservation_fails(server, start_daemon, monkeypatch):
+    import search_daemon
+
+    monkeypatch.setattr(search_daemon, "SEARCH_REQUESTS", 1)
+    budget = QuotaBudget(10, window=3600)
+    _, url = start_daemon(budget)
+    _, places, error = DaemonClient(url).text_search("cafe", *CENTER, 5000)
+    assert places is None and "1 API requests set aside" in error
+    assert server.requests == 1
+    assert budget.available() == 9
+
+
+def test_cached_search_runs_with_the_budget_spent(server, start_daemon):
+    budget = QuotaBudget(SEARCH_REQUESTS, window=3600)
+    _, url = start_daemon(budget)
+    client = DaemonClient(url)
+    assert client.text_search("cafe", *CENTER, 5000)[2] is None
+    budget.reserve(budget.available())
+    assert client.text_search("cafe", *CENTER, 5000)[2] is None
+    assert "budget" in client.text_search("bar", *CENTER, 5000)[2]
+
+
+def test_place_details_are_coalesced(server, start_daemon):
+    daemon, url = start_daemon()
+    results = run_together(lambda: DaemonClient(url).get_place("mock-5", DETAILS_FIELD_MASK), 4)
+    assert all(details == results[0] for details in results)
+    assert server.details_requests == 1
+    with pytest.raises(PlacesApiError) as error:
+        DaemonClient(url).get_place("no-such-place", DETAILS_FIELD_MASK)
+    assert error.value.status_code == 404
+
+
+def test_unexpected_details_error_is_answered(start_daemon):
+    daemon, url = start_daemon()
+
+    def fail(*args, **kwargs):
+        raise ValueError("broken response")
+
+    daemon.client.get_place = fail
+    with pytest.raises(PlacesApiError) as error:
+        DaemonClient(url).get_place("mock-5", DETAILS_FIELD_MASK)
+    assert error.value.status_code == 500
+    assert "broken response" in str(error.value)
+
+
+def test_bad_requests(start_daemon):
+    import requests
+
+    _, url = start_daemon()
+    assert requests.post(url + "/search", data="{").status_code == 400
+    assert requests.post(url + "/search", json={"query": "", "lat": 0, "lng": 0}).status_code == 400
+    assert requests.get(url + "/nope").status_code == 404